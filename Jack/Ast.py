@@ -0,0 +1,294 @@
+"""No comment"""
+import sys
+
+
+class Node:
+    """Noeud de l'arbre syntaxique produit par Parser.
+
+    Chaque sorte de noeud est une classe à __slots__ : ses champs sont des
+    attributs, son `type` (et le `subType` d'un terme) est un attribut de
+    classe. Un noeud se lit aussi comme l'ancien dict (node['name'],
+    node.get('object'), 'type' in node, for key in node) : todot et le
+    code écrit pour les dicts le parcourent sans changement.
+    Parser donne à chaque noeud qu'il lit un `offset`, la position de son
+    premier token dans le source (voir Scanner.position), pour situer les
+    erreurs du Generator ; ce n'est pas une clé et il n'entre pas dans
+    l'égalité. Les noeuds construits par les optimisations n'en ont pas.
+    """
+
+    __slots__ = ('offset',)
+    # clés de l'ancien dict, dans son ordre
+    KEYS = ()
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.KEYS else default
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def keys(self):
+        return list(self)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, key) == getattr(other, key) for key in self.__slots__)
+
+    def __repr__(self):
+        return '{' + ', '.join(f'{key!r}: {self[key]!r}' for key in self) + '}'
+
+
+class Class(Node):
+    __slots__ = ('name', 'classVarDec', 'subroutineDec')
+    KEYS = ('type',) + __slots__
+    type = 'class'
+
+    def __init__(self, name, classVarDec, subroutineDec):
+        self.name = name
+        self.classVarDec = classVarDec
+        self.subroutineDec = subroutineDec
+
+
+class ClassVarDec(Node):
+    __slots__ = ('kind', 'varType', 'vars')
+    KEYS = ('type',) + __slots__
+    type = 'classVarDec'
+
+    def __init__(self, kind, varType, vars):
+        self.kind = kind
+        self.varType = varType
+        self.vars = vars
+
+
+class SubroutineDec(Node):
+    __slots__ = ('subroutineType', 'returnType', 'name', 'parameters', 'body')
+    KEYS = ('type',) + __slots__
+    type = 'subroutineDec'
+
+    def __init__(self, subroutineType, returnType, name, parameters, body):
+        self.subroutineType = subroutineType
+        self.returnType = returnType
+        self.name = name
+        self.parameters = parameters
+        self.body = body
+
+
+class Parameter(Node):
+    """Paramètre : `type` est ici son type Jack"""
+    __slots__ = ('type', 'name')
+    KEYS = __slots__
+
+    def __init__(self, type, name):
+        self.type = type
+        self.name = name
+
+
+class SubroutineBody(Node):
+    __slots__ = ('vars', 'statements')
+    KEYS = ('type',) + __slots__
+    type = 'subroutineBody'
+
+    def __init__(self, vars, statements):
+        self.vars = vars
+        self.statements = statements
+
+
+class VarDec(Node):
+    __slots__ = ('varType', 'vars')
+    KEYS = ('type',) + __slots__
+    type = 'varDec'
+
+    def __init__(self, varType, vars):
+        self.varType = varType
+        self.vars = vars
+
+
+class LetStatement(Node):
+    __slots__ = ('name', 'index', 'value')
+    KEYS = ('type',) + __slots__
+    type = 'letStatement'
+
+    def __init__(self, name, index, value):
+        self.name = name
+        self.index = index
+        self.value = value
+
+
+class IfStatement(Node):
+    __slots__ = ('condition', 'ifStatements', 'elseStatements')
+    KEYS = ('type',) + __slots__
+    type = 'ifStatement'
+
+    def __init__(self, condition, ifStatements, elseStatements):
+        self.condition = condition
+        self.ifStatements = ifStatements
+        self.elseStatements = elseStatements
+
+
+class WhileStatement(Node):
+    __slots__ = ('condition', 'body')
+    KEYS = ('type',) + __slots__
+    type = 'whileStatement'
+
+    def __init__(self, condition, body):
+        self.condition = condition
+        self.body = body
+
+
+class DoStatement(Node):
+    __slots__ = ('call',)
+    KEYS = ('type',) + __slots__
+    type = 'doStatement'
+
+    def __init__(self, call):
+        self.call = call
+
+
+class ReturnStatement(Node):
+    __slots__ = ('expression',)
+    KEYS = ('type',) + __slots__
+    type = 'returnStatement'
+
+    def __init__(self, expression):
+        self.expression = expression
+
+
+class Expression(Node):
+    """term (op term)* : `operands` a un terme de plus que `operators`.
+
+    La clé 'terms' donne l'ancienne liste [term, {'op': op}, term, ...].
+    """
+    __slots__ = ('operands', 'operators')
+    KEYS = ('type', 'terms')
+    type = 'expression'
+
+    def __init__(self, operands, operators):
+        self.operands = operands
+        self.operators = operators
+
+    @property
+    def terms(self):
+        terms = [self.operands[0]]
+        for op, term in zip(self.operators, self.operands[1:]):
+            terms += [{'op': op}, term]
+        return terms
+
+
+class Term(Node):
+    __slots__ = ()
+    type = 'term'
+
+
+class IntegerConstant(Term):
+    __slots__ = ('value',)
+    KEYS = ('type', 'subType') + __slots__
+    subType = 'integerConstant'
+
+    def __init__(self, value):
+        self.value = value
+
+
+class StringConstant(Term):
+    __slots__ = ('value',)
+    KEYS = ('type', 'subType') + __slots__
+    subType = 'stringConstant'
+
+    def __init__(self, value):
+        self.value = value
+
+
+class KeywordConstant(Term):
+    __slots__ = ('value',)
+    KEYS = ('type', 'subType') + __slots__
+    subType = 'keywordConstant'
+
+    def __init__(self, value):
+        self.value = value
+
+
+class VarName(Term):
+    __slots__ = ('name',)
+    KEYS = ('type', 'subType') + __slots__
+    subType = 'varName'
+
+    def __init__(self, name):
+        self.name = name
+
+
+class ArrayAccess(Term):
+    __slots__ = ('name', 'index')
+    KEYS = ('type', 'subType') + __slots__
+    subType = 'arrayAccess'
+
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index
+
+
+class CallTerm(Term):
+    __slots__ = ('call',)
+    KEYS = ('type', 'subType') + __slots__
+    subType = 'subroutineCall'
+
+    def __init__(self, call):
+        self.call = call
+
+
+class GroupTerm(Term):
+    """'(' expression ')'"""
+    __slots__ = ('value',)
+    KEYS = ('type', 'subType') + __slots__
+    subType = 'expression'
+
+    def __init__(self, value):
+        self.value = value
+
+
+class UnaryOp(Term):
+    __slots__ = ('op', 'term')
+    KEYS = ('type', 'subType') + __slots__
+    subType = 'unaryOp'
+
+    def __init__(self, op, term):
+        self.op = op
+        self.term = term
+
+
+class SubroutineCall(Node):
+    """`object` vaut None pour une méthode de la classe courante (l'ancien dict n'avait pas la clé)"""
+    __slots__ = ('object', 'name', 'args')
+    type = 'subroutineCall'
+
+    def __init__(self, object, name, args):
+        self.object = object
+        self.name = name
+        self.args = args
+
+    @property
+    def KEYS(self):
+        if self.object is None:
+            return ('type', 'name', 'args')
+        return ('type', 'object', 'name', 'args')
+
+
+def todict(node):
+    """Copie de l'arbre en dicts et listes, comme le produisait l'ancien Parser"""
+    if isinstance(node, (Node, dict)):
+        return {key: todict(node[key]) for key in node}
+    if isinstance(node, list):
+        return [todict(value) for value in node]
+    return node
+
+
+if __name__ == "__main__":
+    import Parser
+    file = sys.argv[1]
+    print('-----debut')
+    print(todict(Parser.Parser(file).jackclass()))
+    print('-----fin')
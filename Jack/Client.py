@@ -0,0 +1,95 @@
+"""No comment"""
+import argparse
+import glob
+import json
+import os
+import socket
+import sys
+
+
+class Client:
+    """Client d'un Server écoutant sur une socket Unix.
+
+    Il n'importe aucun module du compilateur : il envoie les sources et
+    reçoit le résultat, la compilation est faite par le serveur déjà
+    démarré (voir Server).
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def request(self, request):
+        """Envoie une requête (un dict) et retourne la réponse"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+            connection.connect(self.path)
+            with connection.makefile('rw', encoding='utf-8') as stream:
+                stream.write(json.dumps(request) + '\n')
+                stream.flush()
+                return json.loads(stream.readline())
+
+
+def sources(path, extension):
+    """{fichier: texte} des fichiers `extension` de `path` (fichier ou répertoire)"""
+    if os.path.isdir(path):
+        files = sorted(glob.glob(f'{path}/*{extension}'))
+    else:
+        files = [path] if path.endswith(extension) else []
+    res = {}
+    for file in files:
+        with open(file) as source:
+            res[file] = source.read()
+    return res
+
+
+def _text(diagnostic):
+    # comme str(Diagnostic.Error), précédé du fichier
+    where = f"{diagnostic['file']}: " if diagnostic['file'] else ''
+    if diagnostic['line'] is None:
+        return f"{where}{diagnostic['kind']}: {diagnostic['message']}"
+    return f"{where}{diagnostic['kind']} (line={diagnostic['line']}, col={diagnostic['col']}): {diagnostic['message']}"
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Compile des classes Jack (ou traduit du code VM) avec un Server")
+    arguments.add_argument('socket', help="socket Unix du serveur")
+    arguments.add_argument('files', nargs='?', help="fichier .jack ou .vm, ou répertoire")
+    arguments.add_argument('asmfile', nargs='?', default='-', help="fichier .asm ou - pour la sortie standard")
+    arguments.add_argument('--pool', action='store_true', help="voir Compiler")
+    arguments.add_argument('-O', '--optimize', action='store_true', help="voir Compiler")
+    arguments.add_argument('-F', '--flow', action='store_true', help="voir Compiler")
+    arguments.add_argument('-I', '--intrinsics', action='store_true', help="voir Compiler")
+    arguments.add_argument('-D', '--data', action='store_true', help="voir Compiler")
+    arguments.add_argument('--vm', action='store_true', help="écrit aussi le .vm de chaque classe")
+    arguments.add_argument('--stats', action='store_true', help="affiche le remplissage du cache du serveur")
+    arguments.add_argument('--shutdown', action='store_true', help="arrête le serveur")
+    args = arguments.parse_args()
+    client = Client(args.socket)
+
+    if args.stats or args.shutdown:
+        print(json.dumps(client.request({'op': 'stats' if args.stats else 'shutdown'})))
+        sys.exit()
+    if args.files is None:
+        arguments.error("fichier .jack ou .vm, ou répertoire, manquant")
+    jack = sources(args.files, '.jack')
+    if jack:
+        response = client.request({'op': 'compile', 'sources': jack, 'options': {
+            'optimize': args.optimize, 'pool': args.pool, 'asm': True,
+            'flow': args.flow, 'intrinsics': args.intrinsics, 'data': args.data}})
+    else:
+        response = client.request({'op': 'translate', 'sources': sources(args.files, '.vm'), 'options': {
+            'optimize': args.flow, 'intrinsics': args.intrinsics, 'data': args.data}})
+    for diagnostic in response['diagnostics']:
+        print(_text(diagnostic), file=sys.stderr)
+    if args.vm:
+        directory = args.files if os.path.isdir(args.files) else os.path.dirname(args.files)
+        for name, text in response.get('vm', {}).items():
+            with open(os.path.join(directory, name + '.vm'), 'w') as vm:
+                vm.write(text)
+    if response.get('asm') is not None:
+        if args.asmfile == '-':
+            sys.stdout.write(response['asm'])
+        else:
+            with open(args.asmfile, 'w') as asm:
+                asm.write(response['asm'])
+    if not response['ok']:
+        sys.exit(1)
@@ -0,0 +1,128 @@
+"""No comment"""
+import argparse
+import glob
+import importlib
+import os
+import sys
+import Diagnostic
+import Trace
+import Translator
+import Vm
+
+JACK = os.path.dirname(os.path.abspath(__file__))
+VMTRANSLATOR = os.path.join(JACK, '..', 'VMTranslator')
+# modules de VMTranslator qui portent le nom d'un module de Jack
+SHADOWED = ('Translator', 'Generator', 'Parser', 'Lexer', 'Reader')
+
+# modules SHADOWED de VMTranslator, une fois importés (voir backend)
+_backend = None
+
+
+class Compiler:
+    """Compile des classes Jack en assembleur Hack, sans fichier .vm intermédiaire.
+
+    Les commandes VM des classes (voir Vm) passent du Generator de Jack au
+    VMTranslator en mémoire, avec les modules de l'OS (`os`) que le
+    programme ne redéfinit pas. Les options sont celles des deux
+    traducteurs : `pool`, `jobs` et `optimize` pour Jack, `flow`,
+    `intrinsics`, `data` et `link` pour le VMTranslator (son -O). Avec
+    `vm`, les .vm des classes sont aussi écrits à côté de leurs sources.
+    """
+
+    def __init__(self, files, asm, pool=False, jobs=1, optimize=False, vm=False,
+                 flow=False, intrinsics=False, data=False, link=(), os_dir=os.path.join(JACK, 'os')):
+        self.files = files
+        self.asm = asm
+        self.pool = pool
+        self.jobs = jobs
+        self.optimize = optimize
+        self.vm = vm
+        self.flow = flow
+        self.intrinsics = intrinsics
+        self.data = data
+        self.link = link
+        self.os_dir = os_dir
+
+    def compile(self):
+        """No comment"""
+        jack = Translator.Translator(self.files, self.pool, self.jobs, optimize=self.optimize, vm=self.vm)
+        jack.translate()
+        names = {module.name for module in jack.modules}
+        library = [file for file in sorted(glob.glob(f'{self.os_dir}/*.vm'))
+                   if os.path.splitext(os.path.basename(file))[0] not in names]
+        translator = backend()['Translator'].Translator(jack.modules + library, self.asm, self.flow,
+                                                         self.intrinsics, self.data, self.link)
+        try:
+            with Trace.span('asm'):
+                translator.translate()
+        finally:
+            for warning in translator.warnings:
+                print(warning, file=sys.stderr)
+
+
+def backend():
+    """Modules SHADOWED de VMTranslator, par nom.
+
+    Ils sont importés une fois depuis le répertoire de VMTranslator, puis
+    sys.modules retrouve ceux de Jack : chaque module garde ceux qu'il a
+    importés.
+    """
+    global _backend
+    if _backend is None:
+        saved = {name: sys.modules.pop(name) for name in SHADOWED if name in sys.modules}
+        sys.path.insert(0, VMTRANSLATOR)
+        try:
+            importlib.import_module('Translator')
+            _backend = {name: sys.modules[name] for name in SHADOWED}
+        finally:
+            sys.path.remove(VMTRANSLATOR)
+            for name in SHADOWED:
+                sys.modules.pop(name, None)
+            sys.modules.update(saved)
+    return _backend
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Compile des classes Jack en assembleur Hack, sans fichier .vm")
+    arguments.add_argument('jackfiles', help="fichier .jack ou répertoire")
+    arguments.add_argument('asmfile', nargs='?', default='-', help="fichier .asm ou - pour la sortie standard")
+    arguments.add_argument('--pool', action='store_true',
+                           help="construit une seule fois chaque chaîne littérale du programme")
+    arguments.add_argument('-v', '--verbose', action='count', default=0,
+                           help="trace sur stderr : -v classes, -vv arbre et code VM, -vvv tokens")
+    arguments.add_argument('--time', action='store_true',
+                           help="temps passé dans chaque phase (lex, parse, codegen, asm)")
+    arguments.add_argument('-O', '--optimize', action='store_true',
+                           help="optimise le code VM (voir le -O de Translator)")
+    arguments.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                           help="compile les classes avec N processus")
+    arguments.add_argument('--vm', action='store_true', help="écrit aussi le .vm de chaque classe")
+    arguments.add_argument('-F', '--flow', action='store_true',
+                           help="optimise le flot de contrôle (le -O de VMTranslator)")
+    arguments.add_argument('-I', '--intrinsics', action='store_true',
+                           help="remplace certains appels à l'OS (Math, Memory.peek/poke, Array) par de l'assembleur")
+    arguments.add_argument('-D', '--data', action='store_true',
+                           help="remplace l'initialisation de la police d'Output par une image de la RAM")
+    arguments.add_argument('-L', '--link', action='append', default=[], metavar='VMFILE',
+                           help="remplace le module du même nom par ce fichier .vm (par exemple os/fast/Memory.vm)")
+    arguments.add_argument('--os', default=os.path.join(JACK, 'os'), metavar='DIR',
+                           help="répertoire des .vm de l'OS ajoutés au programme")
+    args = arguments.parse_args()
+    Trace.level = args.verbose
+    Trace.timing = args.time
+    compiler = Compiler(args.jackfiles, args.asmfile, args.pool, args.jobs, args.optimize, args.vm,
+                        args.flow, args.intrinsics, args.data, args.link, args.os)
+    try:
+        compiler.compile()
+    except Diagnostic.Error as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    except Vm.Error as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    except BrokenPipeError:
+        # le lecteur en aval a fermé le tube (voir VMTranslator/Translator)
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    if Trace.timing:
+        Trace.write(Trace.report())
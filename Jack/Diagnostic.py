@@ -0,0 +1,57 @@
+"""No comment"""
+import sys
+
+
+class Error(Exception):
+    """Erreur de compilation d'une classe Jack.
+
+    Le Scanner, le Parser et le Generator la lèvent au lieu d'arrêter le
+    programme : les commandes (Translator, Compiler) affichent str(error)
+    puis s'arrêtent, l'API en mémoire (voir Library) en fait un
+    diagnostic et continue. `kind` vaut SyntaxError (Scanner, Parser),
+    SemanticError (Generator, SymbolTable), FileNotFoundError ou
+    UnicodeDecodeError (voir decode).
+    """
+
+    def __init__(self, message, line=None, col=None, file=None, kind='SyntaxError'):
+        super().__init__(message)
+        self.message = message
+        self.line = line
+        self.col = col
+        self.file = file
+        self.kind = kind
+
+    def __str__(self):
+        if self.line is None:
+            return f"{self.kind}: {self.message}"
+        return f"{self.kind} (line={self.line}, col={self.col}): {self.message}"
+
+    def diagnostic(self):
+        """{'severity', 'kind', 'file', 'line', 'col', 'message'}, voir Library"""
+        return diagnostic('error', self.kind, self.message, self.file, self.line, self.col)
+
+
+def decode(source, file=None):
+    """Texte d'un source (str ou bytes en UTF-8) ; un octet invalide lève une Error à sa position"""
+    if isinstance(source, str):
+        return source
+    try:
+        return source.decode()
+    except UnicodeDecodeError as error:
+        line = source.count(b'\n', 0, error.start) + 1
+        col = error.start - source.rfind(b'\n', 0, error.start)
+        raise Error(f"octet invalide 0x{source[error.start]:02x} : {error.reason}", line, col, file,
+                    'UnicodeDecodeError') from None
+
+
+def diagnostic(severity, kind, message, file=None, line=None, col=None):
+    """Un diagnostic : ce que l'API en mémoire retourne pour chaque message"""
+    return {'severity': severity, 'kind': kind, 'file': file, 'line': line, 'col': col, 'message': message}
+
+
+if __name__ == "__main__":
+    print('-----debut')
+    error = Error(sys.argv[1] if len(sys.argv) > 1 else 'Invalid token 1a', 3, 7, 'Main.jack')
+    print(error)
+    print(error.diagnostic())
+    print('-----fin')
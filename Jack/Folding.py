@@ -0,0 +1,226 @@
+"""No comment"""
+import sys
+import Ast
+
+
+def word(value):
+    """Ramène un entier sur 16 bits signés"""
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def compute(op, a, b):
+    """`a op b` comme le calcule le programme compilé, ou None si ce n'est pas sûr.
+
+    Math.divide n'est exact que pour un diviseur entre -16383 et 16383, et
+    les comparaisons de la VM passent par une soustraction : elles ne sont
+    pliées que si celle-ci ne déborde pas.
+    """
+    if op == '+':
+        return word(a + b)
+    if op == '-':
+        return word(a - b)
+    if op == '*':
+        return word(a * b)
+    if op == '/':
+        if b == 0 or not -16384 < b < 16384 or a == -32768:
+            return None
+        q = abs(a) // abs(b)
+        return -q if (a < 0) != (b < 0) else q
+    if op == '&':
+        return a & b
+    if op == '|':
+        return a | b
+    if op == '=':
+        return -1 if a == b else 0
+    if word(a - b) != a - b:
+        return None
+    if op == '<':
+        return -1 if a < b else 0
+    if op == '>':
+        return -1 if a > b else 0
+    return None
+
+
+def constant(term):
+    """Valeur d'un terme constant, ou None"""
+    sub_type = term.subType
+    if sub_type == 'integerConstant':
+        return word(int(term.value))
+    if sub_type == 'keywordConstant':
+        return {'true': -1, 'false': 0, 'null': 0}.get(term.value)
+    if sub_type == 'unaryOp':
+        value = constant(term.term)
+        if value is None:
+            return None
+        return word(-value) if term.op == '-' else word(~value)
+    if sub_type == 'expression' and not term.value.operators:
+        return constant(term.value.operands[0])
+    return None
+
+
+def literal(value):
+    """Terme le plus court qui vaut `value` : n, -n, ou ~32767 pour -32768"""
+    if value >= 0:
+        return Ast.IntegerConstant(str(value))
+    if value == -32768:
+        return Ast.UnaryOp('~', Ast.IntegerConstant('32767'))
+    return Ast.UnaryOp('-', Ast.IntegerConstant(str(-value)))
+
+
+class Folding:
+    """Optimisation de l'arbre d'une classe, entre Parser et Generator.
+
+    Les sous-expressions constantes sont calculées à la compilation, avec
+    l'arithmétique 16 bits de Jack et son évaluation de gauche à droite :
+    seul le début constant d'une expression est plié, puis les `+ c` et
+    `- c` qui se suivent sont regroupés (l'addition sur 16 bits est
+    associative). Les branches d'un `if` dont la condition est constante
+    sont remplacées par celle qui s'exécute, un `while (false)` disparaît,
+    et les instructions qui suivent un `return` ne sont plus compilées.
+    """
+
+    def __init__(self):
+        self.folded = 0
+        self.removed = 0
+
+    def jackclass(self, arbre):
+        """No comment"""
+        for routine in arbre.subroutineDec:
+            routine.body.statements = self.statements(routine.body.statements)
+        return arbre
+
+    def statements(self, statements):
+        """Instructions optimisées ; celles qui suivent une instruction qui ne se termine pas sont retirées"""
+        res = []
+        for i, statement in enumerate(statements):
+            res.extend(self.statement(statement))
+            if res and self._returns(res[-1]):
+                self.removed += len(statements) - i - 1
+                break
+        return res
+
+    def statement(self, statement):
+        """Liste des instructions qui remplacent `statement`"""
+        instruction_type = statement.type
+        if instruction_type == 'letStatement':
+            if statement.index is not None:
+                statement.index = self.expression(statement.index)
+            statement.value = self.expression(statement.value)
+        elif instruction_type == 'ifStatement':
+            statement.condition = self.expression(statement.condition)
+            value = self._value(statement.condition)
+            if value is not None:
+                self.removed += 1
+                return self.statements(statement.ifStatements if value else statement.elseStatements or [])
+            statement.ifStatements = self.statements(statement.ifStatements)
+            if statement.elseStatements is not None:
+                statement.elseStatements = self.statements(statement.elseStatements)
+        elif instruction_type == 'whileStatement':
+            statement.condition = self.expression(statement.condition)
+            value = self._value(statement.condition)
+            # la boucle teste not condition : seul true (-1) la fait tourner,
+            # toute autre constante en sort tout de suite
+            if value is not None and value != -1:
+                self.removed += 1
+                return []
+            statement.body = self.statements(statement.body)
+        elif instruction_type == 'doStatement':
+            self.call(statement.call)
+        elif instruction_type == 'returnStatement':
+            if statement.expression is not None:
+                statement.expression = self.expression(statement.expression)
+        return [statement]
+
+    def expression(self, exp):
+        """No comment"""
+        operands = [self.term(term) for term in exp.operands]
+        operators = list(exp.operators)
+
+        # début constant : c1 op c2 op c3 ...
+        value = constant(operands[0])
+        i = 0
+        while value is not None and i < len(operators):
+            right = constant(operands[i + 1])
+            result = compute(operators[i], value, right) if right is not None else None
+            if result is None:
+                break
+            value = result
+            i += 1
+        if i > 0:
+            self.folded += i
+            operands[:i + 1] = [literal(value)]
+            del operators[:i]
+
+        # e + c1 - c2 ... -> e + c
+        i = 0
+        while i < len(operators):
+            value = constant(operands[i + 1]) if operators[i] in '+-' else None
+            if value is None:
+                i += 1
+                continue
+            total = value if operators[i] == '+' else -value
+            j = i + 1
+            while j < len(operators) and operators[j] in '+-' and constant(operands[j + 1]) is not None:
+                total += constant(operands[j + 1]) if operators[j] == '+' else -constant(operands[j + 1])
+                j += 1
+            if j > i + 1:
+                self.folded += j - i - 1
+                total = word(total)
+                operators[i:j] = ['+' if total >= 0 else '-']
+                operands[i + 1:j + 1] = [literal(abs(total)) if total != -32768 else literal(total)]
+            i += 1
+        return Ast.Expression(operands, operators)
+
+    def term(self, term):
+        """No comment"""
+        sub_type = term.subType
+        if sub_type == 'expression':
+            term.value = self.expression(term.value)
+            if not term.value.operators:
+                # (t) -> t
+                return term.value.operands[0]
+        elif sub_type == 'unaryOp':
+            term.term = self.term(term.term)
+            value = constant(term)
+            if value is not None and constant(term.term) is not None and term.term.subType != 'integerConstant':
+                self.folded += 1
+                return literal(value)
+        elif sub_type == 'arrayAccess':
+            term.index = self.expression(term.index)
+        elif sub_type == 'subroutineCall':
+            self.call(term.call)
+        return term
+
+    def call(self, call):
+        """No comment"""
+        call.args = [self.expression(arg) for arg in call.args]
+
+    def _value(self, exp):
+        """Valeur d'une expression constante, ou None"""
+        if exp.operators:
+            return None
+        return constant(exp.operands[0])
+
+    def _returns(self, statement):
+        """Vrai si l'exécution ne passe jamais à l'instruction suivante"""
+        instruction_type = statement.type
+        if instruction_type == 'returnStatement':
+            return True
+        if instruction_type == 'ifStatement':
+            return (statement.elseStatements is not None and bool(statement.ifStatements)
+                    and bool(statement.elseStatements)
+                    and self._returns(statement.ifStatements[-1]) and self._returns(statement.elseStatements[-1]))
+        if instruction_type == 'whileStatement':
+            return self._value(statement.condition) == -1
+        return False
+
+
+if __name__ == "__main__":
+    import Parser
+    file = sys.argv[1]
+    print('-----debut')
+    folding = Folding()
+    print(Ast.todict(folding.jackclass(Parser.Parser(file).jackclass())))
+    print(f'{folding.folded} opérations calculées, {folding.removed} instructions retirées')
+    print('-----fin')
@@ -1,87 +1,159 @@
 """No comment"""
+import collections
+import os
 import sys
+import Diagnostic
+import Folding
+import Hoisting
+import Inlining
 import Parser
+import Pool
+import SymbolTable
+import Trace
+import todot
+import toxml
 
+# les commandes VM produites (voir Vm) sont celles que lit le VMTranslator
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'VMTranslator'))
+import Vm
 
+# au-delà, `x * c` reste un appel de Math.multiply (voir write_multiply)
+MULTIPLY_STEPS = 8
+
+# une classe analysée, avant Inlining (voir analyse)
+Analysis = collections.namedtuple('Analysis', 'parser arbre classtable templates folding')
 
 
 class Generator:
     """No comment"""
 
-    def __init__(self, file=None):
+    def __init__(self, file=None, pool=None, optimize=False, index=None, source=None, debug=(), analysis=None):
+        """
+        Avec `pool` (voir Pool), les chaînes littérales sont construites une
+        seule fois pour tout le programme et lues dans des variables static.
+        Avec `optimize`, l'arbre passe par Folding, Inlining puis Hoisting
+        avant la génération, les multiplications et divisions par une
+        constante sont réduites (voir write_multiply et write_divide), et
+        les accès aux tableaux réutilisent THAT (voir write_that).
+        `index` donne les petits sous-programmes des autres classes que
+        Inlining peut recopier (voir Inlining.templates) ; sans lui, seuls
+        ceux de la classe le sont. Avec `source`, le texte de la classe est
+        celui-ci et `file` n'est que son nom (voir Library). `debug` donne
+        les représentations de l'arbre, avant optimisation, écrites à côté
+        du source : 'xml' (voir toxml) et 'dot' (voir todot) ; elles ne
+        coûtent pas une autre analyse du fichier. `analysis` est celle que
+        analyse a déjà faite de la classe (voir Translator), avec les mêmes
+        `optimize` et `debug` : la classe n'est alors pas relue.
+        """
+        self.file = file
         if file is not None:
-            self.parser = Parser.Parser(file)
-            self.arbre = self.parser.jackclass()
-            print("Arbre syntaxique:", self.arbre)
-            self.vmfile = open(self.arbre['name'] + '.vm', "w")
-            self.symbolClassTable = []
-            self.symbolRoutineTable = []
+            if analysis is None:
+                analysis = analyse(file, source, optimize, debug)
+            self.parser, self.arbre, self.classtable, self.templates, folding = analysis
+            inlining = Inlining.Inlining({})
+            if optimize:
+                with Trace.span('optimize'):
+                    inlining = Inlining.Inlining(dict(index or {}, **{self.arbre.name: self.templates}))
+                    self.arbre = inlining.jackclass(self.arbre, self.classtable, file, self.parser.lexer)
+                    hoisting = Hoisting.Hoisting()
+                    self.arbre = hoisting.jackclass(self.arbre)
+                if Trace.level >= Trace.PHASES:
+                    Trace.write(f"Folding {self.arbre.name}: {folding.folded} opérations calculées, "
+                                f"{folding.removed} instructions retirées")
+                    Trace.write(f"Inlining {self.arbre.name}: {len(inlining.sites)} appels remplacés")
+                    Trace.write(f"Hoisting {self.arbre.name}: {hoisting.reused} calculs réutilisés, "
+                                f"{hoisting.hoisted} calculs sortis des boucles")
+            if Trace.level >= Trace.NODES:
+                Trace.write(f"Arbre syntaxique: {self.arbre}")
+            self.symbols = SymbolTable.SymbolTable.fromFrozen(self.classtable, file, self.parser.lexer)
             self.output = []
+            self.pool = pool
+            self.optimize = optimize
+            # sous-programmes appelés ou recopiés, 'Classe.nom' (voir interface)
+            self.calls = set(inlining.calls)
+            # appels recopiés par Inlining : ('Classe.appelant', 'Classe.appelé')
+            self.inlined = inlining.sites
+            # avec optimize, (tableau, variable de l'indice ou None) dont THAT
+            # vaut l'adresse, tant que le code qui suit ne la change pas
+            self.that = None
+            # noeud en cours de génération, qui situe les erreurs (voir error)
+            self.node = None
 
     def jackclass(self):
         """
         Gère la classe Jack, incluant les déclarations de variables et sous-programmes.
         """
-        class_name = self.arbre['name']
-        print(f"Processing class: {class_name}")
-
-        # Vérifie et traite les variables de classe
-        for var in self.arbre.get('varDec', []):
-            self.variable(var)
+        class_name = self.arbre.name
+        if Trace.level >= Trace.PHASES:
+            Trace.write(f"Processing class: {class_name}")
 
-        self.vmfile.write(f"// Class {self.arbre['name']}\n")
-        for subroutine in self.arbre['subroutineDec']:
-            self.subroutineDec(subroutine)
+        with Trace.span('codegen'):
+            # les variables de classe sont déjà dans self.classtable
+            for subroutine in self.arbre.subroutineDec:
+                self.subroutineDec(subroutine)
+            if self.pool is not None:
+                self.strings()
 
     def variable(self, var):
         """
         Ajoute une variable à la table des symboles.
         """
-        if var['kind'] in ['static', 'field']:
-            self.symbolClassTable.append(var)
-        elif var['kind'] in ['argument', 'local']:
-            self.symbolRoutineTable.append(var)
-        else:
-            self.error(f"Type de variable inconnu: {var['kind']}")
+        kind = 'local' if var.type == 'varDec' else var.kind
+        if kind not in SymbolTable.SEGMENTS:
+            self.error(f"Type de variable inconnu: {kind}", var)
+        for name in var.vars:
+            self.symbols.define(name, var.varType, kind, var)
 
     def subroutineDec(self, routine):
         """
         Gère les déclarations de sous-programmes.
         """
         # Type de sous-programme (function, constructor, method)
-        subroutine_type = routine['type']
-        subroutine_name = routine['name']
+        subroutine_type = routine.subroutineType
+        subroutine_name = routine.name
+
+        # Table des symboles du sous-programme : this, les paramètres puis les variables locales
+        self.symbols.startSubroutine()
+        if subroutine_type == 'method':
+            self.symbols.define('this', self.arbre.name, 'argument', routine)
+        for param in routine.parameters:
+            self.symbols.define(param.name, param.type, 'argument', param)
+        for var in routine.body.vars:
+            self.variable(var)
 
         # Nombre de variables locales
-        num_locals = len(routine['body']['vars'])  # Corrigé pour accéder à la clé correcte
+        num_locals = self.symbols.count('local')
 
         # Déclare la fonction dans le fichier VM
-        self.write_vm(f"function {self.arbre['name']}.{subroutine_name} {num_locals}")
+        self.write_function(f"{self.arbre.name}.{subroutine_name}", num_locals)
+        self.that = None
 
         # Initialisation spécifique pour les méthodes et constructeurs
         if subroutine_type == 'method':
             # Initialisation pour les méthodes : définir `this` sur l'objet passé en argument
-            self.write_vm("push argument 0")
-            self.write_vm("pop pointer 0")
+            self.write_push('argument', 0)
+            self.write_pop('pointer', 0)
         elif subroutine_type == 'constructor':
             # Initialisation pour les constructeurs : allouer de la mémoire pour les champs
-            num_fields = sum(1 for var in self.symbolClassTable if var['kind'] == 'field')
-            self.write_vm(f"push constant {num_fields}")
-            self.write_vm("call Memory.alloc 1")
-            self.write_vm("pop pointer 0")
-
-        # Traiter les instructions du# Example snippet to handle the "." symbol in your tokenizer/parser.
-
- # Consume the identifier
-
-        for instruction in routine['body']['statements']:  # Corrigé pour accéder à 'statements'
+            self.write_push('constant', self.symbols.count('field'))
+            self.write_call('Memory.alloc', 1)
+            self.write_pop('pointer', 0)
+        if self.pool is not None and self.arbre.name == 'Main' and subroutine_name == 'main':
+            # les chaînes du pool sont construites au début du programme
+            self.write_call("Main.$strings", 0)
+            self.write_pop('temp', 0)
+
+        for instruction in routine.body.statements:
             self.statement(instruction)
 
     def statement(self, instruction):
         """
         Gère une instruction spécifique (do, let, if, while, return).
         """
-        instruction_type = instruction['type']
+        instruction_type = instruction.type
+        node = self.node
+        if getattr(instruction, 'offset', None) is not None:
+            self.node = instruction
 
         if instruction_type == 'doStatement':
             self.doStatement(instruction)  # Appel de la méthode doStatement
@@ -94,221 +166,343 @@ class Generator:
         elif instruction_type == 'returnStatement':
             self.returnStatement(instruction)
         else:
-            raise SyntaxError(f"Instruction inconnue: {instruction_type}")
+            self.error(f"Instruction inconnue: {instruction_type}")
+        self.node = node
 
     def letStatement(self, inst):
         """
-        {'line': line, 'col': col, 'type': 'let',
-         'name': varName, 'indice': expression, 'valeur': expression}
+        {'type': 'letStatement', 'name': varName, 'index': expression, 'value': expression}
         """
-        print(f"Processing let statement: {inst}")  # Debugging line
-        var_name = inst.get('name')  # Get the variable name (e.g., 'sum') instead of 'variable'
-        if not var_name:
-            print(f"Error: Missing 'name' key in instruction: {inst}")
-            return
-
-        value = inst.get('valeur')  # Get the value to assign to the variable (e.g., 'a + b')
-        if not value:
-            print(f"Error: Missing 'valeur' key in instruction: {inst}")
-            return
-
-        # Generate code for the value (right-hand side of the assignment)
-        self.expression(value)  # This should push the result of 'a + b' onto the stack
-
-        # Debugging line to check the stack before the assignment
-        print(f"Stack after evaluating {value}:")  # Debugging line
-        self.write_vm("debug stack")  # This is a placeholder for your method to print the stack
+        if Trace.level >= Trace.NODES:
+            Trace.write(f"Processing let statement: {inst}")
+        var_name = inst.name
+        value = inst.value
 
         # Check if it's an array assignment
-        if 'indice' in inst and inst['indice']:
-            # Evaluate the array index (for array assignments like arr[i] = value)
-            self.expression(inst['indice'])
-            # Push base address of the array
-            self.write_vm(f"push {self.get_segment(var_name)} {self.get_index(var_name)}")
-            # Add the index to the base address
-            self.write_vm("add")
-            # Store the value in the address pointed by the computed address
-            self.write_vm("pop temp 0")
-            self.write_vm("pop pointer 1")
-            self.write_vm("push temp 0")
-            self.write_vm("pop that 0")
+        if inst.index is not None and self.optimize and self.arrayStatement(inst):
+            return
+        if inst.index is not None:
+            # Adresse de l'élément (base + indice), calculée avant la valeur
+            self.write_push_var(var_name)
+            self.expression(inst.index)
+            self.write_add()
+            # La valeur peut elle-même accéder à un tableau : elle passe par temp 0
+            self.expression(value)
+            self.write_pop('temp', 0)
+            self.write_pop('pointer', 1)
+            self.write_push('temp', 0)
+            self.write_pop('that', 0)
         else:
             # Simple assignment (for scalar variables like 'sum = 5')
-            # Pop the evaluated value and assign it to the variable
-            self.write_vm(f"pop {self.get_segment(var_name)} {self.get_index(var_name)}")
-            print(f"Assigned {value} to {var_name}")  # Debugging line
+            self.expression(value)  # This should push the result of 'a + b' onto the stack
+            self.write_pop_var(var_name)
+
+    def arrayStatement(self, inst):
+        """
+        `let a[i] = v` sans passer par temp 0 : THAT pointe sur l'élément
+        avant le calcul de v si v ne lit pas de tableau (un appel sauve et
+        restaure THAT), sinon après, si v ne peut pas changer l'adresse.
+        Retourne False si l'instruction doit être compilée comme avant.
+        """
+        element = self.element(inst.name, inst.index)
+        if not _contains(inst.value, ('arrayAccess',)):
+            if element is not None:
+                offset = self.write_that(*element)
+            else:
+                self.write_push_var(inst.name)
+                self.expression(inst.index)
+                self.write_add()
+                self.write_pop('pointer', 1)
+                offset = 0
+            self.expression(inst.value)
+            self.write_pop('that', offset)
+            self.stored()
+            return True
+        if element is not None and (self.fixed(element[0], element[1])
+                                    or not _contains(inst.value, ('subroutineCall', 'stringConstant'))):
+            self.expression(inst.value)
+            self.write_pop('that', self.write_that(*element))
+            self.stored()
+            return True
+        return False
+
+    def element(self, name, index):
+        """
+        (tableau, variable, k) si `name[index]` est l'élément k d'une adresse
+        que write_that sait calculer : index vaut k, v, v + k ou k + v (k >= 0), sinon None
+        """
+        operands, operators = index.operands, index.operators
+        if len(operators) > 1 or operators and operators[0] != '+':
+            return None
+        values = [Folding.constant(term) for term in operands]
+        names = [term.name if term.subType == 'varName' else None for term in operands]
+        if not operators:
+            if values[0] is not None:
+                return (name, None, values[0]) if values[0] >= 0 else None
+            return (name, names[0], 0) if names[0] is not None else None
+        if values[1] is not None and names[0] is not None and values[1] >= 0:
+            return name, names[0], values[1]
+        if values[0] is not None and names[1] is not None and values[0] >= 0:
+            return name, names[1], values[0]
+        return None
+
+    def write_that(self, name, var, offset):
+        """
+        Fait pointer THAT sur name + var (ou sur name si var vaut None), sauf
+        s'il y pointe déjà ; retourne `offset`, l'indice de l'élément dans that.
+        """
+        if self.that != (name, var):
+            self.write_push_var(name)
+            if var is not None:
+                self.write_push_var(var)
+                self.write_add()
+            self.write_pop('pointer', 1)
+            self.that = (name, var)
+        return offset
+
+    def fixed(self, *names):
+        """Vrai si les variables sont des locales ou des arguments, qu'aucun appel ne peut modifier"""
+        return all(name is None or self.get_var(name).kind in ('local', 'argument') for name in names)
+
+    def stored(self):
+        """Après une écriture dans un tableau : elle a pu modifier un champ ou une variable static"""
+        if self.that is not None and not self.fixed(*self.that):
+            self.that = None
 
     def ifStatement(self, inst):
         """
-        {'line':line, 'col': col,
-        'type': 'if', 'condition': expression, 'true': [instruction],
-        'false': [instruction]}
+        {'type': 'ifStatement', 'condition': expression, 'ifStatements': [instruction],
+        'elseStatements': [instruction] ou None}
         """
         label_true = self.new_label()
         label_false = self.new_label()
 
-        self.expression(inst['condition'])
-        self.write_vm(f"if-goto {label_true}")
-        for instr in inst['false']:
+        self.expression(inst.condition)
+        self.write_if(label_true)
+        for instr in inst.elseStatements or []:
             self.statement(instr)
-        self.write_vm(f"goto {label_false}")
-        self.write_vm(f"label {label_true}")
-        for instr in inst['true']:
+        self.write_goto(label_false)
+        self.write_label(label_true)
+        for instr in inst.ifStatements:
             self.statement(instr)
-        self.write_vm(f"label {label_false}")
+        self.write_label(label_false)
 
     def whileStatement(self, inst):
         """
-        {'line':line, 'col': col,
-        'type': 'while', 'condition': expression,
-        'instructions': [instruction]}
+        {'type': 'whileStatement', 'condition': expression, 'body': [instruction]}
         """
         label_start = self.new_label()
         label_end = self.new_label()
 
-        self.write_vm(f"label {label_start}")
-        self.expression(inst['condition'])
-        self.write_vm(f"not")
-        self.write_vm(f"if-goto {label_end}")
-        for instr in inst['instructions']:
+        self.write_label(label_start)
+        if self.optimize and not inst.condition.operators and Folding.constant(inst.condition.operands[0]) == -1:
+            # while (true) : not true vaut 0, pas de test de sortie ; une autre
+            # constante non nulle sortirait tout de suite
+            label_end = None
+        else:
+            self.expression(inst.condition)
+            self.write_not()
+            self.write_if(label_end)
+        for instr in inst.body:
             self.statement(instr)
-        self.write_vm(f"goto {label_start}")
-        self.write_vm(f"label {label_end}")
+        self.write_goto(label_start)
+        if label_end is not None:
+            self.write_label(label_end)
 
     def doStatement(self, instruction):
         """
         Gère une instruction `do`, qui correspond à un appel de sous-routine.
         """
-        subroutine_call = instruction['call']  # Extraire l'appel de sous-routine
+        subroutine_call = instruction.call  # Extraire l'appel de sous-routine
         self.subroutineCall(subroutine_call)  # Traiter l'appel de sous-routine
 
         # Ignore la valeur de retour de l'appel de sous-routine
-        self.write_vm("pop temp 0")
+        self.write_pop('temp', 0)
 
     def returnStatement(self, inst):
         """
-        {'line':line, 'col': col, 'type': 'return', 'valeur': expression}
+        {'type': 'returnStatement', 'expression': expression ou None}
         """
-        if 'valeur' in inst and inst['valeur'] is not None:
-            self.expression(inst['valeur'])
+        if inst.expression is not None:
+            self.expression(inst.expression)
         else:
-            self.write_vm("push constant 0")
-        self.write_vm("return")
+            self.write_push('constant', 0)
+        self.write_return()
 
     def expression(self, exp):
         """
-        [term op ...]
-        avec op : '+'|'-'|'*'|'/'|'&'|'|'<'|'>'|'='
-        """
-        print(f"Processing expression: {exp}")
-
-        # Traiter le terme gauche (left)
-        if 'left' in exp:
-            print(f"Left term: {exp['left']}")
-            self.term(exp['left'])
-
-        # Vérifier si un opérateur est présent et traiter le terme droit (right)
-        if 'op' in exp:
-            print(f"Operator: {exp['op']}")
-
-            # Traiter le terme droit (right)
-            if 'right' in exp:
-                print(f"Right term: {exp['right']}")
-                self.term(exp['right'])
+        Ast.Expression : operands [term, term, ...], operators [op, ...]
+        avec op : '+'|'-'|'*'|'/'|'&'|'|'<'|'>'|'=', évalués de gauche à droite
+        """
+        operands = exp.operands
+        operators = exp.operators
+        start = 0
+        if self.optimize and operators and operators[0] == '*' and Folding.constant(operands[0]) is not None:
+            # c * t -> t * c : c n'a pas d'effet de bord
+            self.term(operands[1])
+            self.write_multiply(Folding.constant(operands[0]))
+            start = 1
+        else:
+            self.term(operands[0])
+        for i in range(start, len(operators)):
+            op = operators[i]
+            value = Folding.constant(operands[i + 1]) if self.optimize and op in '*/' else None
+            if value is not None:
+                if op == '*':
+                    self.write_multiply(value)
+                else:
+                    self.write_divide(value)
+                continue
+            self.term(operands[i + 1])
 
             # Générer le code VM pour l'opérateur
-            if exp['op'] == '+':
-                print("VM Code: add")
+            if op == '+':
                 self.write_add()  # Ajoute l'instruction VM pour l'addition
-            elif exp['op'] == '-':
-                print("VM Code: sub")
+            elif op == '-':
                 self.write_sub()  # Ajoute l'instruction VM pour la soustraction
-            elif exp['op'] == '*':
-                print("VM Code: call Math.multiply 2")
+            elif op == '*':
                 self.write_call("Math.multiply", 2)  # Appelle la multiplication
-            elif exp['op'] == '/':
-                print("VM Code: call Math.divide 2")
+            elif op == '/':
                 self.write_call("Math.divide", 2)  # Appelle la division
-            elif exp['op'] == '&':
-                print("VM Code: and")
+            elif op == '&':
                 self.write_and()  # Effectue une opération AND
-            elif exp['op'] == '|':
-                print("VM Code: or")
+            elif op == '|':
                 self.write_or()  # Effectue une opération OR
-            elif exp['op'] == '<':
-                print("VM Code: lt")
+            elif op == '<':
                 self.write_lt()  # Effectue une comparaison inférieure
-            elif exp['op'] == '>':
-                print("VM Code: gt")
+            elif op == '>':
                 self.write_gt()  # Effectue une comparaison supérieure
-            elif exp['op'] == '=':
-                print("VM Code: eq")
+            elif op == '=':
                 self.write_eq()  # Effectue une comparaison d'égalité
 
     def term(self, t):
         """
-        {'line':line, 'col': col,
-        'type': 'int'| 'string'| 'constant'| 'varName'|'call'| 'expression'|'-'|'~',
-         'indice':expression, 'subroutineCall': subroutineCall}
-        """
-        if t['type'] == 'int':
-            self.write_vm(f"push constant {t['value']}")
-        elif t['type'] == 'string':
-            self.handle_string(t['value'])
-        elif t['type'] == 'varName':
-            self.write_vm(f"push {self.get_segment(t['name'])} {self.get_index(t['name'])}")
-        elif t['type'] == 'call':
-            self.subroutineCall(t['subroutineCall'])
-        elif t['type'] == 'expression':
-            self.expression(t['value'])
+        {'type': 'term', 'subType': 'integerConstant'|'stringConstant'|'keywordConstant'|
+        'varName'|'arrayAccess'|'subroutineCall'|'expression'|'unaryOp', ...}
+        """
+        sub_type = t.subType
+        if sub_type == 'integerConstant':
+            self.write_push('constant', t.value)
+        elif sub_type == 'stringConstant':
+            self.handle_string(t.value)
+        elif sub_type == 'keywordConstant':
+            if t.value == 'true':
+                self.write_push('constant', 0)
+                self.write_not()
+            elif t.value == 'this':
+                self.write_push('pointer', 0)
+            else:  # false, null
+                self.write_push('constant', 0)
+        elif sub_type == 'varName':
+            self.write_push_var(t.name, t)
+        elif sub_type == 'arrayAccess':
+            element = self.element(t.name, t.index) if self.optimize else None
+            if element is not None:
+                self.write_push('that', self.write_that(*element))
+                return
+            self.write_push_var(t.name, t)
+            self.expression(t.index)
+            self.write_add()
+            self.write_pop('pointer', 1)
+            self.write_push('that', 0)
+        elif sub_type == 'subroutineCall':
+            self.subroutineCall(t.call)
+        elif sub_type == 'expression':
+            self.expression(t.value)
+        elif sub_type == 'unaryOp':
+            self.term(t.term)
+            if t.op == '-':
+                self.write_neg()
+            else:
+                self.write_not()
 
     def subroutineCall(self, call):
         """
-        {'line':line, 'col': col, 'classvar': className ou varName,
-        'name': subroutineName, 'argument': [expression]}
+        {'type': 'subroutineCall', 'object': className ou varName (absent pour
+        une méthode de la classe), 'name': subroutineName, 'args': [expression]}
         """
-        object_name = call.get('object')  # Objet ou classe
-        subroutine_name = call['name']  # Nom de la méthode
-        args = call['args']  # Arguments de la méthode
+        object_name = call.object  # Objet ou classe
+        subroutine_name = call.name  # Nom de la méthode
+        args = call.args  # Arguments de la méthode
 
-        if object_name:
-            full_name = f"{object_name}.{subroutine_name}"
+        num_args = len(args)
+        if object_name is None:
+            # méthode de l'objet courant
+            self.write_push('pointer', 0)
+            full_name = f"{self.arbre.name}.{subroutine_name}"
+            num_args += 1
+        elif self.symbols.lookup(object_name) is not None:
+            # méthode d'un objet : il est passé en premier argument
+            var = self.symbols.lookup(object_name)
+            self.write_push(self.symbols.segment(var), var.index)
+            full_name = f"{var.type}.{subroutine_name}"
+            num_args += 1
         else:
-            full_name = subroutine_name
+            full_name = f"{object_name}.{subroutine_name}"
         # Traiter les arguments
-        num_args = 0
         for arg in args:
             self.expression(arg)  # Génère le code pour chaque argument
-            num_args += 1
-        self.write_vm(f"call {full_name} {num_args}")
+        self.calls.add(full_name)
+        self.write_call(full_name, num_args)
 
     def handle_string(self, value):
         """
         Gère une chaîne de caractères.
         """
-        self.write_vm(f"push constant {len(value)}")
-        self.write_vm("call String.new 1")
+        if self.pool is not None:
+            statics = self.symbols.count('static')
+            self.write_push('static', self.pool.slot(self.arbre.name, value, statics))
+            return
+        self.write_push('constant', len(value))
+        self.write_call("String.new", 1)
         for char in value:
-            self.write_vm(f"push constant {ord(char)}")
-            self.write_vm("call String.appendChar 2")
+            self.write_push('constant', ord(char))
+            self.write_call("String.appendChar", 2)
+
+    def strings(self):
+        """
+        Écrit la fonction `Classe.$strings` du pool (voir Pool).
+        """
+        class_name = self.arbre.name
+        statics = self.symbols.count('static')
+        self.pool.declare(class_name, statics)
+        if class_name == 'Main':
+            if self.pool.size() > Pool.STATICS:
+                self.error(f"Trop de variables static avec le pool : {self.pool.size()} pour {Pool.STATICS} mots",
+                           self.arbre)
+            # construit chaque chaîne du programme, puis la donne aux classes qui l'utilisent
+            self.write_function("Main.$strings", 0)
+            for value, index in self.pool.strings.items():
+                self.write_push('constant', len(value))
+                self.write_call("String.new", 1)
+                for char in value:
+                    self.write_push('constant', ord(char))
+                    self.write_call("String.appendChar", 2)
+                self.write_pop('static', statics + index)
+            for name, values in self.pool.classes.items():
+                for value in values:
+                    self.write_push('static', statics + self.pool.strings[value])
+                self.write_call(f"{name}.$strings", len(values))
+                self.write_pop('temp', 0)
+        elif class_name in self.pool.classes:
+            self.write_function(f"{class_name}.$strings", 0)
+            for index in range(len(self.pool.classes[class_name])):
+                self.write_push('argument', index)
+                self.write_pop('static', statics + index)
+        else:
+            return
+        self.write_push('constant', 0)
+        self.write_return()
 
-    def get_segment(self, var_name):
+    def get_var(self, var_name, node=None):
         """
-        Récupère le segment de mémoire pour une variable.
+        Retourne la variable (voir SymbolTable), en cherchant d'abord dans le sous-programme.
         """
-        for var in self.symbolClassTable + self.symbolRoutineTable:
-            if var['name'] == var_name:
-                return {'static': 'static', 'field': 'this', 'argument': 'argument', 'local': 'local'}[var['kind']]
-        self.error(f"Variable inconnue: {var_name}")
+        var = self.symbols.lookup(var_name)
+        if var is None:
+            self.error(f"Variable inconnue: {var_name}", node)
+        return var
 
-    def get_index(self, var_name):
-        """
-        Récupère l'index d'une variable dans son segment.
-        """
-        for i, var in enumerate(self.symbolClassTable + self.symbolRoutineTable):
-            if var['name'] == var_name:
-                return i
-        self.error(f"Variable inconnue: {var_name}")
 
     def new_label(self):
         """
@@ -321,93 +515,317 @@ class Generator:
         return label
 
     def write_vm(self, command):
-        """Writes VM command to the file and also prints it for debugging."""
-        print(command)  # Debugging line
-        self.vmfile.write(command + '\n')
+        """Appends a VM command (see Vm) to the output and also traces it."""
+        if Trace.level >= Trace.NODES:
+            Trace.write(str(command))
+        self.output.append(command)
+
+    def interface(self):
+        """
+        Ce que les autres classes voient de celle-ci, et ce qu'elle appelle :
+        {'name', 'fields', 'statics', 'subroutines': {nom: [sorte, nombre de paramètres,
+        type retourné, modèle à recopier ou None (voir Inlining.templates)]},
+        'calls': ['Classe.nom', ...]}
+        """
+        return {
+            'name': self.arbre.name,
+            'fields': self.classtable.fields,
+            'statics': self.classtable.statics,
+            'subroutines': {routine.name: [routine.subroutineType, len(routine.parameters), routine.returnType,
+                                           self.templates.get(routine.name)]
+                            for routine in self.arbre.subroutineDec},
+            'calls': sorted(self.calls),
+        }
+
+    def vm(self):
+        """Texte du fichier .vm de la classe"""
+        return self.module().text(f"// Class {self.arbre.name}\n")
 
-    def error(self, message=''):
-        print(f"SyntaxError: {message}")
-        exit()
+    def module(self):
+        """Commandes VM de la classe, pour le VMTranslator sans passer par le texte"""
+        return Vm.Module(self.arbre.name, self.output)
+
+    def write(self, directory='.'):
+        """Écrit `<Classe>.vm` dans `directory`"""
+        save(os.path.join(directory, self.arbre.name + '.vm'), self.vm())
+
+    def error(self, message='', node=None):
+        """
+        Lève une erreur sémantique, à la position de `node` ou du noeud en cours (voir Ast.Node).
+        """
+        line, col = self.parser.lexer.where(node if node is not None else self.node)
+        raise Diagnostic.Error(message, line, col, self.file, 'SemanticError')
 
 
     def write_push(self, segment, index):
         """Génère une instruction VM pour un 'push'."""
-        self.output.append(f"push {segment} {index}")
+        self.write_vm(Vm.PushPop('push', segment, index))
 
     def write_pop(self, segment, index):
         """Génère une instruction VM pour un 'pop'."""
-        self.output.append(f"pop {segment} {index}")
+        if segment == 'pointer' and index == 1:
+            self.that = None
+        self.write_vm(Vm.PushPop('pop', segment, index))
+
+    def write_push_var(self, var_name, node=None):
+        """Génère un 'push' de la variable."""
+        var = self.get_var(var_name, node)
+        self.write_push(self.symbols.segment(var), var.index)
+
+    def write_pop_var(self, var_name):
+        """Génère un 'pop' dans la variable."""
+        var = self.get_var(var_name)
+        if self.that is not None and var_name in self.that:
+            self.that = None
+        self.write_pop(self.symbols.segment(var), var.index)
 
     def write_add(self):
         """Génère une instruction VM pour l'addition."""
-        self.output.append("add")
+        self.write_vm(Vm.Arithmetic('add'))
 
     def write_sub(self):
         """Génère une instruction VM pour la soustraction."""
-        self.output.append("sub")
+        self.write_vm(Vm.Arithmetic('sub'))
 
     def write_neg(self):
         """Génère une instruction VM pour la négation."""
-        self.output.append("neg")
+        self.write_vm(Vm.Arithmetic('neg'))
 
     def write_eq(self):
         """Génère une instruction VM pour la comparaison d'égalité."""
-        self.output.append("eq")
+        self.write_vm(Vm.Arithmetic('eq'))
 
     def write_gt(self):
         """Génère une instruction VM pour la comparaison 'greater than'."""
-        self.output.append("gt")
+        self.write_vm(Vm.Arithmetic('gt'))
 
     def write_lt(self):
         """Génère une instruction VM pour la comparaison 'less than'."""
-        self.output.append("lt")
+        self.write_vm(Vm.Arithmetic('lt'))
 
     def write_and(self):
         """Génère une instruction VM pour l'opération logique AND."""
-        self.output.append("and")
+        self.write_vm(Vm.Arithmetic('and'))
 
     def write_or(self):
         """Génère une instruction VM pour l'opération logique OR."""
-        self.output.append("or")
+        self.write_vm(Vm.Arithmetic('or'))
 
     def write_not(self):
         """Génère une instruction VM pour l'opération logique NOT."""
-        self.output.append("not")
+        self.write_vm(Vm.Arithmetic('not'))
+
+    def write_multiply(self, value):
+        """
+        Multiplie le sommet de la pile par la constante `value`, avec le même
+        résultat que Math.multiply (modulo 2^16) : doublements et additions,
+        bit à bit de |value| (temp 1 garde le multiplicande, temp 2 sert à
+        doubler). Au-delà de MULTIPLY_STEPS opérations, appelle Math.multiply.
+        """
+        magnitude = abs(value)
+        bits = bin(magnitude)[3:]
+        if value == 0:
+            self.write_pop('temp', 1)
+            self.write_push('constant', 0)
+            return
+        if value == -32768 or len(bits) + bits.count('1') > MULTIPLY_STEPS:
+            self.term(Folding.literal(value))
+            self.write_call("Math.multiply", 2)
+            return
+        if bits:
+            self.write_pop('temp', 1)
+            self.write_push('temp', 1)
+        for i, bit in enumerate(bits):
+            if i > 0:
+                self.write_pop('temp', 2)
+                self.write_push('temp', 2)
+                self.write_push('temp', 2)
+            else:
+                # le premier doublement ajoute le multiplicande à lui-même
+                self.write_push('temp', 1)
+            self.write_add()
+            if bit == '1':
+                self.write_push('temp', 1)
+                self.write_add()
+        if value < 0:
+            self.write_neg()
+
+    def write_divide(self, value):
+        """
+        Divise le sommet de la pile par la constante `value`, avec le même
+        résultat que Math.divide : par ±2^k (k <= 13), write_shift décale au
+        lieu de diviser.
+        """
+        magnitude = abs(value)
+        if magnitude & (magnitude - 1) == 0 and 0 < magnitude <= 8192:
+            if magnitude > 1:
+                self.write_shift(magnitude)
+            if value < 0:
+                self.write_neg()
+            return
+        self.term(Folding.literal(value))
+        self.write_call("Math.divide", 2)
+
+    def write_shift(self, magnitude):
+        """
+        Décale le sommet de la pile de k bits vers la droite, `magnitude`
+        valant 2^k : |x| est recopié bit à bit à partir du bit k, puis le
+        signe de x est remis (division tronquée vers 0, comme Math.divide).
+        Le code est sur place, sans appel à l'OS : temp 1 garde |x|, temp 2
+        le résultat, temp 3 le bit lu, temp 4 le bit écrit et temp 5 le signe.
+        """
+        positive, loop, next, end, done = (self.new_label() for _ in range(5))
+        self.write_pop('temp', 1)
+        self.write_push('temp', 1)
+        self.write_push('constant', 0)
+        self.write_lt()
+        self.write_pop('temp', 5)
+        self.write_push('temp', 5)
+        self.write_not()
+        self.write_if(positive)
+        self.write_push('temp', 1)
+        self.write_neg()
+        self.write_pop('temp', 1)
+        self.write_label(positive)
+        self.write_push('constant', 0)
+        self.write_pop('temp', 2)
+        self.write_push('constant', magnitude)
+        self.write_pop('temp', 3)
+        self.write_push('constant', 1)
+        self.write_pop('temp', 4)
+        self.write_label(loop)
+        # plus aucun bit de |x| à partir du bit lu (-2^i masque les bits >= i)
+        self.write_push('temp', 1)
+        self.write_push('temp', 3)
+        self.write_neg()
+        self.write_and()
+        self.write_push('constant', 0)
+        self.write_eq()
+        self.write_if(end)
+        self.write_push('temp', 1)
+        self.write_push('temp', 3)
+        self.write_and()
+        self.write_push('constant', 0)
+        self.write_eq()
+        self.write_if(next)
+        self.write_push('temp', 2)
+        self.write_push('temp', 4)
+        self.write_or()
+        self.write_pop('temp', 2)
+        self.write_label(next)
+        self.write_push('temp', 3)
+        self.write_push('temp', 3)
+        self.write_add()
+        self.write_pop('temp', 3)
+        self.write_push('temp', 4)
+        self.write_push('temp', 4)
+        self.write_add()
+        self.write_pop('temp', 4)
+        self.write_goto(loop)
+        self.write_label(end)
+        self.write_push('temp', 5)
+        self.write_not()
+        self.write_if(done)
+        self.write_push('temp', 2)
+        self.write_neg()
+        self.write_pop('temp', 2)
+        self.write_label(done)
+        self.write_push('temp', 2)
 
     def write_call(self, name, num_args):
         """Génère une instruction VM pour appeler une fonction."""
-        self.output.append(f"call {name} {num_args}")
+        self.write_vm(Vm.Function('call', name, num_args))
+        # THAT est restauré au retour, mais l'appel a pu modifier un champ ou une variable static
+        self.stored()
 
     def write_return(self):
         """Génère une instruction VM pour retourner d'une fonction."""
-        self.output.append("return")
+        self.write_vm(Vm.Return())
 
     def write_function(self, name, num_locals):
         """Génère une instruction VM pour définir une fonction."""
-        self.output.append(f"function {name} {num_locals}")
+        self.write_vm(Vm.Function('function', name, num_locals))
 
     def write_label(self, label):
         """Génère une instruction VM pour un label."""
-        self.output.append(f"label {label}")
+        self.write_vm(Vm.Branching('label', label))
+        self.that = None
 
     def write_goto(self, label):
         """Génère une instruction VM pour un saut inconditionnel."""
-        self.output.append(f"goto {label}")
+        self.write_vm(Vm.Branching('goto', label))
 
     def write_if(self, label):
         """Génère une instruction VM pour un saut conditionnel."""
-        self.output.append(f"if-goto {label}")
+        self.write_vm(Vm.Branching('if-goto', label))
 
     def get_vm_output(self):
         return self.get_output()
 
     def get_output(self):
         """Retourne le code VM généré sous forme de chaîne."""
-        return "\n".join(self.output)
+        return "\n".join(str(command) for command in self.output)
+
+def _contains(node, sub_types):
+    """Vrai si l'expression ou le terme contient un terme de l'un des `sub_types`"""
+    if node.type == 'expression':
+        return any(_contains(term, sub_types) for term in node.operands)
+    if node.subType in sub_types:
+        return True
+    if node.subType == 'arrayAccess':
+        return _contains(node.index, sub_types)
+    if node.subType == 'subroutineCall':
+        return any(_contains(arg, sub_types) for arg in node.call.args)
+    if node.subType == 'expression':
+        return _contains(node.value, sub_types)
+    if node.subType == 'unaryOp':
+        return _contains(node.term, sub_types)
+    return False
+
+
+def analyse(file, source=None, optimize=False, debug=()):
+    """Analyse une classe, première moitié du Generator : lecture, représentations
+    `debug` de l'arbre, table figée des variables de la classe (voir
+    SymbolTable.freeze) et, avec `optimize`, Folding et modèles de Inlining ;
+    sans `optimize`, il n'y a ni modèles ({}) ni `folding` (None)"""
+    with Trace.span('parse'):
+        parser = Parser.Parser(file, source)
+        arbre = parser.jackclass()
+    if 'xml' in debug:
+        with Trace.span('xml'):
+            toxml.save(file, arbre)
+    if 'dot' in debug:
+        with Trace.span('dot'):
+            todot.Todot(file).todot(arbre)
+    classtable = SymbolTable.SymbolTable.fromClass(arbre, file, parser.lexer).freeze()
+    # sous-programmes que les autres classes peuvent recopier (voir Generator.interface)
+    templates = {}
+    folding = None
+    if optimize:
+        with Trace.span('optimize'):
+            folding = Folding.Folding()
+            arbre = folding.jackclass(arbre)
+            templates = Inlining.templates(arbre, classtable)
+    return Analysis(parser, arbre, classtable, templates, folding)
+
+
+def save(path, text):
+    """Écrit le fichier d'un coup : un lecteur voit l'ancien ou le nouveau, jamais un fichier à moitié écrit"""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp, "w") as file:
+            file.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
 
 if __name__ == '__main__':
     file = sys.argv[1]
     print('-----debut')
     generator = Generator(file)
     generator.jackclass()
-    print('-----fin')
\ No newline at end of file
+    generator.write()
+    print('-----fin')
@@ -0,0 +1,312 @@
+"""No comment"""
+import copy
+import sys
+import Ast
+import Folding
+
+# dépendance des lectures en mémoire : champs, variables static et éléments de tableau
+MEMORY = '[]'
+
+
+class Hoisting:
+    """Réutilisation des sous-expressions, entre Folding et Generator.
+
+    Une sous-expression pure (sans appel, sans chaîne littérale, sans
+    division par une valeur qui peut être nulle) calculée plusieurs fois
+    dans un bloc d'instructions (let et do qui se suivent, jusqu'à la
+    condition d'un if ou à un return) est calculée une fois dans une
+    locale ajoutée `$n`, si rien ne modifie entre-temps les variables
+    qu'elle lit. Un calcul pur du corps ou de la condition d'un while
+    dont aucune variable n'est modifiée dans la boucle en sort de la même
+    façon, dans une locale calculée juste avant le while.
+
+    Un appel, un `let a[i]` ou un `let` d'un champ ou d'une variable
+    static peuvent modifier n'importe quelle case de la mémoire (par un
+    autre objet, un tableau qui désigne l'objet...) : ils invalident tout
+    ce qui lit un champ, une variable static ou un tableau. Les variables
+    locales et les arguments ne changent que par un `let`.
+    """
+
+    def __init__(self):
+        self.reused = 0
+        self.hoisted = 0
+
+    def jackclass(self, arbre):
+        """No comment"""
+        for routine in arbre.subroutineDec:
+            self.subroutine(routine)
+        return arbre
+
+    def subroutine(self, routine):
+        """No comment"""
+        self.locals = {param.name for param in routine.parameters}
+        self.locals.update(name for var in routine.body.vars for name in var.vars)
+        # locales ajoutées, et celles qui ne servent plus
+        self.temps = []
+        self.free = []
+        routine.body.statements = self.statements(routine.body.statements)
+        if self.temps:
+            routine.body.vars.append(Ast.VarDec('int', list(self.temps)))
+
+    def statements(self, statements):
+        """No comment"""
+        held = []
+        res = []
+        for statement in statements:
+            instruction_type = statement.type
+            if instruction_type == 'whileStatement':
+                res.extend(self.hoist(statement, held))
+                statement.body = self.statements(statement.body)
+            elif instruction_type == 'ifStatement':
+                statement.ifStatements = self.statements(statement.ifStatements)
+                if statement.elseStatements is not None:
+                    statement.elseStatements = self.statements(statement.elseStatements)
+            res.append(statement)
+        res = self.common(res)
+        # les locales des boucles restent réservées jusqu'à la fin de la liste
+        self.free.extend(held)
+        return res
+
+    def hoist(self, loop, held):
+        """Instructions `let $n = e` à placer avant la boucle, pour ses calculs invariants"""
+        lets = []
+        while True:
+            self.events = []
+            self.statement(loop.condition)
+            for statement in loop.body:
+                self.nested(statement)
+            killed = set()
+            for event in self.events:
+                if event[0] == 'kill':
+                    killed.add(event[1])
+            best = None
+            for event in self.events:
+                if event[0] == 'use' and not event[3] & killed and (best is None or event[2] > best[2]):
+                    best = event
+            if best is None:
+                return lets
+            uses = [event for event in self.events if event[0] == 'use' and event[1] == best[1]]
+            # un calcul déjà sorti de la boucle peut contenir celui-ci
+            self.events = []
+            for let in lets:
+                self.statement(let)
+            uses += [event for event in self.events if event[0] == 'use' and event[1] == best[1]]
+            name = self.allocate()
+            held.append(name)
+            let = Ast.LetStatement(name, None, _clone(best[4]))
+            for event in uses:
+                _replace(event[4], name)
+            # il est plus petit que les précédents, qui peuvent l'utiliser
+            lets.insert(0, let)
+            self.hoisted += 1
+
+    def nested(self, statement):
+        """Événements d'une instruction et de toutes celles qu'elle contient"""
+        self.statement(statement)
+        instruction_type = statement.type
+        if instruction_type == 'ifStatement':
+            for instr in statement.ifStatements + (statement.elseStatements or []):
+                self.nested(instr)
+        elif instruction_type == 'whileStatement':
+            for instr in statement.body:
+                self.nested(instr)
+
+    def common(self, statements):
+        """Calcule une seule fois ce qui est calculé plusieurs fois dans un même bloc"""
+        temps = []
+        while True:
+            self.events = []
+            starts = []
+            for statement in statements:
+                starts.append(len(self.events))
+                self.events.append(('start', len(starts) - 1))
+                if statement.type != 'whileStatement':
+                    self.statement(statement)
+                if statement.type != 'letStatement' and statement.type != 'doStatement':
+                    # fin du bloc : plus rien n'est disponible
+                    self.events.append(('kill', None))
+            best = self.best(starts)
+            if best is None:
+                break
+            first, uses = best
+            name = self.allocate()
+            temps.append(name)
+            statements.insert(first, Ast.LetStatement(name, None, _clone(uses[0][4])))
+            for event in uses:
+                _replace(event[4], name)
+            self.reused += len(uses) - 1
+        self.free.extend(temps)
+        return statements
+
+    def best(self, starts):
+        """(indice de l'instruction avant laquelle calculer, utilisations) de la réutilisation la plus rentable, ou None"""
+        seen = set()
+        repeated = set()
+        for event in self.events:
+            if event[0] == 'use':
+                if event[1] in seen:
+                    repeated.add(event[1])
+                seen.add(event[1])
+        if not repeated:
+            return None
+        kills = {}
+        barrier = -1
+        current = None
+        # clé -> [instruction de départ, position du départ, utilisations]
+        ranges = {}
+        closed = []
+        for position, event in enumerate(self.events):
+            kind = event[0]
+            if kind == 'start':
+                current = event[1]
+            elif kind == 'kill':
+                if event[1] is None:
+                    barrier = position
+                else:
+                    kills[event[1]] = position
+            elif event[1] in repeated:
+                key, deps = event[1], event[3]
+                last = max([barrier] + [kills.get(dep, -1) for dep in deps])
+                entry = ranges.get(key)
+                if entry is not None and last < entry[1]:
+                    entry[2].append(event)
+                    continue
+                if entry is not None:
+                    closed.append(entry)
+                    del ranges[key]
+                if last < starts[current]:
+                    ranges[key] = [current, starts[current], [event]]
+        best, saving = None, 0
+        for first, _, uses in closed + list(ranges.values()):
+            # n calculs de coût c, contre un calcul, un pop et n push
+            gain = (uses[0][2] - 1) * (len(uses) - 1) - 2
+            if gain > saving:
+                best, saving = (first, uses), gain
+        return best
+
+    def allocate(self):
+        """No comment"""
+        if self.free:
+            return self.free.pop()
+        name = f'${len(self.temps)}'
+        self.temps.append(name)
+        self.locals.add(name)
+        return name
+
+    # Parcours dans l'ordre d'évaluation. Les événements sont
+    # ('kill', variable ou MEMORY) et ('use', clé, coût, dépendances, lieu),
+    # où le lieu (voir _replace) désigne le terme ou le début d'expression.
+
+    def statement(self, statement):
+        """Événements d'une instruction (d'un if et d'un while : sa condition seulement)"""
+        if isinstance(statement, Ast.Expression):
+            self.expression(statement)
+            return
+        instruction_type = statement.type
+        if instruction_type == 'letStatement':
+            if statement.index is not None:
+                self.expression(statement.index)
+            self.expression(statement.value)
+            if statement.index is not None or statement.name not in self.locals:
+                self.events.append(('kill', MEMORY))
+            if statement.index is None:
+                self.events.append(('kill', statement.name))
+        elif instruction_type == 'doStatement':
+            self.call(statement.call)
+        elif instruction_type in ('ifStatement', 'whileStatement'):
+            self.expression(statement.condition)
+        elif instruction_type == 'returnStatement':
+            if statement.expression is not None:
+                self.expression(statement.expression)
+
+    def call(self, call):
+        """No comment"""
+        for arg in call.args:
+            self.expression(arg)
+        self.events.append(('kill', MEMORY))
+
+    def expression(self, exp):
+        """(clé, coût, dépendances) de l'expression, ou None si elle n'est pas pure"""
+        operands = exp.operands
+        info = self.term(operands[0], operands, 0)
+        for i, op in enumerate(exp.operators):
+            right = self.term(operands[i + 1], operands, i + 1)
+            if info is None or right is None:
+                info = None
+                continue
+            if op == '/' and right[0][0] == 'c' and right[0][1] != 0:
+                cost = 10
+            elif op == '/':
+                info = None
+                continue
+            elif op == '*':
+                cost = 8 if right[0][0] == 'c' or info[0][0] == 'c' else 20
+            else:
+                cost = 1
+            info = (('e', info[0], op, right[0]), info[1] + right[1] + cost, info[2] | right[2])
+            self.events.append(('use',) + info + ((exp, i + 2),))
+        return info
+
+    def term(self, t, owner, where):
+        """(clé, coût, dépendances) du terme owner[where], ou None s'il n'est pas pur"""
+        sub_type = t.subType
+        if sub_type == 'varName':
+            deps = {t.name} if t.name in self.locals else {t.name, MEMORY}
+            return ('v', t.name), 1, frozenset(deps)
+        if sub_type == 'expression':
+            return self.expression(t.value)
+        if sub_type == 'subroutineCall':
+            self.call(t.call)
+            return None
+        if sub_type == 'arrayAccess':
+            index = self.expression(t.index)
+            if index is None:
+                return None
+            info = (('a', t.name, index[0]), index[1] + 4, index[2] | {t.name, MEMORY})
+        elif sub_type == 'unaryOp':
+            value = Folding.constant(t)
+            if value is not None:
+                return ('c', value), 1, frozenset()
+            inner = self.term(t.term, t, 'term')
+            if inner is None:
+                return None
+            info = (('u', t.op, inner[0]), inner[1] + 1, inner[2])
+        elif sub_type == 'stringConstant':
+            return None
+        else:
+            value = Folding.constant(t)
+            return ('c' if value is not None else 'k', value if value is not None else t.value), 1, frozenset()
+        self.events.append(('use',) + info + ((owner, where),))
+        return info
+
+
+def _replace(location, name):
+    """Remplace par la variable `name` le terme owner[where], le terme
+    owner.where, ou (pour une expression) ses `where` premiers termes"""
+    owner, where = location
+    if isinstance(owner, Ast.Expression):
+        owner.operands = [Ast.VarName(name)] + list(owner.operands[where:])
+        owner.operators = list(owner.operators[where - 1:])
+    elif isinstance(where, str):
+        setattr(owner, where, Ast.VarName(name))
+    else:
+        owner[where] = Ast.VarName(name)
+
+
+def _clone(location):
+    """Copie de ce que désigne `location`, en expression"""
+    owner, where = location
+    if isinstance(owner, Ast.Expression):
+        return Ast.Expression(copy.deepcopy(list(owner.operands[:where])), list(owner.operators[:where - 1]))
+    term = getattr(owner, where) if isinstance(where, str) else owner[where]
+    return Ast.Expression([copy.deepcopy(term)], [])
+
+
+if __name__ == "__main__":
+    import Parser
+    file = sys.argv[1]
+    print('-----debut')
+    hoisting = Hoisting()
+    print(Ast.todict(hoisting.jackclass(Folding.Folding().jackclass(Parser.Parser(file).jackclass()))))
+    print(f'{hoisting.reused} calculs réutilisés, {hoisting.hoisted} calculs sortis des boucles')
+    print('-----fin')
@@ -0,0 +1,290 @@
+"""No comment"""
+import copy
+import sys
+import Ast
+import Folding
+import SymbolTable
+import Trace
+
+# taille maximale (en termes) d'un sous-programme remplacé par son corps
+INLINE_SIZE = 8
+
+
+def templates(arbre, table):
+    """
+    Modèles des petits sous-programmes de la classe que les appelants
+    peuvent remplacer par leur corps : {nom: modèle}. Un modèle est fait
+    de listes et de dicts (il est écrit dans l'interface de la classe) :
+    {'kind', 'params': [nom], 'fields': {nom: indice}, 'statics': [nom],
+    'lets': [[champ ou static, expression]], 'return': expression ou None},
+    où les expressions sont celles de Ast.todict.
+
+    Un sous-programme est retenu si c'est une méthode ou une fonction sans
+    variable locale, faite de `let` de champs ou de variables static puis
+    d'un `return`, dont les expressions n'ont ni appel (hors * et /), ni
+    tableau, ni chaîne, et qui compte au plus INLINE_SIZE termes.
+    `table` est la table figée de la classe (voir SymbolTable.freeze).
+    """
+    fields = {name: symbol.index for name, symbol in table.symbols.items() if symbol.kind == 'field'}
+    statics = {name for name, symbol in table.symbols.items() if symbol.kind == 'static'}
+    res = {}
+    for routine in arbre.subroutineDec:
+        template = _template(routine, fields, statics)
+        if template is not None:
+            res[routine.name] = template
+    return res
+
+
+def _template(routine, fields, statics):
+    if routine.subroutineType not in ('method', 'function') or routine.body.vars:
+        return None
+    statements = routine.body.statements
+    if not statements or statements[-1].type != 'returnStatement':
+        return None
+    params = [param.name for param in routine.parameters]
+    if routine.subroutineType == 'function':
+        fields = {}
+    names = set()
+    size = [0]
+
+    def simple(node):
+        # vrai si l'expression ou le terme n'a que des constantes, des variables et des opérateurs
+        if node.type == 'expression':
+            return all(simple(term) for term in node.operands)
+        size[0] += 1
+        sub_type = node.subType
+        if sub_type == 'varName':
+            names.add(node.name)
+            return node.name in params or node.name in fields or node.name in statics
+        if sub_type == 'keywordConstant':
+            return node.value != 'this' or routine.subroutineType == 'method'
+        if sub_type == 'expression':
+            return simple(node.value)
+        if sub_type == 'unaryOp':
+            return simple(node.term)
+        return sub_type == 'integerConstant'
+
+    lets = []
+    for statement in statements[:-1]:
+        if (statement.type != 'letStatement' or statement.index is not None
+                or statement.name in params or not simple(statement.value)):
+            return None
+        if statement.name not in fields and statement.name not in statics:
+            return None
+        names.add(statement.name)
+        lets.append([statement.name, Ast.todict(statement.value)])
+    value = statements[-1].expression
+    if value is not None and not simple(value):
+        return None
+    if size[0] > INLINE_SIZE:
+        return None
+    return {'kind': routine.subroutineType, 'params': params,
+            'fields': {name: index for name, index in fields.items() if name in names},
+            'statics': sorted(name for name in statics if name in names and name not in params),
+            'lets': lets, 'return': Ast.todict(value) if value is not None else None}
+
+
+class Inlining:
+    """Remplace les appels des petits sous-programmes par leur corps, entre Folding et Hoisting.
+
+    `index` donne les modèles (voir templates) de toutes les classes du
+    programme : {classe: {nom: modèle}}. Un appel dont les arguments sont
+    des constantes ou des variables est remplacé :
+    - dans une expression, si le sous-programme ne fait que `return e` :
+      par e ;
+    - dans un `do` : par ses `let`, la valeur retournée est ignorée.
+
+    Les champs de l'objet appelé sont lus et écrits comme les éléments
+    d'un tableau, `objet[indice]` : THIS ne change pas, l'appelant garde
+    ses propres champs. Un appel sans objet (méthode de la classe
+    courante) utilise directement les noms des champs. Les variables
+    static de l'appelé ne sont accessibles que dans sa propre classe.
+    Un corps qui écrit plusieurs champs n'est recopié que si l'objet et
+    les arguments sont des variables locales ou des arguments, que ces
+    écritures ne peuvent pas modifier.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        # appels remplacés : ('Classe.appelant', 'Classe.appelé')
+        self.sites = []
+        # sous-programmes recopiés, dont la classe dépend (voir Generator.interface)
+        self.calls = set()
+
+    def jackclass(self, arbre, table, file=None, lexer=None):
+        """`table` : table figée de la classe (types des variables), voir SymbolTable.freeze ;
+        `file` et `lexer` situent les erreurs des sous-programmes"""
+        self.arbre = arbre
+        self.symbols = symbols = SymbolTable.SymbolTable.fromFrozen(table, file, lexer)
+        for routine in arbre.subroutineDec:
+            self.routine = routine
+            symbols.startSubroutine()
+            if routine.subroutineType == 'method':
+                symbols.define('this', arbre.name, 'argument', routine)
+            for param in routine.parameters:
+                symbols.define(param.name, param.type, 'argument', param)
+            for var in routine.body.vars:
+                for name in var.vars:
+                    symbols.define(name, var.varType, 'local', var)
+            routine.body.statements = self.statements(routine.body.statements)
+        return arbre
+
+    def statements(self, statements):
+        """No comment"""
+        res = []
+        for statement in statements:
+            instruction_type = statement.type
+            if instruction_type == 'doStatement':
+                self.call(statement.call)
+                lets = self.inline(statement.call, False)
+                if lets is not None:
+                    res.extend(lets)
+                    continue
+            elif instruction_type == 'letStatement':
+                if statement.index is not None:
+                    statement.index = self.expression(statement.index)
+                statement.value = self.expression(statement.value)
+            elif instruction_type == 'ifStatement':
+                statement.condition = self.expression(statement.condition)
+                statement.ifStatements = self.statements(statement.ifStatements)
+                if statement.elseStatements is not None:
+                    statement.elseStatements = self.statements(statement.elseStatements)
+            elif instruction_type == 'whileStatement':
+                statement.condition = self.expression(statement.condition)
+                statement.body = self.statements(statement.body)
+            elif instruction_type == 'returnStatement':
+                if statement.expression is not None:
+                    statement.expression = self.expression(statement.expression)
+            res.append(statement)
+        return res
+
+    def expression(self, exp):
+        """No comment"""
+        exp.operands = [self.term(term) for term in exp.operands]
+        return exp
+
+    def term(self, t):
+        """Le terme, ou ce qui remplace l'appel qu'il fait"""
+        sub_type = t.subType
+        if sub_type == 'subroutineCall':
+            self.call(t.call)
+            value = self.inline(t.call, True)
+            if value is not None:
+                return value.operands[0] if not value.operators else Ast.GroupTerm(value)
+        elif sub_type == 'arrayAccess':
+            t.index = self.expression(t.index)
+        elif sub_type == 'expression':
+            t.value = self.expression(t.value)
+        elif sub_type == 'unaryOp':
+            t.term = self.term(t.term)
+        return t
+
+    def call(self, call):
+        """No comment"""
+        call.args = [self.expression(arg) for arg in call.args]
+
+    def inline(self, call, value):
+        """
+        Ce qui remplace l'appel : son expression (`value` vrai) ou la liste
+        de ses `let` ; None s'il doit rester un appel.
+        """
+        receiver = None
+        if call.object is None:
+            class_name = self.arbre.name
+        else:
+            var = self.symbols.lookup(call.object)
+            if var is not None:
+                class_name, receiver = var.type, var
+            else:
+                class_name = call.object
+        template = self.index.get(class_name, {}).get(call.name)
+        if template is None or len(call.args) != len(template['params']):
+            return None
+        if value and (template['lets'] or template['return'] is None):
+            return None
+        if (template['kind'] == 'method') != (call.object is None or receiver is not None):
+            return None
+        if template['statics'] and class_name != self.arbre.name:
+            return None
+        args = [arg.operands[0] for arg in call.args if not arg.operators]
+        if len(args) != len(call.args):
+            return None
+        for arg in args:
+            if Folding.constant(arg) is None and arg.subType != 'varName':
+                return None
+            if len(template['lets']) > 1 and arg.subType == 'varName' and not self.fixed(arg.name):
+                return None
+        if receiver is not None and len(template['lets']) > 1 and not self.fixed(call.object):
+            return None
+        names = template['statics'] + (list(template['fields']) if call.object is None else [])
+        if any(self.hidden(name) for name in names if name not in template['params']):
+            return None
+
+        env = dict(zip(template['params'], args))
+        self.calls.add(f"{class_name}.{call.name}")
+        self.sites.append((f"{self.arbre.name}.{self.routine.name}", f"{class_name}.{call.name}"))
+        if Trace.level >= Trace.PHASES:
+            Trace.write(f"Inlining {self.arbre.name}.{self.routine.name}: {class_name}.{call.name}")
+        if value:
+            return self.build(template['return'], template, env, call.object)
+        lets = []
+        for name, exp in template['lets']:
+            exp = self.build(exp, template, env, call.object)
+            if name in template['fields'] and call.object is not None:
+                lets.append(Ast.LetStatement(call.object, _constant(template['fields'][name]), exp))
+            else:
+                lets.append(Ast.LetStatement(name, None, exp))
+        return lets
+
+    def fixed(self, name):
+        """Vrai si la variable est une locale ou un argument"""
+        var = self.symbols.lookup(name)
+        return var is not None and var.kind in ('local', 'argument')
+
+    def hidden(self, name):
+        """Vrai si la variable de classe est cachée par une variable de l'appelant"""
+        var = self.symbols.lookup(name)
+        return var is not None and var.kind not in ('field', 'static')
+
+    def build(self, exp, template, env, receiver):
+        """L'expression `exp` du modèle (un dict de Ast.todict) à l'endroit de l'appel"""
+        terms = exp['terms']
+        return Ast.Expression([self.buildterm(term, template, env, receiver) for term in terms[0::2]],
+                              [term['op'] for term in terms[1::2]])
+
+    def buildterm(self, term, template, env, receiver):
+        """No comment"""
+        sub_type = term['subType']
+        if sub_type == 'integerConstant':
+            return Ast.IntegerConstant(term['value'])
+        if sub_type == 'keywordConstant':
+            if term['value'] == 'this' and receiver is not None:
+                return Ast.VarName(receiver)
+            return Ast.KeywordConstant(term['value'])
+        if sub_type == 'varName':
+            name = term['name']
+            if name in env:
+                return copy.deepcopy(env[name])
+            if name in template['fields'] and receiver is not None:
+                return Ast.ArrayAccess(receiver, _constant(template['fields'][name]))
+            return Ast.VarName(name)
+        if sub_type == 'expression':
+            return Ast.GroupTerm(self.build(term['value'], template, env, receiver))
+        return Ast.UnaryOp(term['op'], self.buildterm(term['term'], template, env, receiver))
+
+
+def _constant(value):
+    return Ast.Expression([Ast.IntegerConstant(str(value))], [])
+
+
+if __name__ == "__main__":
+    import Parser
+    file = sys.argv[1]
+    print('-----debut')
+    arbre = Folding.Folding().jackclass(Parser.Parser(file).jackclass())
+    table = SymbolTable.SymbolTable.fromClass(arbre, file).freeze()
+    print(templates(arbre, table))
+    inlining = Inlining({arbre.name: templates(arbre, table)})
+    print(Ast.todict(inlining.jackclass(arbre, table, file)))
+    print(f'{len(inlining.sites)} appels remplacés')
+    print('-----fin')
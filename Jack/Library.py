@@ -0,0 +1,217 @@
+"""No comment"""
+import collections
+import glob
+import hashlib
+import io
+import json
+import os
+import sys
+import Compiler
+import Diagnostic
+import Generator
+import Pool
+import Vm
+
+# modules de l'OS (Jack/os), lus une fois (voir library)
+_library = None
+# nombre d'entrées d'un Cache par défaut
+CACHE_SIZE = 1024
+
+
+class Cache:
+    """Cache LRU des étapes de compile et translate, gardé d'un appel à l'autre (voir Server).
+
+    Il retient les modèles de Inlining de chaque classe, les classes
+    compilées et les modules VM lus, au plus `size` entrées : la moins
+    récemment utilisée est oubliée. Les clés contiennent une empreinte
+    du texte des sources et les options, une source modifiée n'y
+    retrouve donc jamais un résultat périmé.
+    """
+
+    def __init__(self, size=CACHE_SIZE):
+        self.size = size
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, make):
+        """Valeur de `key`, calculée par make() si elle n'est pas dans le cache"""
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        self.misses += 1
+        value = make()
+        self.entries[key] = value
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        """No comment"""
+        return {'entries': len(self.entries), 'size': self.size, 'hits': self.hits, 'misses': self.misses}
+
+
+def compile(sources, optimize=False, pool=False, asm=False, flow=False, intrinsics=False, data=False,
+            library=None, cache=None):
+    """Compile des classes Jack données en mémoire.
+
+    `sources` : {nom: texte (str ou bytes)} ; le nom (`Main.jack` par
+    exemple) ne sert qu'aux diagnostics. Les options sont celles de
+    Compiler. Avec `asm`, le programme est traduit en assembleur avec les
+    modules `library` (une liste de Vm.Module, l'OS par défaut).
+
+    Retourne {'vm': {classe: texte}, 'asm': texte ou None, 'diagnostics':
+    [diagnostic (voir Diagnostic.diagnostic)], 'ok'}. Une classe en erreur
+    n'empêche pas de compiler les autres ; l'assembleur demande qu'aucune
+    ne le soit. Rien n'est écrit, aucune erreur n'arrête le processus.
+    Avec `cache` (voir Cache), les classes inchangées depuis un appel
+    précédent ne sont pas recompilées.
+    """
+    if cache is None:
+        cache = Cache(0)
+    diagnostics = []
+    index = None
+    digests = {name: _digest(text) for name, text in sources.items()}
+    if optimize:
+        index = {}
+        for name, text in sources.items():
+            try:
+                classname, templates = cache.get(('templates', digests[name]), lambda: _templates(name, text))
+            except Diagnostic.Error:
+                # signalée à la compilation de la classe
+                continue
+            index[classname] = templates
+
+    # comme Translator : avec `pool`, Main est compilée en dernier, avec les chaînes des autres classes
+    names = list(sources)
+    main = None
+    if pool:
+        names.sort(key=lambda name: os.path.basename(name) == 'Main.jack')
+        main = names[-1] if names and os.path.basename(names[-1]) == 'Main.jack' else None
+    program = Pool.Pool() if main is not None else None
+    # une classe compilée avec -O dépend des modèles des autres
+    key = (optimize, program is not None, _digest(json.dumps(index, sort_keys=True)) if optimize else None)
+    modules = []
+    result = {'vm': {}, 'asm': None, 'diagnostics': diagnostics}
+    for name in names:
+        try:
+            if name == main:
+                # Main lit les chaînes de toutes les classes : elle n'est pas gardée
+                classname, text, module, classpool = _generate(name, sources[name], program, optimize, index)
+            else:
+                classname, text, module, classpool = cache.get(
+                    ('class', name, digests[name]) + key,
+                    lambda: _generate(name, sources[name], Pool.Pool() if program is not None else None, optimize, index))
+        except Diagnostic.Error as error:
+            diagnostics.append(error.diagnostic())
+            continue
+        if program is not None and name != main:
+            program.merge(classpool)
+        modules.append(module)
+        result['vm'][classname] = text
+
+    if asm and not diagnostics:
+        defined = {module.name for module in modules}
+        others = [module for module in (library if library is not None else _os()) if module.name not in defined]
+        result['asm'] = _assemble(modules + others, flow, intrinsics, data, diagnostics)
+    result['ok'] = not any(diagnostic['severity'] == 'error' for diagnostic in diagnostics)
+    return result
+
+
+def translate(sources, optimize=False, intrinsics=False, data=False, cache=None):
+    """Traduit des fichiers VM donnés en mémoire.
+
+    `sources` : {nom: texte (str ou bytes)}, `Main.vm` par exemple (le nom
+    sans .vm préfixe les variables static). Les options sont celles du
+    Translator de VMTranslator. Retourne {'asm': texte ou None,
+    'diagnostics', 'ok'}, comme compile, et `cache` garde les modules lus.
+    """
+    if cache is None:
+        cache = Cache(0)
+    diagnostics = []
+    modules = []
+    for name, text in sources.items():
+        try:
+            modules.append(cache.get(('vm', name, _digest(text)), lambda: _parse(name, text)))
+        except Vm.Error as error:
+            diagnostics.append(_diagnostic(error, name))
+        except Diagnostic.Error as error:
+            diagnostics.append(error.diagnostic())
+    result = {'asm': None, 'diagnostics': diagnostics}
+    if not diagnostics:
+        result['asm'] = _assemble(modules, optimize, intrinsics, data, diagnostics)
+    result['ok'] = not any(diagnostic['severity'] == 'error' for diagnostic in diagnostics)
+    return result
+
+
+def library(directory=os.path.join(Compiler.JACK, 'os')):
+    """Modules (Vm.Module) des .vm d'un répertoire, pour l'argument `library` de compile"""
+    modules = []
+    for file in sorted(glob.glob(f'{directory}/*.vm')):
+        with open(file) as source:
+            modules.append(_parse(os.path.basename(file), source.read()))
+    return modules
+
+
+def _os():
+    # l'OS de Jack/os, lu au premier programme traduit
+    global _library
+    if _library is None:
+        _library = library()
+    return _library
+
+
+def _templates(name, text):
+    # modèles de Inlining d'une classe (voir compile)
+    analysis = Generator.analyse(name, text, optimize=True)
+    return analysis.arbre.name, analysis.templates
+
+
+def _generate(name, text, pool, optimize, index):
+    # classe compilée : (nom, texte VM, Vm.Module, pool)
+    generator = Generator.Generator(name, pool, optimize, index, text)
+    generator.jackclass()
+    return generator.arbre.name, generator.vm(), generator.module(), generator.pool
+
+
+def _digest(text):
+    return hashlib.sha1(text.encode() if isinstance(text, str) else text).hexdigest()
+
+
+def _parse(name, text):
+    # module des commandes d'un texte VM
+    parser = Compiler.backend()['Parser'].Parser(io.StringIO(Diagnostic.decode(text, name)))
+    return Vm.Module(os.path.splitext(os.path.basename(name))[0], list(parser))
+
+
+def _assemble(modules, optimize, intrinsics, data, diagnostics):
+    # assembleur des modules, ou None en cas d'erreur (ajoutée aux diagnostics)
+    asm = io.StringIO()
+    translator = Compiler.backend()['Translator'].Translator(modules, asm, optimize, intrinsics, data)
+    try:
+        translator.translate()
+    except Vm.Error as error:
+        diagnostics.append(_diagnostic(error))
+        return None
+    finally:
+        diagnostics.extend(Diagnostic.diagnostic('warning', 'DataError', warning)
+                           for warning in translator.warnings)
+    return asm.getvalue()
+
+
+def _diagnostic(error, file=None):
+    return Diagnostic.diagnostic('error', error.kind, error.message, error.file or file, error.line, error.col)
+
+
+if __name__ == "__main__":
+    sources = {}
+    for file in sys.argv[1:]:
+        with open(file, 'rb') as source:
+            sources[os.path.basename(file)] = source.read()
+    print('-----debut')
+    result = compile(sources, optimize=True, asm=True)
+    print({name: len(text) for name, text in result['vm'].items()}, len(result['asm'] or ''))
+    for diagnostic in result['diagnostics']:
+        print(diagnostic)
+    print('-----fin')
@@ -1,50 +1,64 @@
 import sys
-import Lexer
+import Ast
+import Diagnostic
+import Scanner
+import Trace
 import todot
 
+# Genres de token (voir Scanner) qui commencent chaque construction : une
+# décision du parser est une seule recherche dans un de ces ensembles ou
+# dans une des tables de sous-programmes construites après la classe.
+CLASSVARDEC = frozenset(('static', 'field'))
+SUBROUTINEDEC = frozenset(('constructor', 'function', 'method'))
+TYPES = frozenset(('int', 'char', 'boolean'))
+OPS = frozenset(('+', '-', '*', '/', '&', '|', '<', '>', '='))
+CALL = frozenset(('(', '.'))
+
 
 class Parser:
     """A parser for the Jack programming language."""
 
-    def __init__(self, file):
-        self.lexer = Lexer.Lexer(file)
+    def __init__(self, file, source=None):
+        """`source` : texte de la classe, lu dans `file` s'il est absent (voir Scanner)"""
+        self.lexer = Scanner.Scanner(file, source)
 
 
     def jackclass(self):
         """
         class: 'class' className '{' classVarDec* subroutineDec* '}'
         """
+        offset = self.offset()
         self.process('class')
         class_name = self.className()
         self.process('{')
         class_vars = []
-        while self.lookahead('static', 'field'):
-            class_vars.append(self.classVarDec())
+        while self.kind() in CLASSVARDEC:
+            class_vars.append(self.located(self.offset(), self.classVarDec()))
         subroutines = []
-        while self.lookahead('constructor', 'function', 'method'):
-            subroutines.append(self.subroutineDec())
+        while self.kind() in SUBROUTINEDEC:
+            subroutines.append(self.located(self.offset(), self.subroutineDec()))
         self.process('}')
-        return {'type': 'class', 'name': class_name, 'classVarDec': class_vars, 'subroutineDec': subroutines}
+        return self.located(offset, Ast.Class(class_name, class_vars, subroutines))
 
     def classVarDec(self):
         """
         classVarDec: ('static'| 'field') type varName (',' varName)* ';'
         """
-        var_kind = self.lexer.next()['token']
+        var_kind = self.lexer.next().token
         var_type = self.type()
         vars = [self.varName()]
-        while self.lookahead(','):
+        while self.kind() == ',':
             self.process(',')
             vars.append(self.varName())
         self.process(';')
-        return {'type': 'classVarDec', 'kind': var_kind, 'varType': var_type, 'vars': vars}
+        return Ast.ClassVarDec(var_kind, var_type, vars)
 
     def type(self):
         """
         type: 'int'|'char'|'boolean'|className
         """
-        if self.lookahead('int', 'char', 'boolean'):
-            return self.lexer.next()['token']
+        if self.kind() in TYPES:
+            return self.lexer.next().token
         return self.className()
 
     def subroutineDec(self):
@@ -52,29 +66,31 @@ class Parser:
         subroutineDec: ('constructor'| 'function'|'method') ('void'|type)
         subroutineName '(' parameterList ')' subroutineBody
         """
-        subroutine_type = self.lexer.next()['token']
-        return_type = self.lexer.next()['token'] if self.lookahead('void') else self.type()
+        subroutine_type = self.lexer.next().token
+        return_type = self.lexer.next().token if self.kind() == 'void' else self.type()
         name = self.subroutineName()
         self.process('(')
         params = self.parameterList()
         self.process(')')
         body = self.subroutineBody()
-        return {'type': 'subroutineDec', 'subroutineType': subroutine_type, 'returnType': return_type, 'name': name, 'parameters': params, 'body': body}
+        return Ast.SubroutineDec(subroutine_type, return_type, name, params, body)
 
     def parameterList(self):
         """
         parameterList: ((type varName) (',' type varName)*)?
         """
         params = []
-        if not self.lookahead(')'):
+        if self.kind() != ')':
+            offset = self.offset()
             param_type = self.type()
             param_name = self.varName()
-            params.append({'type': param_type, 'name': param_name})
-            while self.lookahead(','):
+            params.append(self.located(offset, Ast.Parameter(param_type, param_name)))
+            while self.kind() == ',':
                 self.process(',')
+                offset = self.offset()
                 param_type = self.type()
                 param_name = self.varName()
-                params.append({'type': param_type, 'name': param_name})
+                params.append(self.located(offset, Ast.Parameter(param_type, param_name)))
         return params
 
     def subroutineBody(self):
@@ -83,11 +99,11 @@ class Parser:
         """
         self.process('{')
         vars = []
-        while self.lookahead('var'):
-            vars.append(self.varDec())
+        while self.kind() == 'var':
+            vars.append(self.located(self.offset(), self.varDec()))
         statements = self.statements()
         self.process('}')
-        return {'type': 'subroutineBody', 'vars': vars, 'statements': statements}
+        return Ast.SubroutineBody(vars, statements)
 
     def varDec(self):
         """
@@ -96,11 +112,11 @@ class Parser:
         self.process('var')
         var_type = self.type()
         vars = [self.varName()]
-        while self.lookahead(','):
+        while self.kind() == ',':
             self.process(',')
             vars.append(self.varName())
         self.process(';')
-        return {'type': 'varDec', 'varType': var_type, 'vars': vars}
+        return Ast.VarDec(var_type, vars)
 
 
     def className(self):
@@ -126,26 +142,20 @@ class Parser:
         statements : statement*
         """
         stmts = []
-        while self.lookahead('let', 'if', 'while', 'do', 'return'):
-            stmts.append(self.statement())
+        statement = STATEMENTS.get(self.kind())
+        while statement is not None:
+            stmts.append(self.located(self.offset(), statement(self)))
+            statement = STATEMENTS.get(self.kind())
         return stmts
 
     def statement(self):
         """
         statement : letStatement|ifStatement|whileStatement|doStatement|returnStatement
         """
-        if self.lookahead('let'):
-            return self.letStatement()
-        elif self.lookahead('if'):
-            return self.ifStatement()
-        elif self.lookahead('while'):
-            return self.whileStatement()
-        elif self.lookahead('do'):
-            return self.doStatement()
-        elif self.lookahead('return'):
-            return self.returnStatement()
-        else:
+        statement = STATEMENTS.get(self.kind())
+        if statement is None:
             self.error(self.lexer.look())
+        return self.located(self.offset(), statement(self))
 
     def letStatement(self):
         """
@@ -153,17 +163,17 @@ class Parser:
         """
         self.process('let')
         name = self.varName()
-        print(f"Parsed variable name: {name}")  # Debugging line
         index = None
-        if self.lookahead('['):
+        if self.kind() == '[':
             self.process('[')
             index = self.expression()
             self.process(']')
         self.process('=')
         value = self.expression()
-        print(f"Parsed expression value: {value}")  # Debugging line
         self.process(';')
-        return {'type': 'letStatement', 'name': name, 'index': index, 'value': value}
+        if Trace.level >= Trace.NODES:
+            Trace.write(f"Parsed let statement: {name} = {value}")
+        return Ast.LetStatement(name, index, value)
 
     def ifStatement(self):
         """
@@ -177,13 +187,12 @@ class Parser:
         if_statements = self.statements()
         self.process('}')
         else_statements = None
-        if self.lookahead('else'):
+        if self.kind() == 'else':
             self.process('else')
             self.process('{')
             else_statements = self.statements()
             self.process('}')
-        return {'type': 'ifStatement', 'condition': condition, 'ifStatements': if_statements,
-                'elseStatements': else_statements}
+        return Ast.IfStatement(condition, if_statements, else_statements)
 
     def whileStatement(self):
         """
@@ -196,17 +205,16 @@ class Parser:
         self.process('{')
         body = self.statements()
         self.process('}')
-        return {'type': 'whileStatement', 'condition': condition, 'body': body}
+        return Ast.WhileStatement(condition, body)
 
     def doStatement(self):
         """
         doStatement : 'do' subroutineCall ';'
         """
         self.process('do')
-        print(f"Expecting subroutine call after 'do'")
         call = self.subroutineCall()
         self.process(';')
-        return {'type': 'doStatement', 'call': call}
+        return Ast.DoStatement(call)
 
     def returnStatement(self):
         """
@@ -214,29 +222,26 @@ class Parser:
         """
         self.process('return')
         expr = None
-        if not self.lookahead(';'):
+        if self.kind() != ';':
             expr = self.expression()
         self.process(';')
-        return {'type': 'returnStatement', 'expression': expr}
+        return Ast.ReturnStatement(expr)
 
     def expression(self):
         """
         Parses an expression.
         expression: term (op term)*
         """
-        expr = {'type': 'expression', 'terms': []}
-
         # Parse the first term
-        expr['terms'].append(self.term())
+        operands = [self.term()]
+        operators = []
 
         # Parse (op term)* - handle additional terms
-        while self.lookahead('+', '-', '*', '/', '&', '|', '<', '>', '='):  # Check for operator
-            op = self.processOperator()
-            term = self.term()  # Parse the next term
-            expr['terms'].append({'op': op})
-            expr['terms'].append(term)
+        while self.kind() in OPS:  # Check for operator
+            operators.append(self.lexer.next().token)
+            operands.append(self.term())  # Parse the next term
 
-        return expr
+        return Ast.Expression(operands, operators)
 
     def term(self):
         """
@@ -244,118 +249,104 @@ class Parser:
               |varName|varName '[' expression ']'|subroutineCall
               | '(' expression ')' | unaryOp term
         """
-        token = self.lexer.look()
+        term = TERMS.get(self.kind())
+        if term is None:
+            self.error(self.lexer.look())
+        return self.located(self.offset(), term(self))
 
-        if token['type'] == 'IntegerConstant':
-            return {'type': 'term', 'subType': 'integerConstant', 'value': self.lexer.next()['token']}
-        elif self.lookahead('('):  # Handle grouped expressions
-            self.process('(')
-            expr = self.expression()  # Parse the inner expression
-            self.process(')')  # Consume closing parenthesis
-            return {'type': 'term', 'subType': 'expression', 'value': expr}
-        elif self.lookahead('-', '~'):  # Unary operation
-            op = self.unaryOp()
-            term = self.term()
-            return {'type': 'term', 'subType': 'unaryOp', 'op': op, 'term': term}
-        elif self.lookahead('true', 'false', 'null', 'this'):  # Keyword constants
-            return {'type': 'term', 'subType': 'keywordConstant', 'value': self.KeywordConstant()}
-        elif token['type'] == 'identifier':  # Check for identifiers
-            var_name = self.processIdentifier()  # Consume the identifier
-            if self.lookahead('['):  # Array access: varName[expression]
-                self.process('[')
-                index = self.expression()
-                self.process(']')
-                return {'type': 'term', 'subType': 'arrayAccess', 'name': var_name, 'index': index}
-            elif self.lookahead('(') or self.lookahead('.'):  # Subroutine call
-                return self.subroutineCall()
-            else:  # Standalone variable
-                return {'type': 'term', 'subType': 'varName', 'name': var_name}
-        elif self.lookahead('\"'):  # String constants
-            return {'type': 'term', 'subType': 'stringConstant', 'value': self.lexer.next()['token']}
-        else:
-            self.error(token)
+    def integerConstant(self):
+        """
+        term : integerConstant
+        """
+        return Ast.IntegerConstant(self.lexer.next().token)
+
+    def stringConstant(self):
+        """
+        term : stringConstant, sans les guillemets
+        """
+        return Ast.StringConstant(self.lexer.next().token[1:-1])
+
+    def keywordTerm(self):
+        """
+        term : keywordConstant
+        """
+        return Ast.KeywordConstant(self.KeywordConstant())
+
+    def groupTerm(self):
+        """
+        term : '(' expression ')'
+        """
+        self.process('(')
+        expr = self.expression()  # Parse the inner expression
+        self.process(')')  # Consume closing parenthesis
+        return Ast.GroupTerm(expr)
+
+    def unaryTerm(self):
+        """
+        term : unaryOp term
+        """
+        op = self.unaryOp()
+        term = self.term()
+        return Ast.UnaryOp(op, term)
+
+    def identifierTerm(self):
+        """
+        term : varName | varName '[' expression ']' | subroutineCall
+        """
+        var_name = self.processIdentifier()  # Consume the identifier
+        kind = self.kind()
+        if kind == '[':  # Array access: varName[expression]
+            self.process('[')
+            index = self.expression()
+            self.process(']')
+            return Ast.ArrayAccess(var_name, index)
+        elif kind in CALL:  # Subroutine call
+            return Ast.CallTerm(self.subroutineCall(var_name))
+        else:  # Standalone variable
+            return Ast.VarName(var_name)
 
-    def subroutineCall(self):
+    def subroutineCall(self, identifier=None):
         """
         Handles a subroutine call, which can be in the form:
         1. subroutineName(expressionList)
         2. objectName.subroutineName(expressionList)
+        `identifier` is the first identifier when term() has already consumed it.
         """
-        identifier = self.processIdentifier()  # Process the first identifier (object or subroutine name)
+        if identifier is None:
+            identifier = self.processIdentifier()  # Process the first identifier (object or subroutine name)
 
-        if self.lookahead() and self.lookahead()['type'] == 'symbol' and self.lookahead()['token'] == '.':
+        kind = self.kind()
+        if kind == '.':
             # Method or object call (e.g., Keyboard.readInt())
             self.process('.')  # Consume the '.'
-
-            if self.lookahead()['type'] != 'identifier':
-                raise SyntaxError(f"Expected method name after '.', but got {self.lookahead()}")
-
             subroutine_name = self.processIdentifier()  # Handle the method name
             self.process('(')  # Process the opening '('
             args = self.expressionList()  # Parse the expression list (arguments)
             self.process(')')  # Process the closing ')'
 
-            return {
-                'type': 'subroutineCall',
-                'object': identifier,  # The object or class (e.g., 'Keyboard')
-                'name': subroutine_name,  # The method name (e.g., 'readInt')
-                'args': args,  # Parsed argument list
-            }
+            # The object or class (e.g., 'Keyboard') and the method name (e.g., 'readInt')
+            return Ast.SubroutineCall(identifier, subroutine_name, args)
 
-        elif self.lookahead() and self.lookahead()['type'] == 'symbol' and self.lookahead()['token'] == '(':
+        elif kind == '(':
             # Subroutine call without an object (e.g., doSomething())
             self.process('(')  # Process the opening '('
             args = self.expressionList()  # Parse the expression list (arguments)
             self.process(')')  # Process the closing ')'
 
-            return {
-                'type': 'subroutineCall',
-                'name': identifier,  # Subroutine name (e.g., 'main')
-                'args': args,  # Parsed argument list
-            }
+            # Subroutine name (e.g., 'main'), without object
+            return Ast.SubroutineCall(None, identifier, args)
 
         else:
-            raise SyntaxError(f"Invalid subroutine call syntax: {identifier}")
-
-    def lookahead_identifier(self):
-        """
-        Checks if the next token is an identifier.
-        Returns:
-            bool: True if the next token's type is 'identifier', otherwise False.
-        """
-        next_token = self.lookahead()  # Peek at the next token without consuming it
-        return next_token and next_token.get('type') == 'identifier'
-
-    def lookahead_keyword(self, expected_keyword):
-        """
-        Checks if the next token is a specific keyword.
-        Args:
-            expected_keyword (str): The keyword to check for.
-        Returns:
-            bool: True if the next token matches the keyword, otherwise False.
-        """
-        next_token = self.lookahead()
-        return next_token and next_token.get('type') == 'keyword' and next_token.get('token') == expected_keyword
-
-    def lookahead_symbol(self, expected_symbol):
-        """
-        Checks if the next token is a specific symbol.
-        Args:
-            expected_symbol (str): The symbol to check for (e.g., '(' or ')').
-        Returns:
-            bool: True if the next token matches the symbol, otherwise False.
-        """
-        next_token = self.lookahead()
-        return next_token and next_token.get('type') == 'symbol' and next_token.get('token') == expected_symbol
+            self.error(self.lexer.look())
 
     def expressionList(self):
         """
         expressionList : (expression (',' expression)*)?
         """
         expressions = []
-        if not self.lookahead(')'):
+        if self.kind() != ')':
             expressions.append(self.expression())
-            while self.lookahead(','):
+            while self.kind() == ',':
                 self.process(',')
                 expressions.append(self.expression())
         return expressions
@@ -365,24 +356,24 @@ class Parser:
         """
         op : '+'|'-'|'*'|'/'|'&'|'|'|'<'|'>'|'='
         """
-        return self.process(self.lexer.next()['token'])
+        return self.processOperator()
 
     def unaryOp(self):
         """
         unaryop : '-'|'~'
         """
-        return self.process(self.lexer.next()['token'])
+        return self.lexer.next().token
 
     def KeywordConstant(self):
         """
         KeyWordConstant : 'true'|'false'|'null'|'this'
         """
-        return self.process(self.lexer.next()['token'])
+        return self.lexer.next().token
 
     def process(self, expected):
         token = self.lexer.next()
-        if token is not None and token['token'] == expected:
-            return token['token']
+        if token is not None and token.token == expected:
+            return token.token
         else:
             self.error(token)
 
@@ -391,50 +382,67 @@ class Parser:
         Consumes an operator token and returns its value.
         Valid operators: +, -, *, /, &, |, <, >, =
         """
-        token = self.lexer.look()  # Peek at the current token
-        if token['token'] in ('+', '-', '*', '/', '&', '|', '<', '>', '='):
-            return self.lexer.next()['token']  # Consume and return the operator
+        if self.kind() in OPS:
+            return self.lexer.next().token  # Consume and return the operator
         else:
-            self.error(f"Unexpected token: {token}, expected an operator.")
+            self.error(self.lexer.look())
 
     def processIdentifier(self):
         token = self.lexer.next()
-        if token is not None and token['type'] == 'identifier':
-            return token['token']
+        if token is not None and token.kind == 'identifier':
+            return token.token
         else:
             self.error(token)
 
-    def lookahead(self, *expected):
+    def kind(self):
         """
-        Checks if the next token matches one of the expected tokens.
-        Supports both token and type matching.
-        Expected can include:
-        - Strings (token values)
-        - Tuples (type, token value)
+        Genre du prochain token (voir Scanner), ou None en fin de fichier.
         """
         token = self.lexer.look()
-        if token is None:
-            print(f"Lookahead failed: No token available, expected {expected}")
-            return False
+        return token.kind if token is not None else None
 
-        for exp in expected:
-            if isinstance(exp, tuple):  # Match (type, value)
-                if token['type'] == exp[0] and token['token'] == exp[1]:
-                    print(f"Lookahead matched: {token} (expected {exp})")
-                    return True
-            elif token['token'] == exp:  # Match token value
-                print(f"Lookahead matched: {token['token']} (expected {exp})")
-                return True
+    def offset(self):
+        """
+        Position du prochain token dans le source, ou None en fin de fichier.
+        """
+        token = self.lexer.look()
+        return token.offset if token is not None else None
 
-        print(f"Lookahead failed: {token} not in {expected}")
-        return False
+    def located(self, offset, node):
+        """
+        Le noeud, avec la position de son premier token (voir Ast.Node).
+        """
+        node.offset = offset
+        return node
 
     def error(self, token):
         if token is None:
-            print("Syntax error: end of file")
-        else:
-            print(f"SyntaxError (line={token['line']}, col={token['col']}): {token['token']}")
-        exit()
+            raise Diagnostic.Error("end of file", file=self.lexer.file)
+        raise Diagnostic.Error(token.token, token.line, token.col, self.lexer.file)
+
+
+# genre du premier token -> sous-programme qui analyse l'instruction
+STATEMENTS = {
+    'let': Parser.letStatement,
+    'if': Parser.ifStatement,
+    'while': Parser.whileStatement,
+    'do': Parser.doStatement,
+    'return': Parser.returnStatement,
+}
+
+# genre du premier token -> sous-programme qui analyse le terme
+TERMS = {
+    'IntegerConstant': Parser.integerConstant,
+    'StringConstant': Parser.stringConstant,
+    'identifier': Parser.identifierTerm,
+    '(': Parser.groupTerm,
+    '-': Parser.unaryTerm,
+    '~': Parser.unaryTerm,
+    'true': Parser.keywordTerm,
+    'false': Parser.keywordTerm,
+    'null': Parser.keywordTerm,
+    'this': Parser.keywordTerm,
+}
 
 
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+"""No comment"""
+
+# mots du segment static de la machine Hack (RAM 16 à 255), partagés par toutes les classes
+STATICS = 240
+
+
+class Pool:
+    """Pool des chaînes littérales d'un programme.
+
+    Chaque chaîne littérale distincte du programme est construite une seule
+    fois, au début de Main.main, par la fonction `Main.$strings` : elle est
+    rangée dans une variable static de Main, après les static déclarées.
+    Chaque autre classe reçoit les chaînes qu'elle utilise par sa fonction
+    `Classe.$strings`, qui les range dans ses propres variables static. Un
+    littéral devient alors un simple `push static k`. Les chaînes du pool
+    sont partagées : le programme ne doit ni les modifier ni les libérer.
+    Les variables static du pool s'ajoutent à celles déclarées par les
+    classes : `size` les compte, pour vérifier qu'elles tiennent dans les
+    STATICS mots du segment static.
+    """
+
+    def __init__(self):
+        # chaîne -> rang dans le pool du programme
+        self.strings = {}
+        # classe -> chaînes utilisées, dans l'ordre de leurs variables static
+        self.classes = {}
+        # appels à String.appendChar qu'auraient produits les littéraux
+        self.appendchars = 0
+        self.uses = 0
+        # classe -> nombre de variables static déclarées
+        self.statics = {}
+
+    def declare(self, classname, statics):
+        """Retient le nombre de variables static déclarées par la classe"""
+        self.statics[classname] = statics
+
+    def size(self):
+        """Nombre de variables static du programme : déclarées, puis celles du pool dans Main et les autres classes"""
+        return sum(self.statics.values()) + len(self.strings) + sum(len(strings) for strings in self.classes.values())
+
+    def slot(self, classname, value, statics):
+        """Variable static de la classe qui contient la chaîne `value`.
+
+        `statics` est le nombre de variables static déclarées par la classe.
+        """
+        self.uses += 1
+        self.appendchars += len(value)
+        if value not in self.strings:
+            self.strings[value] = len(self.strings)
+        if classname == 'Main':
+            return statics + self.strings[value]
+        strings = self.classes.setdefault(classname, [])
+        if value not in strings:
+            strings.append(value)
+        return statics + strings.index(value)
+
+    def merge(self, other):
+        """Ajoute un pool rempli par d'autres classes (voir Translator, --jobs).
+
+        Fusionnés dans l'ordre de compilation, les rangs des chaînes sont ceux
+        qu'aurait donnés un seul pool.
+        """
+        self.uses += other.uses
+        self.appendchars += other.appendchars
+        for value in other.strings:
+            self.strings.setdefault(value, len(self.strings))
+        self.classes.update(other.classes)
+        self.statics.update(other.statics)
+
+    def state(self):
+        """Contenu du pool, en types JSON (voir Translator, --incremental)"""
+        return {'strings': list(self.strings), 'classes': self.classes,
+                'uses': self.uses, 'appendchars': self.appendchars, 'statics': self.statics}
+
+    @classmethod
+    def fromState(cls, state):
+        """Pool retrouvé à partir de state()"""
+        pool = cls()
+        pool.strings = {value: index for index, value in enumerate(state['strings'])}
+        pool.classes = state['classes']
+        pool.uses = state['uses']
+        pool.appendchars = state['appendchars']
+        pool.statics = state['statics']
+        return pool
+
+    def eliminated(self):
+        """Nombre d'appels à String.appendChar supprimés du code produit"""
+        return self.appendchars - sum(len(value) for value in self.strings)
+
+    def report(self):
+        """No comment"""
+        return (f"Pool : {self.uses} littéraux, {len(self.strings)} chaînes distinctes, "
+                f"{self.eliminated()} appels à String.appendChar supprimés")
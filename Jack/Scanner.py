@@ -0,0 +1,169 @@
+"""No comment"""
+import bisect
+import os
+import re
+import sys
+import Diagnostic
+import Trace
+
+KEYWORDS = frozenset(('class', 'constructor', 'method', 'function', 'int', 'boolean', 'char', 'void',
+                      'var', 'static', 'field', 'let', 'do', 'if', 'else', 'while', 'return',
+                      'true', 'false', 'null', 'this'))
+
+# Une seule expression pour tout le source : le groupe qui a reconnu le
+# texte donne son type. Un nombre collé à des lettres (123abc) est lu en
+# entier pour être signalé comme token invalide.
+MASTER = re.compile(r"""
+    (?P<space>\s+) |
+    (?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z)) |
+    (?P<word>[A-Za-z_][A-Za-z0-9_]*) |
+    (?P<IntegerConstant>[0-9][A-Za-z0-9_]*) |
+    (?P<StringConstant>"[^"\n]*") |
+    (?P<symbol>[()[\]{},;=.+\-*/&|~<>])
+""", re.X | re.S)
+
+# genre (voir Parser) de chaque mot-clé et symbole, partagé par tous les tokens
+_KINDS = {sys.intern(word): sys.intern(word) for word in KEYWORDS | set('()[]{},;=.+-*/&|~<>')}
+
+
+class Token:
+    """Un token : son genre, son type, son texte et sa position dans le source.
+
+    La ligne et la colonne ne sont calculées que si on les demande. Les
+    clés d'un token (token['type']...) restent lisibles comme avant.
+    """
+
+    __slots__ = ('kind', 'type', 'token', 'offset', 'scanner')
+
+    def __init__(self, kind, type, token, offset, scanner):
+        self.kind = kind
+        self.type = type
+        self.token = token
+        self.offset = offset
+        self.scanner = scanner
+
+    @property
+    def line(self):
+        return self.scanner.position(self.offset)[0]
+
+    @property
+    def col(self):
+        return self.scanner.position(self.offset)[1]
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def __repr__(self):
+        return f"{{'line': {self.line}, 'col': {self.col}, 'type': '{self.type}', 'token': {self.token!r}}}"
+
+
+class Scanner:
+    """Lexer Jack qui lit tout le fichier d'un coup.
+
+    Le source est découpé par MASTER en une seule passe, puis look/next
+    parcourent la liste des tokens. Avec `source` (str ou bytes), le texte
+    est celui-ci et `file` n'est que son nom ; sinon un fichier absent
+    lève une Diagnostic.Error.
+    """
+
+    def __init__(self, file, source=None):
+        self.file = file
+        if source is not None:
+            self.source = Diagnostic.decode(source, file)
+        elif os.path.isfile(file):
+            with open(file, "rb") as source:
+                self.source = Diagnostic.decode(source.read(), file)
+        else:
+            raise Diagnostic.Error(file, file=file, kind='FileNotFoundError')
+        self._lines = None
+        with Trace.span('lex'):
+            self.tokens = self._scan()
+        self.index = 0
+
+    def _scan(self):
+        source = self.source
+        kinds = _KINDS
+        intern = sys.intern
+        tokens = []
+        append = tokens.append
+        pos = 0
+        for m in MASTER.finditer(source):
+            start = m.start()
+            if start != pos:  # texte sauté par finditer : aucun token ne commence ici
+                self._error(pos, f'Unexpected character {source[pos]}')
+            pos = m.end()
+            group = m.lastgroup
+            if group == 'space' or group == 'comment':
+                continue
+            text = m.group()
+            if group == 'word':
+                if text in KEYWORDS:
+                    append(Token(kinds[text], 'keyword', kinds[text], start, self))
+                else:
+                    append(Token('identifier', 'identifier', intern(text), start, self))
+            elif group == 'symbol':
+                append(Token(kinds[text], 'symbol', kinds[text], start, self))
+            elif group == 'IntegerConstant':
+                if not text.isdigit():
+                    self._error(start, f'Invalid token {text}')
+                append(Token('IntegerConstant', 'IntegerConstant', text, start, self))
+            else:
+                append(Token('StringConstant', 'StringConstant', text, start, self))
+        if pos != len(source):
+            self._error(pos, f'Unexpected character {source[pos]}')
+        return tokens
+
+    def _error(self, offset, message):
+        line, col = self.position(offset)
+        raise Diagnostic.Error(message, line, col, self.file)
+
+    def position(self, offset):
+        """(ligne, colonne) d'un décalage dans le source, à partir de la table des débuts de ligne"""
+        if self._lines is None:
+            self._lines = [0] + [m.end() for m in re.finditer('\n', self.source)]
+        line = bisect.bisect_right(self._lines, offset)
+        return line, offset - self._lines[line - 1] + 1
+
+    def where(self, node):
+        """(ligne, colonne) du premier token d'un noeud de Parser (voir Ast.Node), (None, None) sans position"""
+        offset = getattr(node, 'offset', None)
+        return self.position(offset) if offset is not None else (None, None)
+
+    def next(self):
+        """Get the next token."""
+        if self.index < len(self.tokens):
+            res = self.tokens[self.index]
+            self.index += 1
+        else:
+            res = None
+        if Trace.level >= Trace.TOKENS:
+            Trace.write(f"Token generated: {res}")
+        return res
+
+    def hasNext(self):
+        """Check if there's a next token."""
+        return self.index < len(self.tokens)
+
+    def look(self):
+        """Peek at the next token."""
+        if self.index < len(self.tokens):
+            return self.tokens[self.index]
+        return None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.hasNext():
+            return self.next()
+        else:
+            raise StopIteration
+
+
+if __name__ == "__main__":
+    file = sys.argv[1]
+    print('----- Start Parsing -----')
+    scanner = Scanner(file)
+    for token in scanner:
+        print(token)
+    print('----- End Parsing -----')
@@ -0,0 +1,130 @@
+"""No comment"""
+import argparse
+import io
+import json
+import os
+import socketserver
+import stat
+import sys
+import time
+import Diagnostic
+import Library
+
+# options de chaque opération, celles de Library.compile et Library.translate
+OPTIONS = {
+    'compile': ('optimize', 'pool', 'asm', 'flow', 'intrinsics', 'data'),
+    'translate': ('optimize', 'intrinsics', 'data'),
+}
+
+
+class Server:
+    """Serveur de compilation : Library sans redémarrer Python à chaque fichier.
+
+    Il lit des requêtes JSON, une par ligne, et écrit une réponse JSON
+    par ligne, sur l'entrée et la sortie standard (serve) ou sur une
+    socket Unix (listen) :
+    - {"op": "compile", "sources": {nom: texte Jack}, "options": {...}}
+      répond le résultat de Library.compile ;
+    - {"op": "translate", "sources": {nom: texte VM}, "options": {...}}
+      celui de Library.translate ;
+    - {"op": "stats"} : le remplissage du cache ;
+    - {"op": "shutdown"} arrête le serveur.
+    Le "id" d'une requête est recopié dans sa réponse, avec "time", la
+    durée du traitement en secondes. L'OS lu une fois et le Cache de
+    Library (modèles des classes, classes compilées, modules VM lus)
+    restent en mémoire d'une requête à l'autre.
+    """
+
+    def __init__(self, size=Library.CACHE_SIZE):
+        self.cache = Library.Cache(size)
+        self.running = True
+
+    def handle(self, request):
+        """Réponse à une requête (des dicts)"""
+        start = time.perf_counter()
+        op = request.get('op') if isinstance(request, dict) else None
+        match op:
+            case 'compile' | 'translate':
+                options = request.get('options', {})
+                unknown = [option for option in options if option not in OPTIONS[op]]
+                if unknown or not isinstance(request.get('sources'), dict):
+                    response = _error(f"options inconnues : {', '.join(unknown)}" if unknown else "sources manquantes")
+                elif op == 'compile':
+                    response = Library.compile(request['sources'], cache=self.cache, **options)
+                else:
+                    response = Library.translate(request['sources'], cache=self.cache, **options)
+            case 'stats':
+                response = {'ok': True, 'cache': self.cache.stats()}
+            case 'shutdown':
+                self.running = False
+                response = {'ok': True}
+            case _:
+                response = _error(f"opération inconnue : {op}")
+        if isinstance(request, dict) and 'id' in request:
+            response['id'] = request['id']
+        response['time'] = round(time.perf_counter() - start, 6)
+        return response
+
+    def serve(self, input=sys.stdin, output=sys.stdout):
+        """Répond aux requêtes de `input` jusqu'à sa fin ou à shutdown"""
+        for line in input:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as error:
+                response = _error(f"JSON invalide : {error}")
+            else:
+                try:
+                    response = self.handle(request)
+                except Exception as error:
+                    # une requête qui fait échouer le compilateur n'arrête pas le serveur
+                    response = _error(f"{type(error).__name__}: {error}", 'InternalError')
+                    if isinstance(request, dict) and 'id' in request:
+                        response['id'] = request['id']
+            output.write(json.dumps(response) + '\n')
+            output.flush()
+            if not self.running:
+                break
+
+    def listen(self, path):
+        """Répond aux clients de la socket Unix `path`, une connexion après l'autre, jusqu'à shutdown"""
+        if os.path.exists(path) and stat.S_ISSOCK(os.stat(path).st_mode):
+            # socket laissée par un serveur arrêté
+            os.remove(path)
+        with socketserver.UnixStreamServer(path, _Connection) as server:
+            server.compiler = self
+            try:
+                while self.running:
+                    server.handle_request()
+            finally:
+                os.remove(path)
+
+
+class _Connection(socketserver.StreamRequestHandler):
+    # un client de Server.listen : ses requêtes jusqu'à ce qu'il ferme la connexion
+    def handle(self):
+        input = io.TextIOWrapper(self.rfile, encoding='utf-8')
+        output = io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True)
+        self.server.compiler.serve(input, output)
+
+
+def _error(message, kind='RequestError'):
+    return {'ok': False, 'diagnostics': [Diagnostic.diagnostic('error', kind, message)]}
+
+
+if __name__ == "__main__":
+    arguments = argparse.ArgumentParser(description="Serveur de compilation (requêtes JSON, une par ligne)")
+    arguments.add_argument('socket', nargs='?',
+                           help="socket Unix où attendre les clients (voir Client) ; sinon entrée et sortie standard")
+    arguments.add_argument('--cache', type=int, default=Library.CACHE_SIZE, metavar='N',
+                           help="nombre d'entrées gardées en mémoire")
+    args = arguments.parse_args()
+    server = Server(args.cache)
+    if args.socket is None:
+        server.serve()
+    else:
+        try:
+            server.listen(args.socket)
+        except KeyboardInterrupt:
+            pass
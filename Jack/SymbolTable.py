@@ -0,0 +1,109 @@
+"""No comment"""
+import collections
+import sys
+import types
+import Diagnostic
+
+# segment VM de chaque sorte de variable
+SEGMENTS = {'static': 'static', 'field': 'this', 'argument': 'argument', 'local': 'local'}
+
+# une variable : son indice est compté dans sa sorte (static, field, argument, local)
+Symbol = collections.namedtuple('Symbol', 'name type kind index')
+
+# table figée des variables d'une classe, que les autres classes peuvent consulter
+ClassTable = collections.namedtuple('ClassTable', 'name symbols statics fields')
+
+
+class SymbolTable:
+    """Table des symboles d'une classe Jack.
+
+    Deux portées, chacune un dict indexé par le nom : celle de la classe
+    (static, field) et celle du sous-programme en cours (argument, local),
+    vidée par startSubroutine. La recherche regarde d'abord le sous-programme.
+    Les indices sont comptés par sorte de variable, comme les segments VM.
+    Un nom déjà défini dans la même portée lève une Diagnostic.Error, située
+    dans le source `file` par le Scanner `lexer` qui l'a lu.
+    freeze donne la portée de la classe une fois pour toutes ; fromFrozen
+    ouvre les sous-programmes sur elle sans la reconstruire.
+    """
+
+    def __init__(self, name, file=None, lexer=None):
+        self.name = name
+        self.file = file
+        self.lexer = lexer
+        self.classScope = {}
+        self.routineScope = {}
+        self.counts = dict.fromkeys(SEGMENTS, 0)
+        self._frozen = None
+
+    @classmethod
+    def fromClass(cls, arbre, file=None, lexer=None):
+        """Table des variables de classe d'un arbre produit par Parser.jackclass"""
+        table = cls(arbre.name, file, lexer)
+        for var in arbre.classVarDec:
+            for name in var.vars:
+                table.define(name, var.varType, var.kind, var)
+        return table
+
+    @classmethod
+    def fromFrozen(cls, table, file=None, lexer=None):
+        """Table des sous-programmes d'une classe figée (voir freeze), dont la portée de classe est partagée"""
+        symbols = cls(table.name, file, lexer)
+        symbols.classScope = table.symbols
+        symbols.counts['static'] = table.statics
+        symbols.counts['field'] = table.fields
+        symbols._frozen = table
+        return symbols
+
+    def define(self, name, type, kind, node=None):
+        """Ajoute une variable dans la portée de sa sorte et retourne son Symbol ; `node` est sa déclaration"""
+        scope = self.classScope if kind in ('static', 'field') else self.routineScope
+        if name in scope:
+            line, col = self.lexer.where(node) if self.lexer is not None else (None, None)
+            raise Diagnostic.Error(f"Variable déjà définie: {name}", line, col, self.file, 'SemanticError')
+        symbol = Symbol(name, type, kind, self.counts[kind])
+        self.counts[kind] += 1
+        scope[name] = symbol
+        if scope is self.classScope:
+            self._frozen = None
+        return symbol
+
+    def startSubroutine(self):
+        """Ouvre la portée d'un nouveau sous-programme"""
+        self.routineScope = {}
+        self.counts['argument'] = 0
+        self.counts['local'] = 0
+
+    def lookup(self, name):
+        """Symbol de la variable, ou None"""
+        symbol = self.routineScope.get(name)
+        if symbol is None:
+            symbol = self.classScope.get(name)
+        return symbol
+
+    def count(self, kind):
+        """Nombre de variables de cette sorte"""
+        return self.counts[kind]
+
+    def segment(self, symbol):
+        """Segment VM d'une variable"""
+        return SEGMENTS[symbol.kind]
+
+    def freeze(self):
+        """Table figée des variables de la classe, gardée tant qu'elle ne change pas"""
+        if self._frozen is None:
+            self._frozen = ClassTable(self.name, types.MappingProxyType(dict(self.classScope)),
+                                      self.counts['static'], self.counts['field'])
+        return self._frozen
+
+
+if __name__ == "__main__":
+    import Parser
+    file = sys.argv[1]
+    print('-----debut')
+    parser = Parser.Parser(file)
+    table = SymbolTable.fromClass(parser.jackclass(), file, parser.lexer).freeze()
+    print(table.name, f'static={table.statics} field={table.fields}')
+    for symbol in table.symbols.values():
+        print(symbol)
+    print('-----fin')
@@ -0,0 +1,89 @@
+"""No comment"""
+import sys
+import time
+
+# niveaux de trace, du plus discret au plus bavard
+OFF = 0
+PHASES = 1  # une ligne par classe compilée
+NODES = 2   # arbre syntaxique, instructions, commandes VM produites
+TOKENS = 3  # chaque token lu
+
+# Les appels sont gardés par `if Trace.level >= ...` : désactivée, une
+# trace ne coûte qu'une comparaison et son message n'est pas construit.
+level = OFF
+timing = False
+out = sys.stderr
+
+# phase -> [durée hors phases imbriquées, nombre de spans]
+times = {}
+# spans en cours : [phase, début, durée des phases imbriquées]
+_stack = []
+
+
+def write(message):
+    """Écrit une ligne de trace"""
+    print(message, file=out)
+
+
+class span:
+    """Mesure une phase (lex, parse, codegen) quand `timing` est actif.
+
+    Le temps d'une phase imbriquée (le lexer appelé par le parser) est
+    retiré de la phase englobante.
+    """
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        if timing:
+            _stack.append([self.phase, time.perf_counter(), 0.0])
+        return self
+
+    def __exit__(self, *exc):
+        if timing:
+            _close(time.perf_counter())
+        return False
+
+
+def timed(phase, function):
+    """Retourne `function` mesurée dans la phase `phase` ; à n'utiliser que si `timing` est actif"""
+    def wrapper(*args):
+        _stack.append([phase, time.perf_counter(), 0.0])
+        try:
+            return function(*args)
+        finally:
+            _close(time.perf_counter())
+    return wrapper
+
+
+def _close(end):
+    phase, start, nested = _stack.pop()
+    elapsed = end - start
+    entry = times.setdefault(phase, [0.0, 0])
+    entry[0] += elapsed - nested
+    entry[1] += 1
+    if _stack:
+        _stack[-1][2] += elapsed
+
+
+def merge(other):
+    """Ajoute les temps mesurés dans un autre processus"""
+    for phase, (duration, count) in other.items():
+        entry = times.setdefault(phase, [0.0, 0])
+        entry[0] += duration
+        entry[1] += count
+
+
+def report():
+    """No comment"""
+    phases = ', '.join(f'{phase} {duration * 1000:.1f} ms' for phase, (duration, _) in times.items())
+    total = sum(duration for duration, _ in times.values())
+    return f'Temps : {phases}, total {total * 1000:.1f} ms'
+
+
+if __name__ == "__main__":
+    timing = True
+    with span('parse'):
+        sum(timed('lex', abs)(i) for i in range(100000))
+    write(report())
@@ -1,36 +1,334 @@
 """No comment"""
+import argparse
+import concurrent.futures
+import contextlib
+import hashlib
+import io
+import json
 import os
 import glob
 import sys
+import Diagnostic
 import Generator
+import Pool
+import Trace
 
 
 class Translator:
-    """No comment"""
+    """No comment
 
-    def __init__(self, files):
+    Avec `pool`, les chaînes littérales du programme sont mises en commun
+    (voir Pool) : Main est alors compilée en dernier, quand toutes les
+    chaînes des autres classes sont connues. Le pool demande la classe Main
+    du programme ; sans elle, les littéraux sont compilés comme avant.
+
+    Chaque `<Classe>.vm` est écrit à côté de son source. Avec `jobs` > 1,
+    les classes sont compilées par autant de processus : chacun renvoie le
+    code VM et les messages de sa classe, que ce processus écrit.
+
+    Avec `incremental`, chaque classe a aussi son fichier d'interface
+    `<Classe>.itf` (voir Generator.interface), avec l'empreinte de son
+    source et de son .vm. Seules sont recompilées les classes modifiées, et
+    celles qui appellent un sous-programme dont l'interface a changé.
+
+    Avec `optimize`, les petits sous-programmes de toutes les classes sont
+    d'abord relevés (voir Inlining.templates) : chaque classe peut alors
+    recopier ceux des autres à la place de leurs appels. Ces modèles font
+    partie de l'interface, une classe qui en a recopié un est recompilée
+    quand il change. Sans `jobs`, l'analyse faite pour relever les modèles
+    est celle que compile le Generator : chaque source n'est lu qu'une fois.
+
+    `debug` ('xml', 'dot') écrit aussi ces représentations de chaque
+    classe compilée, à partir de l'arbre de sa seule analyse (voir
+    Generator) ; en mode incrémental, une classe dont l'une manque est
+    recompilée.
+
+    Les commandes VM de chaque classe restent dans `modules` (voir
+    Vm.Module ; le .vm d'une classe à jour, en mode incrémental), que le
+    VMTranslator traduit directement (voir Compiler). Avec `vm` faux (et
+    sans `incremental`), les .vm ne sont pas écrits.
+    """
+
+    def __init__(self, files, pool=False, jobs=1, incremental=False, optimize=False, vm=True, debug=()):
         self.files = files
+        self.pool = Pool.Pool() if pool else None
+        self.jobs = jobs
+        self.incremental = incremental
+        self.optimize = optimize
+        # avec optimize, modèles à recopier de toutes les classes (voir _index)
+        self.index = None
+        # classes analysées par _index, que le Generator ne relit pas ; avec
+        # jobs, chaque processus analyse les siennes : lui envoyer l'arbre
+        # coûte plus que le relire
+        self.analyses = {}
+        # le mode incrémental relit les .vm des classes à jour
+        self.vm = vm or incremental
+        self.debug = tuple(debug)
+        self.modules = []
 
     def translate(self):
         """No comment"""
 
         if os.path.isfile(self.files):
-            self._translateonefile(self.files)
+            files = [self.files]
+        elif os.path.isdir(self.files):
+            files = glob.glob(f'{self.files}/*.jack')
         else:
-            if os.path.isdir(self.files):
-                for file in glob.glob(f'{self.files}/*.jack'):
-                    self._translateonefile(file)
+            raise Diagnostic.Error(self.files, file=self.files, kind='FileNotFoundError')
+        main = None
+        if self.pool is not None:
+            mains = [file for file in files if os.path.basename(file) == 'Main.jack']
+            if mains:
+                files = [file for file in files if file not in mains] + mains
+                main = files[-1]
+            else:
+                self.pool = None
+        others = [file for file in files if file != main]
 
-    def _translateonefile(self, file):
-        """No comment"""
-        generator = Generator.Generator(file)
-        generator.jackclass()
+        # interfaces de la construction précédente
+        old = {file: self._load(file) for file in files} if self.incremental else {}
+        if self.incremental:
+            todo = [file for file in others if self._outdated(file, old[file])]
+        else:
+            todo = others
+        if self.optimize:
+            self.index = self._index(files, old)
+        results = self._translatefiles(todo)
+        if self.incremental:
+            dependents = [file for file in others
+                          if file not in results and self._depends(old[file], old, results)]
+            results.update(self._translatefiles(dependents))
+
+        for file in others:
+            if file in results:
+                self._write(file, results[file])
+            else:
+                self._uptodate(file, old[file])
+            if self.pool is not None:
+                self.pool.merge(results[file]['pool'] if file in results else Pool.Pool.fromState(old[file]['pool']))
+        if main is not None:
+            self._translatemain(main, old.get(main), old, results)
+
+        if self.pool is not None:
+            print(self.pool.report(), file=sys.stderr)
+
+    def _translatefiles(self, files):
+        """Compile les classes, en parallèle avec `jobs` ; retourne fichier -> résultat de _translateonefile"""
+        pool = self.pool is not None
+        if self.jobs <= 1 or len(files) <= 1:
+            return {file: _translateonefile(file, Pool.Pool() if pool else None, self.optimize, self.index, self.vm,
+                                            self.debug, self.analyses.pop(file, None))
+                    for file in files}
+        with concurrent.futures.ProcessPoolExecutor(min(self.jobs, len(files))) as executor:
+            # les plus grosses classes d'abord : la fin attend le moins possible
+            futures = {file: executor.submit(_compile, file, pool, self.optimize, self.index, self.vm,
+                                             self.debug, Trace.level, Trace.timing)
+                       for file in sorted(files, key=os.path.getsize, reverse=True)}
+            results = {file: futures[file].result() for file in files}
+        for result in results.values():
+            sys.stdout.write(result['stdout'])
+            Trace.out.write(result['trace'])
+            Trace.merge(result['times'])
+        for result in results.values():
+            # la première erreur dans l'ordre des fichiers, comme sans --jobs
+            if result['error'] is not None:
+                raise result['error']
+        return results
+
+    def _translatemain(self, main, itf, old, results):
+        """Compile Main avec le pool des autres classes, si elle ou ce pool ont changé"""
+        others = _json([list(self.pool.strings), self.pool.classes, self.pool.statics])
+        if (self.incremental and not self._outdated(main, itf) and itf['others'] == others
+                and not self._depends(itf, old, results)):
+            self._uptodate(main, itf)
+            self.pool.merge(Pool.Pool.fromState(itf['pool']))
+            return
+        strings, uses, appendchars = len(self.pool.strings), self.pool.uses, self.pool.appendchars
+        result = _translateonefile(main, self.pool, self.optimize, self.index, self.vm, self.debug,
+                                   self.analyses.pop(main, None))
+        # ce que Main ajoute au pool, pour le retrouver sans la recompiler
+        result['pool'] = Pool.Pool.fromState({'strings': list(self.pool.strings)[strings:], 'classes': {},
+                                              'uses': self.pool.uses - uses,
+                                              'appendchars': self.pool.appendchars - appendchars,
+                                              'statics': {result['name']: self.pool.statics[result['name']]}})
+        self._write(main, result, others=others)
+
+    def _write(self, file, result, **extra):
+        """Écrit le .vm de la classe et, en mode incrémental, son interface"""
+        self.modules.append(result['module'])
+        if self.vm:
+            Generator.save(_vmpath(file, result['name']), result['vm'])
+        if self.incremental:
+            itf = dict(result['interface'], source=_hash(_read(file)), vm=_hash(result['vm']),
+                       compiler=_compiler(), options=self._options(),
+                       pool=result['pool'].state() if result['pool'] is not None else None, **extra)
+            Generator.save(_itfpath(file), json.dumps(itf, separators=(',', ':')) + '\n')
+
+    def _index(self, files, old):
+        """Modèles à recopier de chaque classe, {classe: {nom: modèle}} : ceux de
+        l'interface d'une classe à jour, sinon ceux de son arbre ; l'analyse de la
+        classe est gardée pour sa compilation (voir Generator.analyse)"""
+        index = {}
+        with Trace.span('inline'):
+            for file in files:
+                itf = old.get(file)
+                if itf is not None and not self._outdated(file, itf):
+                    index[itf['name']] = {name: entry[3] for name, entry in itf['subroutines'].items()
+                                          if entry[3] is not None}
+                else:
+                    analysis = Generator.analyse(file, optimize=True, debug=self.debug if self.jobs <= 1 else ())
+                    index[analysis.arbre.name] = analysis.templates
+                    if self.jobs <= 1:
+                        self.analyses[file] = analysis
+        return index
+
+    def _uptodate(self, file, itf):
+        """La classe n'est pas recompilée : son .vm est celui de la construction précédente"""
+        self.modules.append(_vmpath(file, itf['name']))
+        if Trace.level >= Trace.PHASES:
+            Trace.write(f"Up to date: {itf['name']}")
+
+    def _options(self):
+        return {'pool': self.pool is not None, 'optimize': self.optimize}
+
+    def _load(self, file):
+        """Interface de la construction précédente, ou None"""
+        try:
+            with open(_itfpath(file)) as itf:
+                return json.load(itf)
+        except (OSError, ValueError):
+            return None
+
+    def _outdated(self, file, itf):
+        """Vrai si la classe doit être recompilée : son source, son .vm, le compilateur ou les options ont
+        changé, ou il manque une des représentations de `debug`"""
+        if itf is None or itf['source'] != _hash(_read(file)):
+            return True
+        if any(not os.path.exists(file[0:-5] + '.' + output) for output in self.debug):
+            return True
+        if itf['compiler'] != _compiler() or itf['options'] != self._options():
+            return True
+        vm = _read(_vmpath(file, itf['name']))
+        return vm is None or itf['vm'] != _hash(vm)
+
+    def _depends(self, itf, old, results):
+        """Vrai si la classe appelle un sous-programme dont l'interface vient de changer"""
+        changed = {}
+        for file, result in results.items():
+            before = old.get(file)
+            changed[result['interface']['name']] = (before['subroutines'] if before else {},
+                                                    result['interface']['subroutines'])
+        for call in itf['calls']:
+            name, subroutine = call.split('.', 1)
+            if name in changed:
+                before, after = changed[name]
+                if before.get(subroutine) != _json(after.get(subroutine)):
+                    return True
+        return False
+
+
+def _translateonefile(file, pool, optimize, index=None, text=True, debug=(), analysis=None):
+    """Compile une classe : {'name', 'vm' (le texte, avec `text`), 'module' (voir Vm.Module), 'pool', 'interface'}"""
+    generator = Generator.Generator(file, pool, optimize, index, debug=debug, analysis=analysis)
+    generator.jackclass()
+    return {'name': generator.arbre.name, 'vm': generator.vm() if text else None, 'module': generator.module(),
+            'pool': generator.pool, 'interface': generator.interface()}
+
+
+def _compile(file, pool, optimize, index, text, debug, level, timing):
+    """Compile une classe dans un processus de Translator._translatefiles.
+
+    Retourne le résultat de _translateonefile avec les sorties de la
+    compilation et 'error', la Diagnostic.Error levée ou None.
+    """
+    Trace.level = level
+    Trace.timing = timing
+    Trace.times.clear()
+    Trace.out = io.StringIO()
+    stdout = io.StringIO()
+    result = {'name': None, 'vm': None, 'module': None, 'pool': None, 'interface': None}
+    error = None
+    with contextlib.redirect_stdout(stdout):
+        try:
+            result = _translateonefile(file, Pool.Pool() if pool else None, optimize, index, text, debug)
+        except Diagnostic.Error as exception:
+            error = exception
+    result.update(stdout=stdout.getvalue(), trace=Trace.out.getvalue(), times=dict(Trace.times), error=error)
+    return result
+
+
+def _vmpath(file, name):
+    return os.path.join(os.path.dirname(file), name + '.vm')
+
+
+def _itfpath(file):
+    return file[0:-5] + '.itf'
+
+
+def _read(file):
+    try:
+        with open(file, 'rb') as source:
+            return source.read()
+    except OSError:
+        return None
+
+
+def _hash(data):
+    if isinstance(data, str):
+        data = data.encode()
+    return hashlib.sha1(data).hexdigest()
+
+
+def _json(value):
+    """La valeur telle qu'elle sera relue d'un fichier d'interface"""
+    return json.loads(json.dumps(value))
+
+
+_fingerprint = None
+
+
+def _compiler():
+    """Empreinte des sources du compilateur : une autre version recompile tout"""
+    global _fingerprint
+    if _fingerprint is None:
+        sources = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py')))
+        # Vm, importé de VMTranslator, écrit le texte des commandes produites
+        sources.append(Generator.Vm.__file__)
+        _fingerprint = _hash(b''.join(_read(source) for source in sources))
+    return _fingerprint
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 1:
-        print("Usage: Translator.py <jack file| dir>")
-    else:
-        jackfiles = sys.argv[1]
-        translator = Translator(jackfiles)
+    arguments = argparse.ArgumentParser(description="Compile des classes Jack en code VM")
+    arguments.add_argument('jackfiles', help="fichier .jack ou répertoire")
+    arguments.add_argument('--pool', action='store_true',
+                           help="construit une seule fois chaque chaîne littérale du programme")
+    arguments.add_argument('-v', '--verbose', action='count', default=0,
+                           help="trace sur stderr : -v classes, -vv arbre et code VM, -vvv tokens")
+    arguments.add_argument('--time', action='store_true',
+                           help="temps passé dans chaque phase (lex, parse, xml, dot, codegen)")
+    arguments.add_argument('-O', '--optimize', action='store_true',
+                           help="calcule les expressions constantes, retire le code mort (voir Folding), "
+                                "réutilise les calculs communs et sort des boucles les calculs invariants "
+                                "(voir Hoisting), recopie les petits sous-programmes à la place de leurs appels "
+                                "(voir Inlining), et remplace les multiplications et divisions par une constante")
+    arguments.add_argument('-j', '--jobs', type=int, default=1, metavar='N',
+                           help="compile les classes avec N processus")
+    arguments.add_argument('-i', '--incremental', action='store_true',
+                           help="ne recompile que les classes modifiées et celles qui en dépendent")
+    arguments.add_argument('--xml', action='store_true',
+                           help="écrit aussi le .xml de chaque classe (voir toxml), sans l'analyser une seconde fois")
+    arguments.add_argument('--dot', action='store_true',
+                           help="écrit aussi le .dot de l'arbre de chaque classe (voir todot)")
+    args = arguments.parse_args()
+    Trace.level = args.verbose
+    Trace.timing = args.time
+    debug = [output for output in ('xml', 'dot') if getattr(args, output)]
+    translator = Translator(args.jackfiles, args.pool, args.jobs, args.incremental, args.optimize, debug=debug)
+    try:
         translator.translate()
+    except Diagnostic.Error as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    if Trace.timing:
+        Trace.write(Trace.report())
@@ -1,4 +1,5 @@
 import sys
+import Ast
 
 
 class Todot:
@@ -46,7 +47,7 @@ class Todot:
             self.dotAny(l, v)
 
     def dotAny(self, pred, val, label=''):
-        if type(val) == type({}):
+        if type(val) == type({}) or isinstance(val, Ast.Node):
             self.dotDict(pred, val, label)
         elif type(val) == type([]):
             self.dotList(pred, val, label)
@@ -63,6 +64,7 @@ class Todot:
         self.dotAny('n0', val)
         self.dot.write('''}
         ''')
+        self.dot.close()
 
 
 if __name__ == "__main__":
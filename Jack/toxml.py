@@ -0,0 +1,265 @@
+"""No comment"""
+import sys
+
+# morceaux de texte gardés avant chaque écriture dans le fichier
+BUFFER = 512
+# caractères remplacés dans le texte des tokens
+ESCAPES = str.maketrans({'&': '&amp;', '<': '&lt;', '>': '&gt;'})
+PRIMITIVES = ('int', 'char', 'boolean')
+
+
+class Toxml:
+    """Écrit l'arbre de Parser en XML, un élément par règle de la grammaire et un par token.
+
+    Le texte est produit en parcourant l'arbre et écrit par paquets de
+    BUFFER morceaux dans `xml`, un flux texte ouvert (un fichier,
+    io.StringIO...) que Toxml ne ferme pas : le texte n'est jamais entier
+    en mémoire et il y a peu d'appels à write. Les tokens sont ceux du
+    source (les chaînes avec leurs guillemets), `&`, `<` et `>` sont
+    échappés. `save` écrit le .xml à côté du source.
+    """
+
+    def __init__(self, xml):
+        self.xml = xml
+        self.parts = []
+
+    def write(self, text):
+        """Ajoute du texte, écrit dans le flux tous les BUFFER morceaux"""
+        self.parts.append(text)
+        if len(self.parts) >= BUFFER:
+            self.flush()
+
+    def flush(self):
+        """Écrit dans le flux les morceaux gardés"""
+        self.xml.write("".join(self.parts))
+        self.parts.clear()
+
+    def token(self, type, value):
+        """Élément d'un token, son texte échappé"""
+        self.write(f"<{type}>{value.translate(ESCAPES)}</{type}>\n")
+
+    def keyword(self, value):
+        """No comment"""
+        self.token('keyword', value)
+
+    def symbol(self, value):
+        """No comment"""
+        self.token('symbol', value)
+
+    def identifier(self, rule, name):
+        """Identificateur dans l'élément de sa règle (className, varName...)"""
+        self.write(f"<{rule}><identifier>{name}</identifier>\n</{rule}>\n")
+
+    def toxml(self, arbre):
+        """Écrit le XML de la classe (un arbre de Parser.jackclass)"""
+        self.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        self.jackclass(arbre)
+        self.flush()
+
+    def jackclass(self, arbre):
+        """class: 'class' className '{' classVarDec* subroutineDec* '}'"""
+        self.write("<class>\n")
+        self.keyword('class')
+        self.identifier('className', arbre.name)
+        self.symbol('{')
+        for var in arbre.classVarDec:
+            self.write("<classVarDec>\n")
+            self.keyword(var.kind)
+            self.vars(var)
+            self.write("</classVarDec>\n")
+        for routine in arbre.subroutineDec:
+            self.subroutineDec(routine)
+        self.symbol('}')
+        self.write("</class>\n")
+
+    def vars(self, var):
+        """type varName (',' varName)* ';' d'une déclaration de variables"""
+        self.type(var.varType)
+        for i, name in enumerate(var.vars):
+            if i:
+                self.symbol(',')
+            self.identifier('varName', name)
+        self.symbol(';')
+
+    def type(self, type):
+        """type: 'int'|'char'|'boolean'|className"""
+        self.write("<type>\n")
+        if type in PRIMITIVES:
+            self.keyword(type)
+        else:
+            self.identifier('className', type)
+        self.write("</type>\n")
+
+    def subroutineDec(self, routine):
+        """subroutineDec, avec parameterList et subroutineBody (varDec* statements)"""
+        self.write("<subroutineDec>\n")
+        self.keyword(routine.subroutineType)
+        if routine.returnType == 'void':
+            self.keyword('void')
+        else:
+            self.type(routine.returnType)
+        self.identifier('subroutineName', routine.name)
+        self.symbol('(')
+        self.write("<parameterList>\n")
+        for i, param in enumerate(routine.parameters):
+            if i:
+                self.symbol(',')
+            self.type(param.type)
+            self.identifier('varName', param.name)
+        self.write("</parameterList>\n")
+        self.symbol(')')
+        self.write("<subroutineBody>\n")
+        self.symbol('{')
+        for var in routine.body.vars:
+            self.write("<varDec>\n")
+            self.keyword('var')
+            self.vars(var)
+            self.write("</varDec>\n")
+        self.statements(routine.body.statements)
+        self.symbol('}')
+        self.write("</subroutineBody>\n")
+        self.write("</subroutineDec>\n")
+
+    def statements(self, statements):
+        """statements: statement*, chacun écrit par son sous-programme de STATEMENTS"""
+        self.write("<statements>\n")
+        for statement in statements:
+            self.write("<statement>\n")
+            self.write(f"<{statement.type}>\n")
+            STATEMENTS[statement.type](self, statement)
+            self.write(f"</{statement.type}>\n")
+            self.write("</statement>\n")
+        self.write("</statements>\n")
+
+    def letStatement(self, statement):
+        """letStatement: 'let' varName ('[' expression ']')? '=' expression ';'"""
+        self.keyword('let')
+        self.identifier('varName', statement.name)
+        if statement.index is not None:
+            self.symbol('[')
+            self.expression(statement.index)
+            self.symbol(']')
+        self.symbol('=')
+        self.expression(statement.value)
+        self.symbol(';')
+
+    def ifStatement(self, statement):
+        """ifStatement: 'if' '(' expression ')' '{' statements '}' ('else' '{' statements '}')?"""
+        self.keyword('if')
+        self.block(statement.condition, statement.ifStatements)
+        if statement.elseStatements is not None:
+            self.keyword('else')
+            self.symbol('{')
+            self.statements(statement.elseStatements)
+            self.symbol('}')
+
+    def whileStatement(self, statement):
+        """whileStatement: 'while' '(' expression ')' '{' statements '}'"""
+        self.keyword('while')
+        self.block(statement.condition, statement.body)
+
+    def block(self, condition, statements):
+        """'(' expression ')' '{' statements '}' de if et while"""
+        self.symbol('(')
+        self.expression(condition)
+        self.symbol(')')
+        self.symbol('{')
+        self.statements(statements)
+        self.symbol('}')
+
+    def doStatement(self, statement):
+        """doStatement: 'do' subroutineCall ';'"""
+        self.keyword('do')
+        self.subroutineCall(statement.call)
+        self.symbol(';')
+
+    def returnStatement(self, statement):
+        """returnStatement: 'return' expression? ';'"""
+        self.keyword('return')
+        if statement.expression is not None:
+            self.expression(statement.expression)
+        self.symbol(';')
+
+    def expression(self, exp):
+        """expression: term (op term)*"""
+        self.write("<expression>\n")
+        self.term(exp.operands[0])
+        for op, term in zip(exp.operators, exp.operands[1:]):
+            self.write("<op>\n")
+            self.symbol(op)
+            self.write("</op>\n")
+            self.term(term)
+        self.write("</expression>\n")
+
+    def term(self, t):
+        """term: constante, varName, varName '[' expression ']', subroutineCall, '(' expression ')' ou unaryOp term"""
+        self.write("<term>\n")
+        sub_type = t.subType
+        if sub_type == 'integerConstant':
+            self.token('IntegerConstant', t.value)
+        elif sub_type == 'stringConstant':
+            self.token('StringConstant', f'"{t.value}"')
+        elif sub_type == 'keywordConstant':
+            self.write("<keyWordConstant>\n")
+            self.keyword(t.value)
+            self.write("</keyWordConstant>\n")
+        elif sub_type == 'varName':
+            self.identifier('varName', t.name)
+        elif sub_type == 'arrayAccess':
+            self.identifier('varName', t.name)
+            self.symbol('[')
+            self.expression(t.index)
+            self.symbol(']')
+        elif sub_type == 'subroutineCall':
+            self.subroutineCall(t.call)
+        elif sub_type == 'expression':
+            self.symbol('(')
+            self.expression(t.value)
+            self.symbol(')')
+        else:
+            self.write("<unaryOp>\n")
+            self.symbol(t.op)
+            self.write("</unaryOp>\n")
+            self.term(t.term)
+        self.write("</term>\n")
+
+    def subroutineCall(self, call):
+        """subroutineCall: ((className|varName) '.')? subroutineName '(' expressionList ')'"""
+        self.write("<subroutineCall>\n")
+        if call.object is not None:
+            self.token('identifier', call.object)
+            self.symbol('.')
+        self.token('identifier', call.name)
+        self.symbol('(')
+        self.write("<expressionList>\n")
+        for i, arg in enumerate(call.args):
+            if i:
+                self.symbol(',')
+            self.expression(arg)
+        self.write("</expressionList>\n")
+        self.symbol(')')
+        self.write("</subroutineCall>\n")
+
+
+# type de l'instruction -> sous-programme qui écrit ses tokens
+STATEMENTS = {
+    'letStatement': Toxml.letStatement,
+    'ifStatement': Toxml.ifStatement,
+    'whileStatement': Toxml.whileStatement,
+    'doStatement': Toxml.doStatement,
+    'returnStatement': Toxml.returnStatement,
+}
+
+
+def save(file, arbre):
+    """Écrit le XML de l'arbre à côté du source `file` : Main.jack donne Main.xml"""
+    with open(file[0:-5] + ".xml", "w") as xml:
+        Toxml(xml).toxml(arbre)
+
+
+if __name__ == "__main__":
+    import Parser
+    file = sys.argv[1]
+    print('-----debut')
+    save(file, Parser.Parser(file).jackclass())
+    print('-----fin')
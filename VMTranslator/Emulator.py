@@ -0,0 +1,138 @@
+"""Assembleur et émulateur du processeur Hack, pour mesurer le code produit"""
+
+import sys
+
+# valeurs prédéfinies des symboles du langage d'assemblage Hack
+SYMBOLS = {'SP': 0, 'LCL': 1, 'ARG': 2, 'THIS': 3, 'THAT': 4,
+           'SCREEN': 16384, 'KBD': 24576, **{f'R{i}': i for i in range(16)}}
+
+# calcul de l'ALU : comp -> fonction (a, d, m)
+COMP = {
+    '0': lambda a, d, m: 0, '1': lambda a, d, m: 1, '-1': lambda a, d, m: -1,
+    'D': lambda a, d, m: d, 'A': lambda a, d, m: a, 'M': lambda a, d, m: m,
+    '!D': lambda a, d, m: ~d, '!A': lambda a, d, m: ~a, '!M': lambda a, d, m: ~m,
+    '-D': lambda a, d, m: -d, '-A': lambda a, d, m: -a, '-M': lambda a, d, m: -m,
+    'D+1': lambda a, d, m: d + 1, 'A+1': lambda a, d, m: a + 1, 'M+1': lambda a, d, m: m + 1,
+    'D-1': lambda a, d, m: d - 1, 'A-1': lambda a, d, m: a - 1, 'M-1': lambda a, d, m: m - 1,
+    'D+A': lambda a, d, m: d + a, 'D+M': lambda a, d, m: d + m,
+    'D-A': lambda a, d, m: d - a, 'D-M': lambda a, d, m: d - m,
+    'A-D': lambda a, d, m: a - d, 'M-D': lambda a, d, m: m - d,
+    'D&A': lambda a, d, m: d & a, 'D&M': lambda a, d, m: d & m,
+    'D|A': lambda a, d, m: d | a, 'D|M': lambda a, d, m: d | m,
+}
+COMP.update({'A+D': COMP['D+A'], 'M+D': COMP['D+M'], 'A&D': COMP['D&A'], 'M&D': COMP['D&M'],
+             'A|D': COMP['D|A'], 'M|D': COMP['D|M']})
+
+# condition de saut en fonction de la valeur (signée) calculée
+JUMP = {
+    'JGT': lambda v: v > 0, 'JEQ': lambda v: v == 0, 'JGE': lambda v: v >= 0,
+    'JLT': lambda v: v < 0, 'JNE': lambda v: v != 0, 'JLE': lambda v: v <= 0,
+    'JMP': lambda v: True,
+}
+
+
+def word(value):
+    """Ramène un entier sur 16 bits signés"""
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+class Emulator:
+    """Assemble un programme Hack et l'exécute en comptant les cycles.
+
+    `cycles` compte les instructions exécutées, `jumps` les instructions de
+    saut exécutées (prises ou non) et `taken` les sauts effectivement pris.
+    La ROM n'est pas limitée à 32K mots, pour pouvoir mesurer l'OS complet.
+    """
+
+    def __init__(self, asm):
+        if hasattr(asm, 'read'):
+            asm = asm.read()
+        elif '\n' not in asm:
+            with open(asm) as file:
+                asm = file.read()
+        self.program = self._assemble(asm)
+        self.ram = [0] * 32768
+        self.pc = 0
+        self.a = 0
+        self.d = 0
+        self.cycles = 0
+        self.jumps = 0
+        self.taken = 0
+
+    def _assemble(self, asm):
+        # première passe : étiquettes, seconde passe : variables et décodage
+        lines = []
+        labels = dict(SYMBOLS)
+        for line in asm.splitlines():
+            line = line.split('//')[0].strip()
+            if not line:
+                continue
+            if line.startswith('('):
+                labels[line[1:-1]] = len(lines)
+            else:
+                lines.append(line)
+        variable = 16
+        program = []
+        for line in lines:
+            if line.startswith('@'):
+                symbol = line[1:]
+                if symbol.isdigit():
+                    value = int(symbol)
+                else:
+                    if symbol not in labels:
+                        labels[symbol] = variable
+                        variable += 1
+                    value = labels[symbol]
+                program.append((value, None, None, None))
+            else:
+                dest, _, rest = line.rpartition('=')
+                comp, _, jump = rest.partition(';')
+                program.append((None, dest, COMP[comp], JUMP[jump] if jump else None))
+        self.labels = labels
+        return program
+
+    def run(self, cycles=None, until=None):
+        """Exécute jusqu'à `cycles` instructions ou jusqu'à l'adresse `until`"""
+        program = self.program
+        ram = self.ram
+        pc, a, d = self.pc, self.a, self.d
+        count = jumps = taken = 0
+        size = len(program)
+        while pc < size and (cycles is None or count < cycles) and pc != until:
+            value, dest, comp, jump = program[pc]
+            count += 1
+            if comp is None:
+                a = value
+                pc += 1
+                continue
+            res = word(comp(a, d, ram[a & 0x7FFF]))
+            target = a & 0xFFFF
+            if dest:
+                if 'M' in dest:
+                    ram[a & 0x7FFF] = res
+                if 'D' in dest:
+                    d = res
+                if 'A' in dest:
+                    a = res
+            if jump is not None:
+                jumps += 1
+                if jump(res):
+                    taken += 1
+                    pc = target
+                    continue
+            pc += 1
+        self.pc, self.a, self.d = pc, a, d
+        self.cycles += count
+        self.jumps += jumps
+        self.taken += taken
+        return self
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: Emulator.py <asm file> [<cycles>]")
+    else:
+        emulator = Emulator(sys.argv[1])
+        emulator.run(int(sys.argv[2]) if len(sys.argv) > 2 else None)
+        print(f'cycles={emulator.cycles} jumps={emulator.jumps} taken={emulator.taken}')
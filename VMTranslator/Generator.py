@@ -1,16 +1,46 @@
 """No comment"""
 
+import os
 import sys
+import Intrinsics
+import Optimizer
 import Parser
+import Vm
 
 
 class Generator:
     """No comment"""
 
-    def __init__(self, file=None):
-        """No comment"""
+    def __init__(self, file=None, optimize=False, intrinsics=False, image=None):
+        """No comment
+
+        Avec `optimize`, les commandes passent par l'Optimizer (graphe de flot
+        de contrôle) avant d'être traduites. Avec `intrinsics`, les appels aux
+        fonctions de l'OS connues d'Intrinsics sont remplacés par des routines
+        en assembleur écrites à la main. `image` est la section de données
+        (voir Image) partagée par tous les fichiers du programme : les appels
+        aux fonctions qu'elle remplace deviennent des sauts vers ses routines
+        et les fonctions devenues inutiles ne sont pas traduites.
+        `file` est un chemin, un fichier ouvert, ou un Vm.Module dont les
+        commandes sont traduites sans passer par le texte.
+        """
+        self.parser = None
+        self.intrinsics = Intrinsics.Intrinsics(self) if intrinsics else None
+        self.image = image
+        self._label_count = 0
+        # nom du fichier (préfixe des variables static) et fonction courante
+        self.filename = None
+        self.function = 'Bootstrap'
         if file is not None:
-            self.parser = Parser.Parser(file)
+            self.parser = file.parser() if isinstance(file, Vm.Module) else Parser.Parser(file)
+            if optimize:
+                self.parser = Optimizer.Optimizer(self.parser)
+            if isinstance(file, Vm.Module):
+                self.filename = file.name
+                self.function = self.filename
+            elif isinstance(file, str):
+                self.filename = os.path.splitext(os.path.basename(file))[0]
+                self.function = self.filename
 
     def __iter__(self):
         return self
@@ -39,13 +69,24 @@ class Generator:
                     return self._commandpush(command)
                 case 'pop':
                     return self._commandpop(command)
-                case 'add' | 'sub' | 'neg' | 'eq' | 'gt' | 'lt' | 'and' | 'or' | 'not':
+                case 'add' | 'sub' | 'neg' | 'and' | 'or' | 'not':
                     return self._commandarith(command)
-                case 'Call':
-                    return self.commandcall(command)
+                case 'eq' | 'gt' | 'lt':
+                    return self._commandcompare(command)
+                case 'label':
+                    return self._commandlabel(command)
+                case 'goto':
+                    return self._commandgoto(command)
+                case 'if-goto':
+                    return self._commandifgoto(command)
+                case 'function':
+                    return self._commandfunction(command)
+                case 'call':
+                    return self._commandcall(command)
+                case 'return':
+                    return self._commandreturn(command)
                 case _:
-                    print(f'SyntaxError : {command}')
-                    exit()
+                    raise Vm.Error('SyntaxError', str(command), command['line'], command['col'])
 
     def _commandpush(self, command):
         """No comment"""
@@ -57,9 +98,10 @@ class Generator:
                 return self._commandpushconstant(command)
             case 'local' | 'argument' | 'this' | 'that':
                 return self._commandpushsegment(command)
+            case 'static' | 'temp' | 'pointer':
+                return self._commandpushfixed(command)
             case _:
-                print(f'SyntaxError : {command}')
-                exit()
+                raise Vm.Error('SyntaxError', str(command), command['line'], command['col'])
 
     def _commandpop(self, command):
         """No comment"""
@@ -67,15 +109,16 @@ class Generator:
         match segment:
             case 'local' | 'argument' | 'this' | 'that':
                 return self._commandpopsegment(command)
+            case 'static' | 'temp' | 'pointer':
+                return self._commandpopfixed(command)
             case _:
-                print(f'SyntaxError : {command}')
-                exit()
+                raise Vm.Error('SyntaxError', str(command), command['line'], command['col'])
 
     def _commandpushconstant(self, command):
         """Push constant value onto the stack"""
         parameter = command['parameter']
         return f"""\t// push constant {parameter}
-    @ {parameter}
+    @{parameter}
     D=A
     @SP
     A=M
@@ -131,6 +174,39 @@ class Generator:
     A=M
     M=D\n"""
 
+    def _address(self, command):
+        # adresse fixe d'une case des segments static, temp et pointer
+        segment = command['segment']
+        index = int(command['parameter'])
+        match segment:
+            case 'static':
+                prefix = self.filename if self.filename is not None else self.function.split('.')[0]
+                return f"{prefix}.{index}"
+            case 'temp':
+                return f"R{5 + index}"
+            case 'pointer':
+                return 'THIS' if index == 0 else 'THAT'
+
+    def _commandpushfixed(self, command):
+        """Push value from static/temp/pointer segment"""
+        return f"""\t// push {command['segment']} {command['parameter']}
+    @{self._address(command)}
+    D=M
+    @SP
+    A=M
+    M=D
+    @SP
+    M=M+1\n"""
+
+    def _commandpopfixed(self, command):
+        """Pop value from the stack into static/temp/pointer segment"""
+        return f"""\t// pop {command['segment']} {command['parameter']}
+    @SP
+    AM=M-1
+    D=M
+    @{self._address(command)}
+    M=D\n"""
+
     def _commandarith(self, command):
         """Handle arithmetic and logical commands"""
         operation = command['type']
@@ -215,31 +291,166 @@ class Generator:
         """Check if the second-to-top element is less than the top"""
         return self._comparison_template("JLT")
 
+    def _commandcompare(self, command):
+        """Comparison, fused with a following ([not] if-goto) into one jump"""
+        jump = {'eq': 'JEQ', 'gt': 'JGT', 'lt': 'JLT'}[command['type']]
+        following = self.parser.look()
+        if following is not None and following['type'] == 'not':
+            self.parser.next()
+            following = self.parser.look()
+            if following is None or following['type'] != 'if-goto':
+                return self._commandarith(command) + self._commandnot()
+            jump = {'JEQ': 'JNE', 'JGT': 'JLE', 'JLT': 'JGE'}[jump]
+        elif following is None or following['type'] != 'if-goto':
+            return self._commandarith(command)
+        return self._branch_template(jump, self.parser.next())
+
+    def _branch_template(self, jump, command):
+        """Pop two elements and jump to the if-goto label if x-y satisfies jump"""
+        return f"""\t// {jump.lower()} if-goto {command['label']}
+    @SP
+    AM=M-1
+    D=M
+    A=A-1
+    D=M-D
+    @SP
+    M=M-1
+    @{self.function}${command['label']}
+    D;{jump}\n"""
+
     def _comparison_template(self, jump):
         """Template for equality and comparison (eq, gt, lt)"""
+        label = self._new_label()
         return f"""\t// {jump.lower()}
     @SP
     AM=M-1
     D=M
     A=A-1
     D=M-D
-    @TRUE_{jump}
+    @TRUE_{jump}.{label}
     D;{jump}
     @SP
     A=M-1
     M=0
-    @END_{jump}
+    @END_{jump}.{label}
     0;JMP
-(TRUE_{jump})
+(TRUE_{jump}.{label})
     @SP
     A=M-1
     M=-1
-(END_{jump})\n"""
+(END_{jump}.{label})\n"""
+
+    def _new_label(self):
+        # suffixe unique pour les étiquettes générées, préfixé par la fonction courante
+        label = f"{self.function}${self._label_count}"
+        self._label_count += 1
+        return label
+
+    def _commandlabel(self, command):
+        """Declare a label local to the current function"""
+        return f"""\t// label {command['label']}
+({self.function}${command['label']})\n"""
+
+    def _commandgoto(self, command):
+        """Unconditional jump to a label of the current function"""
+        return f"""\t// goto {command['label']}
+    @{self.function}${command['label']}
+    0;JMP\n"""
+
+    def _commandifgoto(self, command):
+        """Pop the top of the stack and jump if it is not zero"""
+        return f"""\t// if-goto {command['label']}
+    @SP
+    AM=M-1
+    D=M
+    @{self.function}${command['label']}
+    D;JNE\n"""
+
+    def _commandfunction(self, command):
+        """Declare a function and initialise its local variables to 0"""
+        self.function = command['function']
+        if self.image is not None and self.function in self.image.dead:
+            # fonction remplacée par la section de données : on saute son code
+            while self.parser.hasNext() and self.parser.look()['type'] != 'function':
+                self.parser.next()
+            return f"""\t// function {command['function']} {command['parameter']} (image)\n"""
+        push = """    @SP
+    A=M
+    M=0
+    @SP
+    M=M+1\n""" * int(command['parameter'])
+        return f"""\t// function {command['function']} {command['parameter']}
+({command['function']})\n{push}"""
 
     def _commandcall(self, command):
-        """No comment"""
-        return f"""\t//{command['type']} {command['function']} {command['parameter']}
-    Code assembleur de {command}\n"""
+        """Save the caller frame and jump to the called function"""
+        if self.intrinsics is not None and command['function'] in self.intrinsics:
+            return self.intrinsics.call(command)
+        if self.image is not None and command['function'] in self.image:
+            return self.image.call(command, f"RET_{self._new_label()}")
+        ret = f"RET_{self._new_label()}"
+        return f"""\t// call {command['function']} {command['parameter']}
+    @{ret}
+    D=A
+{self._frame(command['function'], command['parameter'])}({ret})\n"""
+
+    def _frame(self, function, parameter):
+        """Push the return address held in D and the caller frame, then jump"""
+        save = ''.join(f"""    @{pointer}
+    D=M
+    @SP
+    A=M
+    M=D
+    @SP
+    M=M+1\n""" for pointer in ('LCL', 'ARG', 'THIS', 'THAT'))
+        return f"""    @SP
+    A=M
+    M=D
+    @SP
+    M=M+1
+{save}    @SP
+    D=M
+    @{5 + int(parameter)}
+    D=D-A
+    @ARG
+    M=D
+    @SP
+    D=M
+    @LCL
+    M=D
+    @{function}
+    0;JMP\n"""
+
+    def _commandreturn(self, command):
+        """Restore the caller frame and jump to the return address"""
+        restore = ''.join(f"""    @R13
+    AM=M-1
+    D=M
+    @{pointer}
+    M=D\n""" for pointer in ('THAT', 'THIS', 'ARG', 'LCL'))
+        return f"""\t// return
+    @LCL
+    D=M
+    @R13
+    M=D
+    @5
+    A=D-A
+    D=M
+    @R14
+    M=D
+    @SP
+    AM=M-1
+    D=M
+    @ARG
+    A=M
+    M=D
+    @ARG
+    D=M+1
+    @SP
+    M=D
+{restore}    @R14
+    A=M
+    0;JMP\n"""
 
 
 if __name__ == '__main__':
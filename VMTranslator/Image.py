@@ -0,0 +1,161 @@
+"""No comment"""
+
+import sys
+import Interpreter
+
+# fonctions d'initialisation de l'OS remplacées par une image de la RAM : elles
+# ne sont appelées qu'une fois, au démarrage, et ne font que remplir des
+# tableaux (Output.initMap : 95 appels à Output.create pour la police,
+# Output.createShiftedMap : la police décalée de 8 bits, par multiplications)
+FUNCTIONS = ('Output.initMap', 'Output.createShiftedMap')
+
+# nombre maximal de commandes VM exécutées pour calculer l'image
+LIMIT = 10 ** 7
+
+
+class Image:
+    """Section de données initialisées, calculée à la traduction.
+
+    Le programme complet est exécuté par l'Interpreter depuis Sys.init
+    jusqu'à Main.main. Pour chaque appel à l'une des FUNCTIONS rencontré en
+    chemin, les cases de la RAM modifiées par l'appel (variables static,
+    temp, tas et écran ; la pile est exclue) et la valeur retournée sont
+    relevées. Comme le démarrage ne dépend d'aucune entrée, l'état de la
+    machine au moment de l'appel est toujours le même et l'appel peut être
+    remplacé par l'écriture directe de ces valeurs : c'est la routine
+    `{function}$image` placée dans le bootstrap. Les fonctions qui ne sont
+    plus appelées que par les fonctions remplacées ne sont pas traduites
+    (`dead`).
+
+    La RAM ne peut pas être remplie par une boucle de copie, le processeur
+    Hack ne sachant pas lire sa ROM : les valeurs sont écrites par des
+    instructions, regroupées par valeur pour ne charger chacune qu'une fois
+    dans D (deux instructions par case).
+    """
+
+    def __init__(self, files, functions=FUNCTIONS):
+        self.images = {}
+        self.dead = set()
+        # raison de l'absence de section de données, que le Translator signale
+        self.warning = None
+        interpreter = Interpreter.Interpreter(files)
+        functions = [function for function in functions if function in interpreter.functions]
+        if 'Sys.init' not in interpreter.functions or not functions:
+            return
+        # une fonction appelée depuis plusieurs endroits ne peut pas être remplacée
+        sites = [op[1] for op in interpreter.code if op[0] == 'call']
+        functions = [function for function in functions if sites.count(function) == 1]
+        interpreter.start('Sys.init')
+        try:
+            while True:
+                function = interpreter.run(set(functions) | {'Main.main'}, LIMIT)
+                if function is None or function == 'Main.main':
+                    break
+                self.images[function] = self._capture(interpreter)
+                functions.remove(function)
+        except RuntimeError as error:
+            self.warning = f'Image : {error}, pas de section de données'
+            self.images = {}
+            return
+        self.dead = self._reach(interpreter.calls, set()) - self._reach(interpreter.calls, set(self.images))
+        self.dead |= set(self.images)
+
+    def __contains__(self, function):
+        return function in self.images
+
+    def _capture(self, interpreter):
+        # exécute l'appel en cours et relève les cases modifiées
+        ram = interpreter.ram
+        before = list(ram)
+        sp = ram[0]
+        interpreter.over(LIMIT)
+        cells = {}
+        for address in range(5, 13):
+            if ram[address] != before[address]:
+                cells[f"R{address}"] = ram[address]
+        for address, name in interpreter.statics.items():
+            if ram[address] != before[address]:
+                cells[name] = ram[address]
+        for address in range(2048, 24576):
+            if ram[address] != before[address]:
+                cells[str(address)] = ram[address]
+        # le résultat remplace les arguments sur la pile
+        return cells, ram[ram[0] - 1], sp - ram[0] + 1
+
+    def _reach(self, calls, removed):
+        # fonctions accessibles depuis Sys.init sans passer par removed
+        reached = set()
+        todo = ['Sys.init']
+        while todo:
+            function = todo.pop()
+            if function in reached or function in removed:
+                continue
+            reached.add(function)
+            todo += calls.get(function, ())
+        return reached
+
+    def call(self, command, ret):
+        """Appel d'une fonction remplacée : saut vers sa routine"""
+        return f"""\t// call {command['function']} {command['parameter']} (image)
+    @{ret}
+    D=A
+    @{command['function']}$image
+    0;JMP
+({ret})\n"""
+
+    def routines(self):
+        """Code de toutes les routines, à placer une fois dans le programme"""
+        return ''.join(self._routine(function) for function in self.images)
+
+    def _routine(self, function):
+        # écrit les valeurs relevées, puis le résultat à la place des arguments
+        name = f"{function}$image"
+        cells, result, parameter = self.images[function]
+        values = {}
+        for address, value in cells.items():
+            values.setdefault(value, []).append(address)
+        stores = ''
+        for value, addresses in sorted(values.items()):
+            if value in (-1, 0, 1):
+                stores += ''.join(f"""    @{address}
+    M={value}\n""" for address in addresses)
+                continue
+            stores += self._load(value) + ''.join(f"""    @{address}
+    M=D\n""" for address in addresses)
+        # SP = SP - parameter + 1
+        if parameter == 0:
+            sp = """    @SP
+    M=M+1\n"""
+        elif parameter > 1:
+            sp = f"""    @{parameter - 1}
+    D=A
+    @SP
+    M=M-D\n"""
+        else:
+            sp = ''
+        return f"""\t// image {function} ({len(cells)} cases)
+({name})
+    @{name}.ret
+    M=D
+{stores}{sp}{self._load(result)}    @SP
+    A=M-1
+    M=D
+    @{name}.ret
+    A=M
+    0;JMP
+"""
+
+    def _load(self, value):
+        # charge une valeur sur 16 bits dans D
+        if value < 0:
+            return f"""    @{~value}
+    D=!A\n"""
+        return f"""    @{value}
+    D=A\n"""
+
+
+if __name__ == "__main__":
+    import glob
+    image = Image(glob.glob(f'{sys.argv[1]}/*.vm'))
+    print(image.routines())
+    print('// non traduites :', ' '.join(sorted(image.dead)))
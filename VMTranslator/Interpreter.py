@@ -0,0 +1,216 @@
+"""No comment"""
+
+import os
+import sys
+import Parser
+import Vm
+
+
+def word(value):
+    """Ramène un entier sur 16 bits signés"""
+    value &= 0xFFFF
+    return value - 0x10000 if value & 0x8000 else value
+
+
+class Interpreter:
+    """Exécute directement du code VM, avec la sémantique de la machine Hack.
+
+    La RAM est celle de la machine Hack : SP, LCL, ARG, THIS et THAT dans
+    les cases 0 à 4, temp dans 5 à 12, les variables static à partir de 16
+    (dans l'ordre de leur première apparition), la pile à partir de 256 et
+    le tas à partir de 2048. `statics` donne le nom de chaque variable static
+    tel que l'écrit le Generator (`Fichier.i`), indexé par son adresse.
+    `calls` donne pour chaque fonction l'ensemble des fonctions qu'elle appelle.
+    Chaque élément de `files` est un chemin ou un Vm.Module.
+    """
+
+    def __init__(self, files):
+        self.code = []
+        self.functions = {}
+        self.calls = {}
+        self.statics = {}
+        labels = {}
+        addresses = {}
+        for file in files:
+            if isinstance(file, Vm.Module):
+                filename, commands = file.name, file.parser()
+            else:
+                filename, commands = os.path.splitext(os.path.basename(file))[0], Parser.Parser(file)
+            function = filename
+            for command in commands:
+                type = command['type']
+                if type == 'function':
+                    function = command['function']
+                    self.functions[function] = len(self.code)
+                    self.calls[function] = set()
+                    self.code.append(('function', int(command['parameter'])))
+                elif type == 'label':
+                    labels[(function, command['label'])] = len(self.code)
+                elif type in ('goto', 'if-goto'):
+                    self.code.append((type, (function, command['label'])))
+                elif type in ('push', 'pop'):
+                    segment, index = command['segment'], int(command['parameter'])
+                    if segment == 'static':
+                        name = f"{filename}.{index}"
+                        if name not in addresses:
+                            addresses[name] = 16 + len(addresses)
+                            self.statics[addresses[name]] = name
+                        index = addresses[name]
+                    self.code.append((type, segment, index))
+                elif type == 'call':
+                    self.calls.setdefault(function, set()).add(command['function'])
+                    self.code.append(('call', command['function'], int(command['parameter'])))
+                else:
+                    self.code.append((type,))
+        self.code = [(op[0], labels[op[1]]) if op[0] in ('goto', 'if-goto') else op for op in self.code]
+        self.ram = [0] * 32768
+        self.ram[0] = 256
+        self.pc = None
+        self.depth = 0
+        self.steps = 0
+
+    def start(self, function, *args):
+        """Prépare l'appel de `function`, comme le fait le bootstrap"""
+        ram = self.ram
+        for arg in args:
+            ram[ram[0]] = word(arg)
+            ram[0] += 1
+        self._frame(None, len(args))
+        self.pc = self.functions[function]
+        self.depth = 1
+
+    def run(self, functions=(), limit=None):
+        """Exécute jusqu'au prochain appel d'une des `functions` (retourne son
+        nom, l'appel n'est pas exécuté) ou jusqu'au retour de la fonction
+        lancée par start (retourne None)"""
+        return self._run(functions, 0, limit)
+
+    def over(self, limit=None):
+        """Exécute entièrement l'appel sur lequel run s'est arrêté"""
+        self._run((), self.depth, limit, first=True)
+
+    def call(self, function, *args, limit=None):
+        """Appelle `function` et retourne son résultat"""
+        self.start(function, *args)
+        self.run(limit=limit)
+        self.ram[0] -= 1
+        return self.ram[self.ram[0]]
+
+    def _frame(self, ret, parameter):
+        # empile l'adresse de retour et le cadre de l'appelant
+        ram = self.ram
+        sp = ram[0]
+        ram[sp] = ret
+        ram[sp + 1:sp + 5] = ram[1:5]
+        ram[2] = sp - parameter
+        ram[0] = sp + 5
+        ram[1] = sp + 5
+
+    def _run(self, functions, depth, limit, first=False):
+        # boucle d'exécution : s'arrête avant un appel à l'une des functions,
+        # ou quand la profondeur d'appel redescend à depth
+        ram = self.ram
+        code = self.code
+        segments = {'local': 1, 'argument': 2, 'this': 3, 'that': 4}
+        pc = self.pc
+        steps = 0
+        while pc is not None:
+            op = code[pc]
+            type = op[0]
+            if type == 'call' and op[1] in functions and not first:
+                break
+            first = False
+            steps += 1
+            if limit is not None and steps > limit:
+                self.pc = pc
+                self.steps += steps
+                raise RuntimeError(f'step limit reached ({limit})')
+            pc += 1
+            if type == 'push':
+                segment, index = op[1], op[2]
+                if segment == 'constant':
+                    value = index
+                elif segment in segments:
+                    value = ram[(ram[segments[segment]] + index) & 0x7FFF]
+                elif segment == 'static':
+                    value = ram[index]
+                elif segment == 'temp':
+                    value = ram[5 + index]
+                else:
+                    value = ram[3 + index]
+                ram[ram[0]] = value
+                ram[0] += 1
+            elif type == 'pop':
+                segment, index = op[1], op[2]
+                ram[0] -= 1
+                value = ram[ram[0]]
+                if segment in segments:
+                    ram[(ram[segments[segment]] + index) & 0x7FFF] = value
+                elif segment == 'static':
+                    ram[index] = value
+                elif segment == 'temp':
+                    ram[5 + index] = value
+                else:
+                    ram[3 + index] = value
+            elif type in ('add', 'sub', 'and', 'or', 'eq', 'gt', 'lt'):
+                ram[0] -= 1
+                y = ram[ram[0]]
+                x = ram[ram[0] - 1]
+                match type:
+                    case 'add':
+                        value = word(x + y)
+                    case 'sub':
+                        value = word(x - y)
+                    case 'and':
+                        value = word(x & y)
+                    case 'or':
+                        value = word(x | y)
+                    case 'eq':
+                        value = -1 if x == y else 0
+                    case 'gt':
+                        # comparaison par soustraction sur 16 bits, comme l'assembleur
+                        value = -1 if word(x - y) > 0 else 0
+                    case _:
+                        value = -1 if word(x - y) < 0 else 0
+                ram[ram[0] - 1] = value
+            elif type == 'neg':
+                ram[ram[0] - 1] = word(-ram[ram[0] - 1])
+            elif type == 'not':
+                ram[ram[0] - 1] = word(~ram[ram[0] - 1])
+            elif type == 'goto':
+                pc = op[1]
+            elif type == 'if-goto':
+                ram[0] -= 1
+                if ram[ram[0]] != 0:
+                    pc = op[1]
+            elif type == 'function':
+                for _ in range(op[1]):
+                    ram[ram[0]] = 0
+                    ram[0] += 1
+            elif type == 'call':
+                if op[1] not in self.functions:
+                    self.pc = pc - 1
+                    raise RuntimeError(f'unknown function {op[1]}')
+                self._frame(pc, op[2])
+                pc = self.functions[op[1]]
+                self.depth += 1
+            elif type == 'return':
+                frame = ram[1]
+                pc = ram[frame - 5]
+                ram[ram[2]] = ram[ram[0] - 1]
+                ram[0] = ram[2] + 1
+                ram[1:5] = ram[frame - 4:frame]
+                self.depth -= 1
+                if self.depth == depth:
+                    break
+        self.pc = pc
+        self.steps += steps
+        return code[pc][1] if pc is not None and code[pc][0] == 'call' and code[pc][1] in functions else None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: Interpreter.py <vm file>... <function>")
+    else:
+        interpreter = Interpreter(sys.argv[1:-1])
+        print(interpreter.call(sys.argv[-1]), f'steps={interpreter.steps}')
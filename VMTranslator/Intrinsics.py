@@ -0,0 +1,427 @@
+"""No comment"""
+
+
+class Intrinsics:
+    """Remplacement des appels à certaines fonctions de l'OS.
+
+    Les petites fonctions (Memory.peek, Memory.poke, Array.dispose) sont
+    développées sur place en accès directs à la RAM. Les autres sont des
+    routines en assembleur écrites à la main : un appel `call Math.multiply 2`
+    devient un simple saut vers la routine, l'adresse de retour étant passée
+    dans D, sans sauvegarde du cadre de l'appelant. Les arguments sont lus
+    sur la pile et le résultat remplace le premier d'entre eux, exactement
+    comme après un `call` / `return`. Les routines gardent la sémantique des
+    fonctions de Jack/os, y compris le dépassement sur 16 bits et les cas
+    d'erreur, pour lesquels elles se rabattent sur un appel normal à la
+    fonction de l'OS.
+    """
+
+    def __init__(self, generator):
+        self.generator = generator
+        # fonction de l'OS -> code développé sur place à l'appel
+        self.inline = {
+            'Memory.peek': self._peek,
+            'Memory.poke': self._poke,
+            'Array.dispose': self._dispose,
+        }
+        # fonction de l'OS -> routine partagée qui la remplace
+        self.table = {
+            'Math.multiply': self._multiply,
+            'Math.divide': self._divide,
+            'Math.sqrt': self._sqrt,
+            'Array.new': self._arraynew,
+        }
+
+    def __contains__(self, function):
+        return function in self.inline or function in self.table
+
+    def call(self, command):
+        """Appel d'une fonction remplacée : code sur place ou saut vers sa routine"""
+        if command['function'] in self.inline:
+            return self.inline[command['function']](command)
+        ret = f"RET_{self.generator._new_label()}"
+        return f"""\t// call {command['function']} {command['parameter']} (intrinsic)
+    @{ret}
+    D=A
+    @{command['function']}$intrinsic
+    0;JMP
+({ret})\n"""
+
+    def routines(self):
+        """Code de toutes les routines, à placer une fois dans le programme"""
+        return ''.join(routine(f"{function}$intrinsic") for function, routine in self.table.items())
+
+    def _peek(self, command):
+        # Memory.peek(a) : RAM[a] (la base du tableau de Memory vaut 0)
+        return """\t// call Memory.peek 1 (intrinsic)
+    @SP
+    A=M-1
+    A=M
+    D=M
+    @SP
+    A=M-1
+    M=D\n"""
+
+    def _poke(self, command):
+        # Memory.poke(a, v) : RAM[a] = v, puis 0 comme valeur de retour
+        return """\t// call Memory.poke 2 (intrinsic)
+    @SP
+    AM=M-1
+    D=M
+    @SP
+    A=M-1
+    A=M
+    M=D
+    @SP
+    A=M-1
+    M=0\n"""
+
+    def _dispose(self, command):
+        # Array.dispose(a) ne fait que Memory.deAlloc(a), qui retourne aussi 0
+        ret = f"RET_{self.generator._new_label()}"
+        return f"""\t// call Array.dispose 1 (intrinsic)
+    @{ret}
+    D=A
+{self.generator._frame('Memory.deAlloc', 1)}({ret})\n"""
+
+    def _fallback(self, name, function, parameter):
+        # appel normal à la fonction de l'OS, avec l'adresse de retour sauvée
+        return f"""    @{name}.ret
+    D=M
+{self.generator._frame(function, parameter)}"""
+
+    def _arraynew(self, name):
+        # Array.new(n) vaut Memory.alloc(n) si n > 0 : Memory.alloc est
+        # appelée directement et retourne chez l'appelant ; sinon l'appel
+        # normal à Array.new signale l'erreur
+        return f"""\t// intrinsic Array.new
+({name})
+    @{name}.ret
+    M=D
+    @SP
+    A=M-1
+    D=M
+    @{name}.error
+    D;JLE
+{self._fallback(name, 'Memory.alloc', 1)}({name}.error)
+{self._fallback(name, 'Array.new', 1)}"""
+
+    def _multiply(self, name):
+        # x*y modulo 2^16 par décalages et additions, que Math.multiply
+        # calcule aussi pour toutes les entrées (y compris -32768). On rend y
+        # positif et on garde dans y le plus petit des deux opérandes, puis on
+        # s'arrête dès qu'il ne reste plus de bit de y à traiter.
+        return f"""\t// intrinsic Math.multiply
+({name})
+    @{name}.ret
+    M=D
+    @SP
+    AM=M-1
+    D=M
+    @{name}.y
+    M=D
+    @SP
+    A=M-1
+    D=M
+    @{name}.x
+    M=D
+    @SP
+    A=M-1
+    M=0
+    @{name}.y
+    D=M
+    @{name}.ypos
+    D;JGE
+    @{name}.y
+    M=-M
+    @{name}.x
+    M=-M
+({name}.ypos)
+    @{name}.x
+    D=M
+    @{name}.xabs
+    D;JGE
+    D=-D
+({name}.xabs)
+    @{name}.t
+    M=D
+    @{name}.y
+    D=D-M
+    @{name}.start
+    D;JGE
+    @{name}.x
+    D=M
+    @{name}.xpos
+    D;JGE
+    @{name}.y
+    M=-M
+({name}.xpos)
+    @{name}.y
+    D=M
+    @{name}.x
+    M=D
+    @{name}.t
+    D=M
+    @{name}.y
+    M=D
+({name}.start)
+    @{name}.mask
+    M=1
+({name}.loop)
+    @{name}.mask
+    D=-M
+    @{name}.y
+    D=D&M
+    @{name}.end
+    D;JEQ
+    @{name}.mask
+    D=M
+    @{name}.y
+    D=D&M
+    @{name}.skip
+    D;JEQ
+    @{name}.x
+    D=M
+    @SP
+    A=M-1
+    M=M+D
+({name}.skip)
+    @{name}.x
+    D=M
+    M=M+D
+    @{name}.mask
+    D=M
+    M=M+D
+    @{name}.loop
+    0;JMP
+({name}.end)
+    @{name}.ret
+    A=M
+    0;JMP
+"""
+
+    def _divide(self, name):
+        # transcription de l'algorithme de Math.divide (table des multiples
+        # de |y|, puis soustractions du plus grand au plus petit) avec les
+        # mêmes comparaisons par soustraction sur 16 bits, donc les mêmes
+        # résultats dans tous les cas. La table est placée au-dessus de la
+        # pile et le quotient est construit par doublements successifs.
+        return f"""\t// intrinsic Math.divide
+({name})
+    @{name}.ret
+    M=D
+    @SP
+    A=M-1
+    D=M
+    @{name}.error
+    D;JEQ
+    @{name}.y
+    M=D
+    @SP
+    AM=M-1
+    A=A-1
+    D=M
+    @{name}.x
+    M=D
+    @{name}.neg
+    M=0
+    @{name}.xneg
+    D;JLT
+    @{name}.sign
+    D;JEQ
+    @{name}.y
+    D=M
+    @{name}.sign
+    D;JGE
+    @{name}.neg
+    M=-1
+    @{name}.sign
+    0;JMP
+({name}.xneg)
+    @{name}.y
+    D=M
+    @{name}.sign
+    D;JLE
+    @{name}.neg
+    M=-1
+({name}.sign)
+    @{name}.y
+    D=M
+    @{name}.yabs
+    D;JGE
+    D=-D
+({name}.yabs)
+    @SP
+    A=M
+    M=D
+    @{name}.x
+    D=M
+    @{name}.xabs
+    D;JGE
+    @{name}.x
+    M=-M
+({name}.xabs)
+    @SP
+    D=M
+    @{name}.p
+    M=D
+({name}.double)
+    @SP
+    D=M
+    @{name}.p
+    D=M-D
+    @15
+    D=D-A
+    @{name}.divide
+    D;JGE
+    @{name}.p
+    A=M
+    D=M-1
+    @{name}.m
+    M=D
+    @32767
+    D=A
+    @{name}.m
+    D=D-M
+    D=D-M
+    @{name}.divide
+    D;JLT
+    @{name}.p
+    A=M
+    D=M
+    A=A+1
+    M=D
+    M=M+D
+    D=M-1
+    @{name}.m
+    M=D
+    @{name}.x
+    D=M-1
+    @{name}.m
+    D=M-D
+    @{name}.divide
+    D;JGT
+    @{name}.p
+    M=M+1
+    @{name}.double
+    0;JMP
+({name}.divide)
+    @{name}.q
+    M=0
+({name}.loop)
+    @SP
+    D=M
+    @{name}.p
+    D=M-D
+    @{name}.end
+    D;JLT
+    @{name}.q
+    D=M
+    M=M+D
+    @{name}.p
+    A=M
+    D=M-1
+    @{name}.m
+    M=D
+    @{name}.x
+    D=M-1
+    @{name}.m
+    D=M-D
+    @{name}.skip
+    D;JGT
+    @{name}.p
+    A=M
+    D=M
+    @{name}.x
+    M=M-D
+    @{name}.q
+    M=M+1
+({name}.skip)
+    @{name}.p
+    M=M-1
+    @{name}.loop
+    0;JMP
+({name}.end)
+    @{name}.neg
+    D=M
+    @{name}.pos
+    D;JEQ
+    @{name}.q
+    M=-M
+({name}.pos)
+    @{name}.q
+    D=M
+    @SP
+    A=M-1
+    M=D
+    @{name}.ret
+    A=M
+    0;JMP
+({name}.error)
+{self._fallback(name, 'Math.divide', 2)}"""
+
+    def _sqrt(self, name):
+        # même recherche bit à bit que Math.sqrt (y de 7 à 0), déroulée : le
+        # carré de y + 2^j est calculé à partir de y^2 sans multiplication,
+        # comme y^2 + y*2^(j+1) + 4^j, modulo 2^16 comme dans l'OS
+        steps = ''
+        for j in range(7, -1, -1):
+            steps += f"""    @{name}.y
+    D=M
+    @{name}.v
+    M=D
+{'''    D=M
+    M=D+M
+''' * (j + 1)}    D=M
+    @{name}.u
+    D=D+M
+    @{4 ** j}
+    D=D+A
+    @{name}.skip{j}
+    D;JLT
+    @{name}.t
+    M=D
+    @{name}.x
+    D=D-M
+    @{name}.skip{j}
+    D;JGT
+    @{name}.t
+    D=M
+    @{name}.u
+    M=D
+    @{2 ** j}
+    D=A
+    @{name}.y
+    M=D+M
+({name}.skip{j})
+"""
+        return f"""\t// intrinsic Math.sqrt
+({name})
+    @{name}.ret
+    M=D
+    @SP
+    A=M-1
+    D=M
+    @{name}.error
+    D;JLT
+    @{name}.x
+    M=D
+    @{name}.y
+    M=0
+    @{name}.u
+    M=0
+{steps}    @{name}.y
+    D=M
+    @SP
+    A=M-1
+    M=D
+    @{name}.ret
+    A=M
+    0;JMP
+({name}.error)
+{self._fallback(name, 'Math.sqrt', 1)}"""
+
+
+if __name__ == "__main__":
+    import Generator
+    print(Generator.Generator(intrinsics=True).intrinsics.routines())
@@ -2,6 +2,7 @@ import re
 import sys
 
 import Reader
+import Vm
 
 '''No comment'''
 
@@ -41,7 +42,7 @@ class Lexer:
         # No comment
         res = ''
         t = self.reader.next()
-        while t is not None and re.fullmatch(r'[a-zA-Z0-9\-]', t['char']):
+        while t is not None and re.fullmatch(r'[a-zA-Z0-9_.$:\-]', t['char']):
             res += t['char']
             t = self.reader.next()
         return res
@@ -63,13 +64,12 @@ class Lexer:
             match char:
                 case '/':
                     self._comment()
-                case ' ' | '\t' | '\n':
+                case ' ' | '\t' | '\r' | '\n':
                     self._skip()
-                case char if re.fullmatch(r'[a-zA-Z0-9]', char):
+                case char if re.fullmatch(r'[a-zA-Z0-9_.$:]', char):
                     token = self._toke()
                 case _:
-                    print(f'SyntaxError : line={self.line}, col={self.col}')
-                    exit()
+                    raise Vm.Error('SyntaxError', f'Unexpected character {char}', self.line, self.col)
 
         if token is None:
             return None
@@ -77,8 +77,7 @@ class Lexer:
             pattern = self._pattern()
             group = pattern.fullmatch(token)
             if group is None:
-                print(f'SyntaxError (line={self.line}, col={self.col}): {token}')
-                exit()
+                raise Vm.Error('SyntaxError', token, self.line, self.col)
             else:
                 return {'line': self.line, 'col': self.col, 'type': group.lastgroup, 'token': token}
 
@@ -97,9 +96,9 @@ class Lexer:
             (?P<segment>local|argument|static|constant|this|that|pointer|temp) |
             (?P<branching>label|goto|if-goto) |
             (?P<arithmetic>add|sub|neg|eq|gt|lt|and|or|not) |
-            (?P<function>Function|Call) |
+            (?P<function>function|call) |
             (?P<return>return) |
-            (?P<string>[a-zA-Z][a-zA-Z0-9]*) | # label et nom de fonction
+            (?P<string>[a-zA-Z_.$:][a-zA-Z0-9_.$:]*) | # label et nom de fonction
             (?P<int>[0-9]+) # des entiers 
         """, re.X)
 
@@ -0,0 +1,279 @@
+"""No comment"""
+
+import sys
+import Parser
+import Vm
+
+
+class Optimizer:
+    """Optimise le flot de contrôle des commandes produites par un Parser.
+
+    Les commandes sont lues fonction par fonction ; chaque fonction est
+    découpée en blocs de base (graphe de flot de contrôle) sur lesquels on
+    enfile les sauts à travers les blocs triviaux, on inverse les conditions
+    pour obtenir des passages en séquence, on fait tourner les boucles pour
+    n'exécuter qu'un saut par itération et on supprime les goto vers le bloc
+    suivant ainsi que le code inaccessible. L'interface est celle du Parser.
+    """
+
+    def __init__(self, parser):
+        self.parser = parser
+        self.commands = []
+        self._pos = 0
+        self._label_count = 0
+        self.command = self._read()
+
+    def next(self):
+        """retourne la commande et lit la suivante"""
+        res = self.command
+        self.command = self._read()
+        return res
+
+    def look(self):
+        """ retourne la commande """
+        return self.command
+
+    def hasNext(self):
+        """vérifie si il y a une commande suivante"""
+        return self.command is not None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.hasNext():
+            return self.next()
+        else:
+            raise StopIteration
+
+    def _read(self):
+        # lit la prochaine commande optimisée, une fonction à la fois
+        if self._pos >= len(self.commands):
+            self.commands = self._function()
+            self._pos = 0
+            if not self.commands:
+                return None
+        command = self.commands[self._pos]
+        self._pos += 1
+        return command
+
+    def _function(self):
+        # lit les commandes d'une fonction, jusqu'à la déclaration suivante
+        commands = []
+        if self.parser.hasNext():
+            commands.append(self.parser.next())
+        while self.parser.hasNext() and self.parser.look()['type'] != 'function':
+            commands.append(self.parser.next())
+        return self.optimize(commands)
+
+    def optimize(self, commands):
+        """Optimise les commandes d'une fonction et retourne la nouvelle liste"""
+        blocks = self._blocks(commands)
+        changed = True
+        while changed:
+            changed = self._prune(blocks)
+            changed |= self._thread(blocks)
+            changed |= self._rotate(blocks)
+            changed |= self._invert(blocks)
+            changed |= self._fallthrough(blocks)
+            changed |= self._unreachable(blocks)
+        res = []
+        for block in blocks:
+            res += [Vm.Branching('label', label, block['line']) for label in block['labels']]
+            res += block['body']
+            if block['jump'] is not None:
+                res.append(block['jump'])
+        return res
+
+    def _blocks(self, commands):
+        # découpe les commandes en blocs de base : étiquettes, corps, saut final
+        blocks = []
+        block = None
+        for command in commands:
+            type = command['type']
+            if block is None or block['jump'] is not None or (type == 'label' and block['body']):
+                block = {'line': command['line'], 'labels': [], 'body': [], 'jump': None}
+                blocks.append(block)
+            if type == 'label':
+                block['labels'].append(command['label'])
+            elif type in ('goto', 'if-goto', 'return'):
+                block['jump'] = command
+            else:
+                block['body'].append(command)
+        return blocks
+
+    def _index(self, blocks):
+        # position du bloc portant chaque étiquette
+        return {label: i for i, block in enumerate(blocks) for label in block['labels']}
+
+    def _target(self, block):
+        # étiquette visée par le saut du bloc, ou None
+        jump = block['jump']
+        if jump is not None and jump['type'] in ('goto', 'if-goto'):
+            return jump['label']
+        return None
+
+    def _falls(self, block):
+        # vrai si l'exécution peut continuer en séquence après le bloc
+        return block['jump'] is None or block['jump']['type'] == 'if-goto'
+
+    def _retarget(self, block, label, type=None):
+        # remplace le saut du bloc par un saut vers une autre étiquette
+        jump = block['jump']
+        block['jump'] = Vm.Branching(type or jump['type'], label, jump['line'], jump['col'])
+
+    def _prune(self, blocks):
+        # supprime les étiquettes jamais visées, pour dégager les motifs
+        used = {self._target(block) for block in blocks}
+        changed = False
+        for block in blocks:
+            labels = [label for label in block['labels'] if label in used]
+            if labels != block['labels']:
+                block['labels'] = labels
+                changed = True
+        return changed
+
+    def _thread(self, blocks):
+        # enfile les sauts vers un bloc qui ne contient qu'un goto
+        index = self._index(blocks)
+        changed = False
+        for block in blocks:
+            label = self._target(block)
+            if label is None:
+                continue
+            seen = {label}
+            target = label
+            while target in index:
+                dest = blocks[index[target]]
+                if dest['body'] or dest['jump'] is None or dest['jump']['type'] != 'goto':
+                    break
+                if dest['jump']['label'] in seen:
+                    break
+                target = dest['jump']['label']
+                seen.add(target)
+            if target != label:
+                self._retarget(block, target)
+                changed = True
+        return changed
+
+    def _rotate(self, blocks):
+        # fait tourner les boucles « label H ; cond ; if-goto X ; corps ;
+        # goto H ; label X » en « goto H ; label B ; corps ; label H ;
+        # non cond ; if-goto B ; label X » : un seul saut par itération
+        for i, head in enumerate(blocks):
+            if not head['labels'] or head['jump'] is None or head['jump']['type'] != 'if-goto':
+                continue
+            if i + 1 >= len(blocks) or not self._boolean(head['body']):
+                continue
+            exit = head['jump']['label']
+            for j in range(i + 1, len(blocks) - 1):
+                if self._target(blocks[j]) in head['labels'] and blocks[j]['jump']['type'] == 'goto' \
+                        and exit in blocks[j + 1]['labels']:
+                    break
+            else:
+                continue
+            body = blocks[i + 1]
+            if not body['labels']:
+                body['labels'].append(self._new_label(head['labels'][0]))
+            self._invertcondition(head, body['labels'][0])
+            # la tête n'est plus en premier : on y entre par un saut (supprimé
+            # par _unreachable si le bloc précédent ne continue pas en séquence)
+            entry = {'line': head['line'], 'labels': [], 'body': [],
+                     'jump': Vm.Branching('goto', head['labels'][0], head['line'])}
+            blocks[i:j + 1] = [entry] + blocks[i + 1:j + 1] + [head]
+            return True
+        return False
+
+    def _invert(self, blocks):
+        # « if-goto L1 ; goto L2 ; label L1 » devient « non ; if-goto L2 ; label L1 »
+        changed = False
+        i = 0
+        while i + 2 < len(blocks):
+            block, goto, next = blocks[i], blocks[i + 1], blocks[i + 2]
+            if block['jump'] is not None and block['jump']['type'] == 'if-goto' \
+                    and not goto['labels'] and not goto['body'] \
+                    and goto['jump'] is not None and goto['jump']['type'] == 'goto' \
+                    and block['jump']['label'] in next['labels'] and self._boolean(block['body']):
+                self._invertcondition(block, goto['jump']['label'])
+                del blocks[i + 1]
+                changed = True
+            i += 1
+        return changed
+
+    def _fallthrough(self, blocks):
+        # supprime les goto vers le bloc qui suit immédiatement
+        changed = False
+        for block, next in zip(blocks, blocks[1:]):
+            if block['jump'] is not None and block['jump']['type'] == 'goto' \
+                    and block['jump']['label'] in next['labels']:
+                block['jump'] = None
+                changed = True
+        return changed
+
+    def _unreachable(self, blocks):
+        # supprime les blocs qu'aucun chemin ne peut atteindre
+        index = self._index(blocks)
+        reached = set()
+        todo = [0] if blocks else []
+        while todo:
+            i = todo.pop()
+            if i in reached:
+                continue
+            reached.add(i)
+            label = self._target(blocks[i])
+            if label in index:
+                todo.append(index[label])
+            if self._falls(blocks[i]) and i + 1 < len(blocks):
+                todo.append(i + 1)
+        if len(reached) == len(blocks):
+            return False
+        blocks[:] = [block for i, block in enumerate(blocks) if i in reached]
+        return True
+
+    def _boolean(self, body):
+        # vrai si la valeur testée en fin de bloc vaut toujours 0 ou -1 :
+        # on peut alors inverser le test avec un simple not
+        stack = []
+        for command in body:
+            type = command['type']
+            if type == 'push':
+                stack.append(command['segment'] == 'constant' and command['parameter'] == 0)
+            elif type in ('eq', 'gt', 'lt'):
+                stack[-2:] = [True]
+            elif type in ('and', 'or'):
+                stack[-2:] = [len(stack) >= 2 and stack[-1] and stack[-2]]
+            elif type == 'not':
+                stack[-1:] = [bool(stack) and stack[-1]]
+            elif type in ('add', 'sub'):
+                stack[-2:] = [False]
+            elif type == 'neg':
+                stack[-1:] = [False]
+            elif type == 'pop':
+                stack[-1:] = []
+            elif type == 'call':
+                del stack[len(stack) - min(len(stack), int(command['parameter'])):]
+                stack.append(False)
+        return bool(stack) and stack[-1]
+
+    def _invertcondition(self, block, label):
+        # remplace « cond ; if-goto X » par « non cond ; if-goto label »
+        body = block['body']
+        if body[-1]['type'] == 'not' and self._boolean(body[:-1]):
+            del body[-1]
+        else:
+            body.append(Vm.Arithmetic('not', block['jump']['line'], block['jump']['col']))
+        self._retarget(block, label)
+
+    def _new_label(self, label):
+        # nouvelle étiquette, unique dans le fichier
+        self._label_count += 1
+        return f"{label}$BODY{self._label_count}"
+
+
+if __name__ == "__main__":
+    file = sys.argv[1]
+    print('-----debut')
+    optimizer = Optimizer(Parser.Parser(file))
+    for command in optimizer:
+        print(command)
+    print('-----fin')
@@ -2,10 +2,11 @@
 
 import sys
 import Lexer
+import Vm
 
 
 class Parser:
-    """la classe Parser sert à  détailler les commandes à partir d'un fichier"""
+    """la classe Parser sert à  détailler les commandes à partir d'un fichier (voir Vm)"""
 
     def __init__(self, file):
         self.lexer = Lexer.Lexer(file)
@@ -53,13 +54,12 @@ class Parser:
                 case 'return':
                     return self._commandreturn()
                 case _:
-                    print(f'SyntaxError : {command}')
-                    exit()
+                    raise Vm.Error('SyntaxError', command['token'], command['line'], command['col'])
 
     def _commandarithmetic(self):
         # traite une commande arithmérique
         command = self.lexer.next()
-        return {'line': command['line'], 'col': command['col'], 'type': command['token']}
+        return Vm.Arithmetic(command['token'], command['line'], command['col'])
 
     def _commandpushpop(self):
         # traite une commande push ou pop
@@ -67,22 +67,18 @@ class Parser:
         segment = self.lexer.next()
         parameter = self.lexer.next()
         if segment is None or parameter is None or segment['type'] != 'segment' or parameter['type'] != 'int':
-            print(f"SyntaxError (line={command['line']}, col={command['col']}): {command['token']}")
-            exit()
+            raise Vm.Error('SyntaxError', command['token'], command['line'], command['col'])
 
-        return {'line': command['line'], 'col': command['col'], 'type': command['token']
-            , 'segment': segment['token'], 'parameter': parameter['token']}
+        return Vm.PushPop(command['token'], segment['token'], parameter['token'], command['line'], command['col'])
 
     def _commandbranching(self):
         # traite une commande de branchement
         command = self.lexer.next()
         label = self.lexer.next()
         if label is None or label['type'] != 'string':
-            print(f"SyntaxError (line={command['line']}, col={command['col']}): {command['token']}")
-            exit()
+            raise Vm.Error('SyntaxError', command['token'], command['line'], command['col'])
 
-        return {'line': command['line'], 'col': command['col'], 'type': command['token']
-            , 'label': label['token']}
+        return Vm.Branching(command['token'], label['token'], command['line'], command['col'])
 
     def _commandfunction(self):
         # traite une commande de fonction
@@ -90,16 +86,14 @@ class Parser:
         name = self.lexer.next()
         parameter = self.lexer.next()
         if name is None or parameter is None or name['type'] != 'string' or parameter['type'] != 'int':
-            print(f"SyntaxError (line={command['line']}, col={command['col']}): {command['token']}")
-            exit()
+            raise Vm.Error('SyntaxError', command['token'], command['line'], command['col'])
 
-        return {'line': command['line'], 'col': command['col'], 'type': command['token']
-            , 'function': name['token'], 'parameter': parameter['token']}
+        return Vm.Function(command['token'], name['token'], parameter['token'], command['line'], command['col'])
 
     def _commandreturn(self):
         # traite une commande de retour
         command = self.lexer.next()
-        return {'line': command['line'], 'col': command['col'], 'type': command['token']}
+        return Vm.Return(command['line'], command['col'])
 
 
 if __name__ == "__main__":
@@ -2,18 +2,46 @@
 
 import os
 import sys
+import Vm
+
+# taille maximale d'un bloc lu dans le fichier (mémoire bornée en mode flux)
+CHUNK = 1 << 16
 
 
 class Reader:
-    """No comment"""
+    """Lit un fichier .vm caractère par caractère.
+
+    `file` est soit un chemin, soit un objet fichier déjà ouvert (par exemple
+    sys.stdin) : le contenu est alors consommé par blocs au fil de la lecture,
+    sans jamais être chargé entièrement en mémoire.
+    """
 
     def __init__(self, file):
         self.char = None
         self._line = 1
         self._col = 1
-        if os.path.exists(file):
+        self._buffer = ''
+        self._pos = 0
+        if hasattr(file, 'read'):
+            self.file = file
+            self._owner = False
+        elif os.path.exists(file):
             self.file = open(file, "r")
-            self.char = self.file.read(1)
+            self._owner = True
+        else:
+            raise Vm.Error('FileNotFoundError', file)
+        self.char = self._read()
+
+    def _read(self):
+        # lit le caractère suivant, en rechargeant le tampon ligne par ligne
+        if self._pos >= len(self._buffer):
+            self._buffer = self.file.readline(CHUNK)
+            self._pos = 0
+            if not self._buffer:
+                return ''
+        char = self._buffer[self._pos]
+        self._pos += 1
+        return char
 
     def look(self):
         """No comment"""
@@ -28,8 +56,8 @@ class Reader:
                 self._col = 1
             else:
                 self._col += 1
-            self.char = self.file.read(1)
-            if not self.hasNext():
+            self.char = self._read()
+            if not self.hasNext() and self._owner:
                 self.file.close()
         return res
 
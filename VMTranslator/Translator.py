@@ -1,39 +1,150 @@
 """No comment"""
+import argparse
 import os
 import glob
 import sys
 
 import Generator
+import Image
+import Vm
+
+# taille des blocs d'assembleur écrits d'un coup dans la sortie
+CHUNK = 1 << 16
 
 
 class Translator:
-    """No comment"""
+    """No comment
+
+    `files` et `asm` peuvent valoir '-' : les commandes VM sont alors lues
+    au fil de l'eau sur l'entrée standard et l'assembleur est écrit sur la
+    sortie standard, par blocs d'au plus CHUNK caractères.
+    Avec `optimize`, le flot de contrôle de chaque fonction est optimisé ;
+    avec `intrinsics`, certaines fonctions de l'OS sont remplacées par des
+    routines en assembleur (voir Intrinsics) ; avec `data`, les fonctions
+    d'initialisation de l'OS sont remplacées par une image de la RAM écrite
+    par le bootstrap (voir Image), ce qui demande le programme complet.
+    Les fichiers de `link` remplacent à l'édition de liens les fichiers du
+    même nom (un module de l'OS par une variante, Jack/os/fast/Memory.vm par
+    exemple) ou s'ajoutent au programme.
+    `files` peut aussi être une liste de fichiers et de Vm.Module, les
+    commandes déjà en mémoire (celles du compilateur Jack par exemple), et
+    `asm` un fichier ouvert (io.StringIO par exemple), que translate ne
+    ferme pas. Les erreurs sont des Vm.Error ; `warnings` garde les
+    messages qui n'arrêtent pas la traduction. Un lecteur en aval qui
+    ferme le tube lève BrokenPipeError, laissée à l'appelant.
+    """
 
-    def __init__(self, files, asm):
-        self.asm = open(asm, "w")
+    def __init__(self, files, asm, optimize=False, intrinsics=False, data=False, link=()):
+        self.asmfile = asm
+        self.asm = None
         self.files = files
+        self.optimize = optimize
+        self.intrinsics = intrinsics
+        self.data = data
+        self.link = list(link)
+        self.image = None
+        self.warnings = []
+        self._chunk = []
+        self._size = 0
 
     def translate(self):
-        """No comment"""
-        self.asm.write(self._bootstrap())
+        """No comment
+
+        Les entrées sont vérifiées avant d'ouvrir la sortie, et un fichier
+        .asm est écrit à côté puis mis à sa place à la fin (comme
+        Jack/Generator.save) : en cas d'erreur, l'ancien reste intact.
+        """
         # os.listdir("/home/olivier")
-        if os.path.isfile(self.files):
-            self._translateonefile(self.files)
+        if isinstance(self.files, list):
+            files = list(self.files)
+        elif self.files == '-':
+            files = None
+        elif os.path.isfile(self.files):
+            files = [self.files]
+        elif os.path.isdir(self.files):
+            files = glob.glob(f'{self.files}/*.vm')
+        else:
+            raise Vm.Error('FileNotFoundError', self.files)
+        files = self._link(files)
+        if self.data and files is None:
+            raise Vm.Error('DataError', "la section de données demande les fichiers, pas l'entrée standard")
+        tmp = None
+        if hasattr(self.asmfile, 'write'):
+            self.asm = self.asmfile
+        elif self.asmfile == '-':
+            self.asm = sys.stdout
         else:
-            if os.path.isdir(self.files):
-                for file in glob.glob(f'{self.files}/*.vm'):
-                    self._translateonefile(file)
+            tmp = f'{self.asmfile}.{os.getpid()}.tmp'
+            self.asm = open(tmp, "w")
+        try:
+            if self.data:
+                self.image = Image.Image(files)
+                if self.image.warning is not None:
+                    self.warnings.append(self.image.warning)
+            self._write(self._bootstrap())
+            if files is None:
+                self._translateonefile(sys.stdin, '<stdin>')
+                files = self.link
+            for file in files:
+                self._translateonefile(file)
+            self._flush()
+        except BaseException:
+            if tmp is not None:
+                self.asm.close()
+                os.unlink(tmp)
+            raise
+        if tmp is not None:
+            self.asm.close()
+            os.replace(tmp, self.asmfile)
 
-    def _translateonefile(self, file):
+    def _link(self, files):
+        # remplace les modules du même nom par ceux de link, ajoute les autres
+        for file in self.link:
+            if not os.path.isfile(file):
+                raise Vm.Error('FileNotFoundError', file)
+        if files is None:
+            return None
+        modules = {os.path.basename(file): file for file in self.link}
+        res = [modules.pop(_basename(file), file) for file in files]
+        return res + list(modules.values())
+
+    def _translateonefile(self, file, name=None):
         """No comment"""
-        self.asm.write(f"""\n//code de {file}\n""")
-        generator = Generator.Generator(file)
-        for command in generator:
-            self.asm.write(command)
+        if isinstance(file, Vm.Module):
+            name = _basename(file)
+        self._write(f"""\n//code de {name or file}\n""")
+        generator = Generator.Generator(file, self.optimize, self.intrinsics, self.image)
+        try:
+            for command in generator:
+                self._write(command)
+        except Vm.Error as error:
+            # l'erreur d'une commande désigne le fichier qui la contient
+            if error.file is None:
+                error.file = name or _basename(file)
+            raise
+
+    def _write(self, text):
+        # accumule l'assembleur et ne l'écrit que par blocs : la mémoire reste
+        # bornée et un lecteur lent en aval ralentit simplement la lecture
+        self._chunk.append(text)
+        self._size += len(text)
+        if self._size >= CHUNK:
+            self._flush()
+
+    def _flush(self):
+        # écrit le bloc courant dans la sortie
+        self.asm.write(''.join(self._chunk))
+        self.asm.flush()
+        self._chunk = []
+        self._size = 0
 
     def _bootstrap(self):
         """No comment"""
-        init = Generator.Generator()._commandcall({'type': 'Call', 'function': 'Sys.init', 'parameter': '0'})
+        generator = Generator.Generator(intrinsics=self.intrinsics)
+        init = generator._commandcall(Vm.Function('call', 'Sys.init', 0))
+        routines = generator.intrinsics.routines() if self.intrinsics else ''
+        if self.image is not None:
+            routines += self.image.routines()
 
         return f"""// Bootstrap
     @256
@@ -41,14 +152,36 @@ class Translator:
     @SP
     M=D
 {init}
-"""
+{routines}"""
+
+
+def _basename(file):
+    # nom du fichier .vm, d'un chemin ou d'un module en mémoire
+    return f"{file.name}.vm" if isinstance(file, Vm.Module) else os.path.basename(file)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: Translotor.py <vm file| dir> <asm file>")
-    else:
-        vmfiles=sys.argv[1]
-        asmfile=sys.argv[2]
-        translator = Translator(vmfiles,asmfile)
+    arguments = argparse.ArgumentParser(description="Traduit du code VM en assembleur Hack")
+    arguments.add_argument('vmfiles', help="fichier .vm, répertoire ou - pour l'entrée standard")
+    arguments.add_argument('asmfile', nargs='?', default='-', help="fichier .asm ou - pour la sortie standard")
+    arguments.add_argument('-O', '--optimize', action='store_true', help="optimise le flot de contrôle")
+    arguments.add_argument('-I', '--intrinsics', action='store_true',
+                           help="remplace certains appels à l'OS (Math, Memory.peek/poke, Array) par de l'assembleur")
+    arguments.add_argument('-D', '--data', action='store_true',
+                           help="remplace l'initialisation de la police d'Output par une image de la RAM")
+    arguments.add_argument('-L', '--link', action='append', default=[], metavar='VMFILE',
+                           help="remplace le module du même nom par ce fichier .vm (par exemple ../Jack/os/fast/Memory.vm)")
+    args = arguments.parse_args()
+    translator = Translator(args.vmfiles, args.asmfile, args.optimize, args.intrinsics, args.data, args.link)
+    try:
         translator.translate()
+    except Vm.Error as error:
+        print(error, file=sys.stderr)
+        sys.exit(1)
+    except BrokenPipeError:
+        # le lecteur en aval a fermé le tube : inutile de continuer
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+    finally:
+        for warning in translator.warnings:
+            print(warning, file=sys.stderr)
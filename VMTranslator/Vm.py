@@ -0,0 +1,193 @@
+"""No comment"""
+import sys
+
+
+class Error(Exception):
+    """Erreur de traduction : SyntaxError, FileNotFoundError ou DataError.
+
+    Le Parser, le Generator et le Translator la lèvent au lieu d'arrêter
+    le programme : la commande Translator affiche str(error) sur stderr
+    et s'arrête, l'API en mémoire (voir Jack/Library) en fait un
+    diagnostic.
+    """
+
+    def __init__(self, kind, message, line=None, col=None, file=None):
+        super().__init__(message)
+        self.kind = kind
+        self.message = message
+        self.line = line
+        self.col = col
+        self.file = file
+
+    def __str__(self):
+        if self.line is None:
+            return f"{self.kind} : {self.message}"
+        return f"{self.kind} (line={self.line}, col={self.col}): {self.message}"
+
+
+class Command:
+    """Commande VM en mémoire, commune au compilateur Jack et au VMTranslator.
+
+    Le Generator de Jack produit ces commandes, le Parser les lit dans un
+    fichier .vm, l'Optimizer et le Generator du VMTranslator les
+    consomment. Chaque forme de commande est une classe à __slots__ (comme
+    les groupes de tokens du Lexer), son `type` est le mot-clé de la
+    commande et ses nombres sont des entiers. Une commande se lit aussi
+    comme l'ancien dict du Parser (command['type'], command['label']...).
+    str(command) est sa ligne de texte VM.
+    """
+
+    __slots__ = ('type', 'line', 'col')
+    KEYS = ('line', 'col', 'type')
+
+    def __getitem__(self, key):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.KEYS else default
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def keys(self):
+        return list(self)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, key) == getattr(other, key) for key in self.KEYS)
+
+    def __repr__(self):
+        return '{' + ', '.join(f'{key!r}: {self[key]!r}' for key in self) + '}'
+
+    def __str__(self):
+        return self.type
+
+
+class Arithmetic(Command):
+    """add, sub, neg, eq, gt, lt, and, or, not"""
+    __slots__ = ()
+
+    def __init__(self, type, line=0, col=0):
+        self.type = type
+        self.line = line
+        self.col = col
+
+
+class PushPop(Command):
+    """push ou pop d'un segment"""
+    __slots__ = ('segment', 'parameter')
+    KEYS = Command.KEYS + __slots__
+
+    def __init__(self, type, segment, parameter, line=0, col=0):
+        self.type = type
+        self.segment = segment
+        self.parameter = int(parameter)
+        self.line = line
+        self.col = col
+
+    def __str__(self):
+        return f"{self.type} {self.segment} {self.parameter}"
+
+
+class Branching(Command):
+    """label, goto ou if-goto"""
+    __slots__ = ('label',)
+    KEYS = Command.KEYS + __slots__
+
+    def __init__(self, type, label, line=0, col=0):
+        self.type = type
+        self.label = label
+        self.line = line
+        self.col = col
+
+    def __str__(self):
+        return f"{self.type} {self.label}"
+
+
+class Function(Command):
+    """function (nombre de variables locales) ou call (nombre d'arguments)"""
+    __slots__ = ('function', 'parameter')
+    KEYS = Command.KEYS + __slots__
+
+    def __init__(self, type, function, parameter, line=0, col=0):
+        self.type = type
+        self.function = function
+        self.parameter = int(parameter)
+        self.line = line
+        self.col = col
+
+    def __str__(self):
+        return f"{self.type} {self.function} {self.parameter}"
+
+
+class Return(Command):
+    __slots__ = ()
+
+    def __init__(self, line=0, col=0):
+        self.type = 'return'
+        self.line = line
+        self.col = col
+
+
+class Module:
+    """Commandes d'un fichier .vm, sans le fichier.
+
+    `name` est le nom du fichier sans .vm : il préfixe les variables static.
+    Le VMTranslator accepte un Module partout où il accepte un fichier.
+    """
+
+    def __init__(self, name, commands):
+        self.name = name
+        self.commands = commands
+
+    def parser(self):
+        """Lecture des commandes, avec l'interface du Parser"""
+        return Stream(self.commands)
+
+    def text(self, header=''):
+        """Texte du fichier .vm"""
+        return header + "".join(f"{command}\n" for command in self.commands)
+
+
+class Stream:
+    """Commandes d'une liste, lues comme celles d'un Parser"""
+
+    def __init__(self, commands):
+        self._commands = commands
+        self._pos = 0
+
+    def next(self):
+        """retourne la commande et passe à la suivante"""
+        res = self.look()
+        self._pos += 1
+        return res
+
+    def look(self):
+        """ retourne la commande """
+        return self._commands[self._pos] if self._pos < len(self._commands) else None
+
+    def hasNext(self):
+        """vérifie si il y a une commande suivante"""
+        return self._pos < len(self._commands)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.hasNext():
+            return self.next()
+        else:
+            raise StopIteration
+
+
+if __name__ == "__main__":
+    import Parser
+    file = sys.argv[1]
+    print('-----debut')
+    module = Module(file, list(Parser.Parser(file)))
+    print(module.text(), end='')
+    print('-----fin')